@@ -0,0 +1,99 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Memory benchmark of activation stores
+
+Replays the activations that the Profiler collects for tests/test_slow.py
+(a loop calling x(b) twice, where x calls y(i) b times) and reports the
+memory held by ObjectStore(ActivationLW) and ColumnarActivationStore.
+
+Usage: python benchmarks/activation_store.py [a] [b]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime
+
+PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJ_ROOT, "capture"))
+
+from noworkflow.now.persistence.lightweight import (                             # pylint: disable=wrong-import-position
+    ObjectStore, ActivationLW, ColumnarActivationStore
+)
+
+SCRIPT = "test_slow.py"
+
+
+def call(store, caller, name, line, args, value):
+    """Open and close an activation as Profiler.trace_call
+    and Profiler.close_activation do"""
+    aid = store.add(SCRIPT, SCRIPT, name, line, 10, caller, True)
+    activation = store[aid]
+    for arg in args:
+        activation.args.append(arg)
+    activation.start = datetime.now()
+    return aid, value
+
+
+def close(store, aid, value):
+    """Close activation"""
+    activation = store[aid]
+    activation.finish = datetime.now()
+    activation.return_value = repr(value)
+    for _ in activation.file_accesses:
+        pass
+
+
+def replay(store, a_value, b_value):
+    """Replay test_slow.py activations"""
+    main, _ = call(store, None, SCRIPT, 1, [], None)
+    for _ in range(a_value):
+        for line in (17, 18):
+            x_aid, _ = call(store, main, "x", line, ["t"], None)
+            total = 0
+            for i in range(b_value):
+                y_aid, value = call(store, x_aid, "y", 9, ["x"], i)
+                close(store, y_aid, value)
+                total += i
+            close(store, x_aid, total)
+    close(store, main, None)
+
+
+def measure(name, factory, a_value, b_value):
+    """Measure memory and time of a store"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    store = factory()
+    replay(store, a_value, b_value)
+    elapsed = time.time() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(list(store.values()))
+    print("{:<10} {:>10} activations {:>10.1f} MB {:>10.1f} MB peak "
+          "{:>8.2f}s {:>8.1f} bytes/activation".format(
+              name, count, current / 2 ** 20, peak / 2 ** 20, elapsed,
+              current / count))
+    return current
+
+
+def main():
+    """Run benchmark"""
+    a_value = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    b_value = int(sys.argv[2]) if len(sys.argv) > 2 else a_value
+    objects = measure(
+        "objects", lambda: ObjectStore(ActivationLW), a_value, b_value)
+    columns = measure(
+        "columnar", ColumnarActivationStore, a_value, b_value)
+    print("columnar store uses {:.1f}x less memory".format(objects / columns))
+
+
+if __name__ == "__main__":
+    main()
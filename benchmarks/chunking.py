@@ -0,0 +1,87 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Throughput benchmark of content-defined chunking
+
+Compares MB/sec of sha1 (reference) with the cut point search byte by byte
+(before) and with gear_candidates (after, requires numpy), and measures
+ChunkEngine.put_stream of a file.
+
+Usage: python benchmarks/chunking.py [megabytes]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJ_ROOT, "capture"))
+
+from noworkflow.now.persistence.config import PersistenceConfig                 # pylint: disable=wrong-import-position
+from noworkflow.now.persistence.content import chunk_engine                     # pylint: disable=wrong-import-position
+
+
+def sha1(data):
+    """Hash data"""
+    hashlib.sha1(data).hexdigest()
+
+
+def cut_points(data, candidates=None):
+    """Split data into chunks"""
+    start = 0
+    while start < len(data):
+        start += chunk_engine.cut_point(data, start, len(data), candidates)
+
+
+def vectorized(data):
+    """Split data into chunks with gear_candidates"""
+    cut_points(data, chunk_engine.gear_candidates(data))
+
+
+def rate(function, data):
+    """Return MB/sec of function"""
+    start = time.time()
+    function(data)
+    return len(data) / (1024 * 1024) / (time.time() - start)
+
+
+def put_stream(data):
+    """Return MB/sec of ChunkEngine.put_stream of a file with data"""
+    directory = tempfile.mkdtemp()
+    try:
+        config = PersistenceConfig()
+        config.path = directory
+        engine = chunk_engine.ChunkEngine(config)
+        engine.connect()
+        path = os.path.join(directory, "data.bin")
+        with open(path, "wb") as fil:
+            fil.write(data)
+        return rate(lambda _: engine.put_path(path), data)
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """Run benchmark"""
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    data = memoryview(os.urandom(size * 1024 * 1024))
+    print("{:<22} {:>10}".format("MB/sec", size))
+    print("{:<22} {:>10.1f}".format("sha1", rate(sha1, data)))
+    print("{:<22} {:>10.1f}".format("cut points (before)",
+                                    rate(cut_points, data)))
+    if chunk_engine.numpy is None:
+        print("{:<22} {:>10}".format("cut points (after)", "no numpy"))
+    else:
+        print("{:<22} {:>10.1f}".format("cut points (after)",
+                                        rate(vectorized, data)))
+    print("{:<22} {:>10.1f}".format("put_stream", put_stream(data)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Copyright (c) 2019 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2019 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content engine benchmark of puts of large compressible contents
+
+Compares contents/sec of the sequential plain engine (before) with the
+distributed and pool plain engines, which pass contents to worker processes
+through shared memory files (after), all with zlib compression. Times
+include close(), which waits for the workers. Speedups depend on the
+number of CPUs.
+
+Usage: python benchmarks/content_engines.py [contents] [megabytes]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from multiprocessing import cpu_count
+
+PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJ_ROOT, "capture"))
+
+from noworkflow.now.persistence.config import PersistenceConfig                 # pylint: disable=wrong-import-position
+from noworkflow.now.persistence.content.plain_engine import (                    # pylint: disable=wrong-import-position
+    PlainEngine, DistributedPlainEngine, PoolPlainEngine
+)
+
+
+def contents(number, size):
+    """Create compressible contents"""
+    return [
+        "".join("{},{},{}\n".format(i, j, j * i) for j in range(size // 12))
+        .encode("ascii")
+        for i in range(number)
+    ]
+
+
+def run(cls, directory, data):
+    """Put all contents and close engine. Return elapsed time"""
+    config = PersistenceConfig()
+    config.path = directory
+    engine = cls(config)
+    engine.connect()
+    engine.set_compression("zlib")
+    start = time.time()
+    for content in data:
+        engine.put(content, "generic")
+    engine.close()
+    return time.time() - start
+
+
+def main():
+    """Run benchmark"""
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else (
+        4 * 1024 * 1024)
+    data = contents(number, size)
+    print("{} CPUs".format(cpu_count()))
+    print("{:<14} {:>14} {:>14} {:>8}".format(
+        "contents/sec", "before", "after", "speedup"))
+    rates = {}
+    for cls in (PlainEngine, DistributedPlainEngine, PoolPlainEngine):
+        directory = tempfile.mkdtemp()
+        try:
+            rates[cls] = number / run(cls, directory, data)
+        finally:
+            shutil.rmtree(directory)
+    for name, cls in (("distributed", DistributedPlainEngine),
+                      ("pool", PoolPlainEngine)):
+        print("{:<14} {:>14.1f} {:>14.1f} {:>7.1f}x".format(
+            name, rates[PlainEngine], rates[cls],
+            rates[cls] / rates[PlainEngine]))
+
+
+if __name__ == "__main__":
+    main()
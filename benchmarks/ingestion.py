@@ -0,0 +1,117 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Ingestion benchmark of lightweight objects into SQLite
+
+Compares rows/sec of the SQLAlchemy Core insert with dicts on a default
+journal database (before) with AlchemyProxy.fast_insert on a WAL database
+with ingestion pragmas (after), for activations, object values and
+variables.
+
+Usage: python benchmarks/ingestion.py [rows]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from datetime import datetime
+
+PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJ_ROOT, "capture"))
+
+from sqlalchemy import create_engine, event                                     # pylint: disable=wrong-import-position
+
+from noworkflow.now.persistence import relational                               # pylint: disable=wrong-import-position
+from noworkflow.now.persistence.relational_database import set_pragmas          # pylint: disable=wrong-import-position
+from noworkflow.now.persistence.lightweight import (                             # pylint: disable=wrong-import-position
+    ObjectStore, ActivationLW, ObjectValueLW, VariableLW
+)
+from noworkflow.now.persistence.models import (                                 # pylint: disable=wrong-import-position
+    Activation, ObjectValue, Variable
+)
+
+
+def activations(size):
+    """Create activation store"""
+    store = ObjectStore(ActivationLW)
+    for i in range(size):
+        aid = store.add("script.py", "script.py", "f", i, 10, i, True)
+        store[aid].finish = datetime.now()
+        store[aid].return_value = repr(i)
+    return store
+
+
+def object_values(size):
+    """Create object value store"""
+    store = ObjectStore(ObjectValueLW)
+    for i in range(size):
+        store.add("x", repr(i), "ARGUMENT", i + 1)
+    return store
+
+
+def variables(size):
+    """Create variable store"""
+    store = ObjectStore(VariableLW)
+    for i in range(size):
+        store.add(i + 1, "x", i, repr(i), datetime.now(), "normal")
+    return store
+
+
+def before(engine, model, store):
+    """Original fast_store: Core insert with dicts"""
+    conn = engine.connect()
+    conn.execute(
+        model.__model__.__table__.insert().prefix_with("OR REPLACE"),
+        *store.generator(1)
+    )
+    conn.close()
+
+
+def after(engine, model, store):
+    """fast_insert with chunked executemany in a single transaction"""
+    with engine.begin() as conn:
+        keys, rows = model.fast_rows(1, store, False)
+        model.fast_insert(conn, keys, rows)
+
+
+def create(directory, pragmas):
+    """Create database"""
+    engine = create_engine("sqlite:///" + os.path.join(directory, "db.sqlite"))
+    if pragmas:
+        event.listen(engine, "connect", set_pragmas)
+    relational.base.metadata.create_all(engine)
+    return engine
+
+
+def main():
+    """Run benchmark"""
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print("{:<14} {:>14} {:>14} {:>8}".format(
+        "rows/sec", "before", "after", "speedup"))
+    for name, model, factory in (("activations", Activation, activations),
+                                 ("object values", ObjectValue, object_values),
+                                 ("variables", Variable, variables)):
+        rates = []
+        for function, pragmas in ((before, False), (after, True)):
+            directory = tempfile.mkdtemp()
+            try:
+                engine = create(directory, pragmas)
+                store = factory(size)
+                start = time.time()
+                function(engine, model, store)
+                rates.append(size / (time.time() - start))
+                engine.dispose()
+            finally:
+                shutil.rmtree(directory)
+        print("{:<14} {:>14.0f} {:>14.0f} {:>7.1f}x".format(
+            name, rates[0], rates[1], rates[1] / rates[0]))
+
+
+if __name__ == "__main__":
+    main()
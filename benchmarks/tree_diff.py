@@ -0,0 +1,117 @@
+# Copyright (c) 2017 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2017 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Tree diff benchmark of the exact and fast diff graph algorithms
+
+Summarizes two random activation preorders with TreeSummarization. The
+second one is a copy of the first one with a few calls changed, removed,
+or added. Reports the time of create_mapping and the cost of the mapping
+(number of deleted and inserted nodes). The exact algorithm (APTED) is
+skipped for trees larger than the exact limit.
+
+Usage: python benchmarks/tree_diff.py [sizes] [exact limit]
+Example: python benchmarks/tree_diff.py 100,1000,10000,50000 300
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import random
+import sys
+import time
+
+PROJ_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJ_ROOT, "capture"))
+
+from noworkflow.now.persistence.models.graphs.diff_graph import (              # pylint: disable=wrong-import-position
+    create_mapping
+)
+from noworkflow.now.persistence.models.graphs.trial_graph import (             # pylint: disable=wrong-import-position
+    TreeSummarization
+)
+from noworkflow.now.utils.data import DotDict                                    # pylint: disable=wrong-import-position
+
+
+NAMES = ["f", "g", "h", "load", "save", "parse", "compute", "print"]
+
+
+def calls(size, seed):
+    """Create (name, depth) calls of a preorder"""
+    rand = random.Random(seed)
+    result = [("script.py", 0)]
+    depth = 0
+    for _ in range(size - 1):
+        depth = rand.randint(1, min(depth + 1, 12))
+        result.append((rand.choice(NAMES), depth))
+    return result
+
+
+def mutate(preorder, seed, changes=10):
+    """Rename, remove, or add calls"""
+    rand = random.Random(seed)
+    result = list(preorder)
+    for _ in range(changes):
+        position = rand.randint(1, len(result) - 1)
+        name, depth = result[position]
+        operation = rand.choice(["rename", "remove", "add"])
+        if operation == "rename":
+            result[position] = ("changed", depth)
+        elif operation == "remove":
+            if (position + 1 == len(result) or
+                    result[position + 1][1] <= depth):
+                del result[position]
+        else:
+            result.insert(position, ("added", depth))
+    return result
+
+
+def activations(preorder, trial_id):
+    """Create activations with caller ids from (name, depth) calls"""
+    result, stack = [], []
+    for aid, (name, depth) in enumerate(preorder, 1):
+        del stack[depth:]
+        result.append(DotDict(
+            id=aid, trial_id=trial_id, name=name, line=NAMES.index(name)
+            if name in NAMES else 0, caller_id=stack[-1] if stack else 0,
+            duration=1))
+        stack.append(aid)
+    return result
+
+
+def trees(size):
+    """Return roots of the summarized trees of both preorders"""
+    preorder = calls(size, size)
+    return (TreeSummarization(activations(preorder, 1)).root,
+            TreeSummarization(activations(mutate(preorder, size), 2)).root)
+
+
+def measure(size, algorithm):
+    """Return time of create_mapping and number of unmatched nodes"""
+    root1, root2 = trees(size)
+    start = time.time()
+    _, id_to_node1, id_to_node2 = create_mapping(root1, root2, algorithm)
+    elapsed = time.time() - start
+    merged = len(set(map(id, id_to_node1.values())) &
+                 set(map(id, id_to_node2.values())))
+    return elapsed, len(id_to_node1) + len(id_to_node2) - 2 * merged
+
+
+def main():
+    """Run benchmark"""
+    sizes = [100, 300, 1000, 3000, 10000, 50000]
+    if len(sys.argv) > 1:
+        sizes = [int(size) for size in sys.argv[1].split(",")]
+    exact_limit = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    print("{:>8} {:>10} {:>8} {:>10} {:>8}".format(
+        "nodes", "exact (s)", "cost", "fast (s)", "cost"))
+    for size in sizes:
+        exact = "{:>10} {:>8}".format("-", "-")
+        if size <= exact_limit:
+            exact = "{:>10.2f} {:>8}".format(*measure(size, "exact"))
+        print("{:>8} {} {:>10.2f} {:>8}".format(
+            size, exact, *measure(size, "fast")))
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,8 @@ from .cmd_helper import Helper
 from .cmd_history import History
 from .cmd_schema import Schema
 from .cmd_gc import GC
+from .cmd_db import DB
+from .cmd_cache import Cache
 from ..utils.io import print_msg
 
 
@@ -52,6 +54,8 @@ def main():
         History(),
         Schema(),
         GC(),
+        DB(),
+        Cache(),
         ProvO()
 
     ]
@@ -86,6 +90,8 @@ __all__ = [
     "Helper",
     "History",
     "GC",
+    "DB",
+    "Cache",
     "main",
     "ProvO"
 ]
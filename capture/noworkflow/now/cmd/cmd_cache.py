@@ -0,0 +1,114 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""'now cache' command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import subprocess
+import sys
+import time
+
+from multiprocessing import Pool, cpu_count
+
+from ..persistence.models import Trial
+from ..persistence import persistence_config, content
+from ..utils.io import print_msg
+
+from .command import Command
+
+
+def init_worker(path, content_engine):
+    """Connect worker process to the provenance store"""
+    persistence_config.content_engine = content_engine
+    persistence_config.connect_existing(path)
+
+
+def warm_trial(trial_id):
+    """Calculate and cache the graphs of trial
+    Return trial id, elapsed time (None if trial is unfinished), and error
+    message"""
+    start = time.time()
+    try:
+        trial = Trial(trial_id)
+        if not trial.finished:
+            return trial_id, None, None
+        trial.graph.warm()
+        return trial_id, time.time() - start, None
+    except Exception as exc:                                                     # pylint: disable=broad-except
+        return trial_id, time.time() - start, str(exc)
+    finally:
+        content.close()
+
+
+def warm(trial_ids, path, content_engine=None, processes=None):
+    """Cache the graphs of trials in a process pool
+    Yield results of warm_trial as they finish.
+    Without a pool, trials use the connection of the current process"""
+    processes = min(processes or cpu_count(), len(trial_ids))
+    if processes <= 1:
+        for trial_id in trial_ids:
+            yield warm_trial(trial_id)
+        return
+    pool = Pool(processes, initializer=init_worker,
+                initargs=(path, content_engine))
+    try:
+        for result in pool.imap_unordered(warm_trial, trial_ids):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def warm_in_background(trial_ids, path, content_engine=None):
+    """Start 'now cache warm' for trials in a detached process"""
+    command = [sys.executable, "-m", "noworkflow", "cache", "warm",
+               "--dir", path]
+    if content_engine:
+        command += ["--content-engine", content_engine]
+    command += [str(trial_id) for trial_id in trial_ids]
+    return subprocess.Popen(
+        command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL, close_fds=True, start_new_session=True)
+
+
+class Cache(Command):
+    """Manage the cache of trial graphs"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("operation", type=str.lower, choices=["warm"],
+                help="R|cache operation\n"
+                     "warm calculates the graphs of trials that are not \n"
+                     "cached yet, so the first views are fast")
+        add_arg("trials", type=str, nargs="*",
+                help="trial ids or none for all finished trials")
+        add_arg("-p", "--processes", type=int, default=None,
+                help="number of worker processes. Default to number of CPUs")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+        add_arg("--content-engine", type=str,
+                help="set the content database engine")
+
+    def execute(self, args):
+        path = os.path.abspath(args.dir or os.getcwd())
+        persistence_config.content_engine = args.content_engine
+        persistence_config.connect_existing(path)
+        if args.trials:
+            trial_ids = [Trial(trial_ref=ref).id for ref in args.trials]
+        else:
+            trial_ids = [trial.id for trial in Trial.all() if trial.finished]
+        for trial_id, duration, error in warm(
+                trial_ids, path, args.content_engine, args.processes):
+            if error is not None:
+                print_msg("trial {}: failed to cache graphs: {}".format(
+                    trial_id, error), True)
+            elif duration is None:
+                print_msg("trial {}: skipped unfinished trial".format(
+                    trial_id), True)
+            else:
+                print_msg("trial {}: graphs cached in {:.2f}s".format(
+                    trial_id, duration), True)
@@ -0,0 +1,35 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""'now db' command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+
+from ..persistence import persistence_config, relational
+from ..utils.io import print_msg
+
+from .command import Command
+
+
+class DB(Command):
+    """Execute maintenance operations in the provenance database"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("operation", type=str.lower, choices=["reindex"],
+                help="R|maintenance operation\n"
+                     "reindex creates missing indexes and rebuilds the \n"
+                     "existing ones (e.g., after a failed --bulk-load run)")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+
+    def execute(self, args):
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        if args.operation == "reindex":
+            created, rebuilt = relational.create_indexes(rebuild=True)
+            print_msg("{} indexes created, {} indexes rebuilt".format(
+                created, rebuilt), True)
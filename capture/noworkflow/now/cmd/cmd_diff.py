@@ -13,6 +13,7 @@ from future.utils import viewitems, viewkeys
 
 from ..ipython.converter import create_ipynb
 from ..persistence.models.diff import Diff as DiffModel
+from ..persistence.models.graphs.diff_graph import ALGORITHMS
 from ..persistence import persistence_config
 from ..utils import io
 from ..utils.io import print_msg
@@ -178,6 +179,13 @@ class Diff(NotebookCommand, ProvOCommand):
                 help="hide timestamps (does not apply to -p option)")
         add_arg("--brief", action="store_true",
                 help="display a concise version of diff (does not apply to -p option)")
+        add_arg("--algorithm", choices=ALGORITHMS, default="fast",
+                help="R|algorithm that matches the activation trees in the \n"
+                     "diff graph (default: fast).\n"
+                     "fast matches identical subtrees first and runs the \n"
+                     "exact algorithm only on small regions that differ.\n"
+                     "exact computes the minimum tree edit distance. It \n"
+                     "does not scale to trees with thousands of nodes")
         add_arg("-p", "--provo", action="store_true",
                 help="export comparison as prov-o document; suppresses console output")
         self.add_provo_export_args()
@@ -201,7 +209,8 @@ class Diff(NotebookCommand, ProvOCommand):
             access_extra = ("mode", "buffering", "content_hash_before",
                             "content_hash_after", "timestamp", "stack")
 
-        diff = DiffModel(args.trial1, args.trial2)
+        diff = DiffModel(args.trial1, args.trial2,
+                         graph_algorithm=args.algorithm)
 
         io.verbose = args.verbose
         if not args.provo:
@@ -224,8 +233,9 @@ class Diff(NotebookCommand, ProvOCommand):
                 "diff = nip.Diff('{0}', '{1}')\n"
                 "# diff.graph.view = 0\n"
                 "# diff.graph.mode = 3\n"
+                "diff.graph.algorithm = '{2}'\n"
                 "# diff.graph.width = 500\n"
                 "# diff.graph.height = 500\n"
                 "# <codecell>\n"
-                "diff").format(args.trial1, args.trial2)
+                "diff").format(args.trial1, args.trial2, args.algorithm)
         create_ipynb(name, code)
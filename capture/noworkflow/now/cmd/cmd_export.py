@@ -9,10 +9,12 @@ from __future__ import (absolute_import, print_function,
 import os
 
 from argparse import Namespace
+from itertools import chain
 
 from ..persistence.models.graphs.dependency_graph import DependencyConfig
 from ..persistence.models import Trial
 from ..persistence import persistence_config
+from ..utils.io import open_output, write_lines
 
 
 from .command import NotebookCommand
@@ -35,6 +37,11 @@ class Export(NotebookCommand):
                      "'history' or 'diff:<trial_id_1>:<trial_id_2>'")
         add_arg("-t", "--hide-timestamps", action="store_true",
                 help="hide timestamps")
+        add_arg("-o", "--output", type=str,
+                help="write facts to file instead of stdout. Files with .gz "
+                     "extension are compressed")
+        add_arg("-z", "--gzip", action="store_true",
+                help="compress output with gzip")
         add_arg("--dir", type=str,
                 help="set project path where is the database. Default to "
                      "current directory")
@@ -49,9 +56,11 @@ class Export(NotebookCommand):
             PrologTimestamp.use_nil = True
         trial = Trial(trial_ref=args.trial)
         trial.dependency_config.read_args(args)
-        print(trial.prolog.export_text_facts())
+        lines = trial.prolog.export_facts()
         if args.rules:
-            print("\n".join(trial.prolog.rules()))
+            lines = chain(lines, trial.prolog.rules())
+        with open_output(args.output, args.gzip) as output:
+            write_lines(output, lines)
 
     def execute_export(self, args):
         namespace = Namespace(ipynb=True, dir=args.dir)
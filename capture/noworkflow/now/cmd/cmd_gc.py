@@ -17,7 +17,7 @@ from .command import Command
 
 
 class GC(Command):
-    """Executes the git garbage collection in the content database"""
+    """Executes the garbage collection in the content database"""
 
     def add_arguments(self):
         add_arg = self.add_argument
@@ -32,4 +32,4 @@ class GC(Command):
     def execute(self, args):
         persistence_config.content_engine = args.content_engine
         persistence_config.connect_existing(args.dir or os.getcwd())
-        content.gc()
+        content.gc(aggressive=args.aggressive)
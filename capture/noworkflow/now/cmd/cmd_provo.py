@@ -7,8 +7,11 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 import os
+import sys
 
-from noworkflow.now.persistence.provo.export import export_writer
+from collections import OrderedDict
+
+from noworkflow.now.persistence.provo.export import export_writer, stream_writer
 from ..persistence.models import Trial
 from ..persistence import persistence_config
 from ..utils import io
@@ -19,6 +22,8 @@ from .command import ProvOCommand
 class ProvO(ProvOCommand):
     """Export the collected provenance of a trial in PROV-O format"""
 
+    output_formats = OrderedDict(list(ProvOCommand.output_formats.items()) + [("jsonl", ".jsonl")])
+
     def add_arguments(self):
         add_arg = self.add_argument
         add_arg("trial", type=str, nargs="?",
@@ -37,6 +42,10 @@ class ProvO(ProvOCommand):
                 help="Sets the maximum recursion depth when analyzing function activations from within function activations. Any value"
                      " less than 1 results in no restriction (besides maximum stack size). Default: 0")
         self.add_provo_export_args()
+        add_arg("-s", "--stream", action="store_true",
+                help="write provn records while they are read, without building the document in memory. "
+                     "Trials with more than {} activations are always streamed in provn. "
+                     "The jsonl format is always streamed".format(stream_writer.STREAM_THRESHOLD))
         add_arg("-v", "--verbose", action="store_true",
                 help="increase output verbosity")
         add_arg("--dir", type=str,
@@ -57,4 +66,10 @@ class ProvO(ProvOCommand):
         self.validate_export_params(args.format, args.graph_dir)
 
         io.verbose = args.verbose
-        export_writer.export_provo(trial, args, self.get_extension(args.format))
+        if args.stream and args.format not in stream_writer.WRITERS:
+            io.print_msg("Format \"{}\" cannot be streamed. Use provn or jsonl".format(args.format), True)
+            sys.exit(1)
+        if stream_writer.should_stream(trial, args):
+            stream_writer.export_provo(trial, args, self.get_extension(args.format))
+        else:
+            export_writer.export_provo(trial, args, self.get_extension(args.format))
@@ -16,6 +16,7 @@ from future.utils import viewitems
 from ..collection.metadata import Metascript
 from ..persistence.models import Trial, Module, Dependency, FileAccess
 from ..persistence import persistence_config, content
+from ..persistence.content.base import AmbiguousHashError
 from ..utils.io import print_msg
 
 from .command import Command
@@ -210,7 +211,11 @@ class Restore(Command):
                 return access.name, access.content_hash_before
         if len(fid) >= 6:
             # at least 6 letters to look for code hash
-            code_hash = content.find_subhash(fid)
+            try:
+                code_hash = content.find_subhash(fid)
+            except AmbiguousHashError as error:
+                print_msg(str(error), True)
+                return None
             if code_hash:
                 return path, code_hash
 
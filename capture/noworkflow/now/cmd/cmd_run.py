@@ -13,12 +13,14 @@ import sys
 from ..collection.metadata import Metascript
 from ..persistence.models import Tag, Trial
 from ..utils import io, metaprofiler
-from ..persistence import content
+from ..persistence import content, hash_cache, persistence_config
+from ..persistence.writer import POLICIES
 from ..utils.cross_version import PY3
 
 
 
 from .command import Command
+from .cmd_cache import warm_in_background
 
 
 def non_negative(string):
@@ -30,6 +32,15 @@ def non_negative(string):
     return value
 
 
+def positive(string):
+    """Check if argument is >= 1"""
+    value = int(string)
+    if value < 1:
+        raise argparse.ArgumentTypeError(
+            "{} is not a positive integer value".format(string))
+    return value
+
+
 class ScriptArgs(argparse.Action):                                               # pylint: disable=too-few-public-methods
     """Action to create script attribute"""
     def __call__(self, parser, namespace, values, option_string=None):
@@ -68,6 +79,13 @@ def run(metascript, args=None):
         metascript.execution.store_provenance()
 
         content.commit_content(metascript.message or "Trial {}".format(metascript.trial_id))
+        hash_cache.save()
+
+        if args is not None and getattr(args, "precompute_graphs", False):
+            io.print_msg("caching trial graphs in the background")
+            warm_in_background([metascript.trial_id],
+                               persistence_config.base_path,
+                               args.content_engine)
 
     finally:
         metascript.create_last()
@@ -114,10 +132,13 @@ class Run(Command):
                      "selected context (default: 1)")
         add_arg("-e", "--execution-provenance",
                 default=self.default_execution_provenance,
-                choices=["Profiler", "Tracer", "Tracker"],
+                choices=["Profiler", "Tracer", "Tracker", "Monitoring"],
                 help="R|execution provenance provider. (default: Profiler)\n"
                      "Profiler captures function calls, parameters, file \n"
                      "accesses, and globals. \n"
+                     "Monitoring captures everything the Profiler captures,\n"
+                     "using sys.monitoring (Python >= 3.12) to skip events \n"
+                     "of non-user code beyond the depth thresholds.\n"
                      "Tracker captures everything the Profiler captures, \n"
                      "in addition to variables and dependencies.\n"
                      "Tracer is an alias to Tracker")
@@ -131,6 +152,22 @@ class Run(Command):
         add_arg("-S", "--call-storage-frequency", type=non_negative,
                 default=self.default_call_storage_frequency,
                 help="frequency (in calls) to save partial provenance")
+        add_arg("--columnar-activations", action="store_true",
+                help="store activations in arrays during the collection. "
+                     "It reduces the memory usage of long executions")
+        add_arg("--background-store", choices=POLICIES, default=None,
+                help="R|save partial provenance in a background thread.\n"
+                     "The value defines what happens when its queue is full:\n"
+                     "block waits for the writer thread; \n"
+                     "drop-args discards argument values and waits; \n"
+                     "spill writes the batch to .noworkflow/spill")
+        add_arg("--background-queue-size", type=positive, default=8,
+                help="maximum number of partial saves waiting for the "
+                     "background thread (default: 8)")
+        add_arg("--bulk-load", action="store_true",
+                help="drop the indexes of execution tables while the trial "
+                     "is stored and rebuild them at the end. If it fails, "
+                     "use 'now db reindex'")
 
         # Other
         if not self.is_ipython:
@@ -152,7 +189,11 @@ class Run(Command):
         add_arg("--message", type=str, default=None,
                 help="add a message to the commit of the trial")
         add_arg("--content-engine", type=str,
-                help="set the content database engine")
+                help="set the content database engine. Use plain+zlib, "
+                     "plain+zstd, or plain+lz4 to compress new objects")
+        add_arg("--precompute-graphs", action="store_true",
+                help="calculate and cache the trial graphs in a background "
+                     "process after the execution, as 'now cache warm' does")
                                 
 
         # Internal
@@ -165,6 +206,9 @@ class Run(Command):
         if args.execution_provenance in ["Tracer", "Tracker"] and sys.version_info > (3, 6):
             print("The provenance provider {} does not work on Python >= 3.6. Please upgrade to noWorkflow 2".format(args.execution_provenance))
             sys.exit(1)
+        if args.execution_provenance == "Monitoring" and sys.version_info < (3, 12):
+            print("The provenance provider Monitoring requires Python >= 3.12. Please use the Profiler")
+            sys.exit(1)
         if args.meta:
             metaprofiler.meta_profiler.active = False
             metaprofiler.meta_profiler.data["cmd"] = " ".join(sys.argv)
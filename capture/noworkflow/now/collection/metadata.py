@@ -15,7 +15,7 @@ from datetime import datetime
 from pyposast import native_decode_source
 
 from ..persistence import persistence_config, get_serializer
-from ..persistence.lightweight import ObjectStore
+from ..persistence.lightweight import ObjectStore, ColumnarActivationStore
 from ..persistence.lightweight import DefinitionLW, ObjectLW
 from ..persistence.lightweight import EnvironmentAttrLW
 from ..persistence.lightweight import ModuleLW, DependencyLW
@@ -116,6 +116,14 @@ class Metascript(object):
         self.save_frequency = 1000
         # Save after closing X activations
         self.call_storage_frequency = 0
+        # Store activations in columns during collection : bool
+        self.columnar_activations = False
+        # Back-pressure policy of the background writer. None is synchronous
+        self.background_store = None
+        # Maximum number of batches waiting for the background writer : int
+        self.background_queue_size = 8
+        # Drop indexes of execution tables during the execution : bool
+        self.bulk_load = False
 
         # Passed arguments : str
         self.command = ""
@@ -254,6 +262,13 @@ class Metascript(object):
         self.execution_provenance = args.execution_provenance
         self.save_frequency = args.save_frequency
         self.call_storage_frequency = args.call_storage_frequency
+        self.columnar_activations = args.columnar_activations
+        self.background_store = args.background_store
+        self.background_queue_size = args.background_queue_size
+        self.bulk_load = args.bulk_load
+        if self.columnar_activations:
+            self.activations_store = ColumnarActivationStore(
+                slicing=self.execution_provenance in ("Tracer", "Tracker"))
         self.message = args.message
         self.content_engine = persistence_config.content_engine = args.content_engine
         io.print_msg("setting up local provenance store")
@@ -9,11 +9,14 @@ from __future__ import (absolute_import, print_function,
 import traceback
 import weakref
 
+from ...persistence import relational
+from ...persistence.relational_database import BULK_TABLES
 from ...utils.cross_version import cross_compile
 from ...utils.io import print_msg
 from ...utils.metaprofiler import meta_profiler
 
 from .debugger import debugger_builtins
+from .monitoring import Monitoring                                               # pylint: disable=unused-import
 from .profiler import Profiler
 from .slicing import Tracer                                                      # pylint: disable=unused-import
 
@@ -47,6 +50,10 @@ class Execution(object):
         metascript = self.metascript
         self.set_provider()
 
+        if metascript.bulk_load:
+            print_msg("  dropping indexes for bulk loading")
+            relational.drop_indexes()
+
         if metascript.compiled is None:
             metascript.compiled = cross_compile(
                 metascript.code, metascript.path, "exec"
@@ -82,6 +89,11 @@ class Execution(object):
     def store_provenance(self):
         """Disable provider and store provenance"""
         self.provider.teardown()
-        self.provider.store(partial=self.partial)
+        try:
+            self.provider.store(partial=self.partial)
+        finally:
+            if self.metascript.bulk_load:
+                print_msg("  rebuilding indexes")
+                relational.create_indexes(BULK_TABLES)
         if self.msg:
             print_msg(self.msg, self.force_msg)
@@ -0,0 +1,255 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Monitoring Provider. Profiler based on PEP 669 (sys.monitoring)"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import sys
+import types
+
+from functools import partial
+from threading import get_ident
+
+from .profiler import Profiler
+
+
+TOOL_NAME = "noworkflow"
+# Tool ids that can be used by noWorkflow, in order of preference.
+# 2 is sys.monitoring.PROFILER_ID. 0, 1 and 5 are reserved to debuggers,
+# coverage tools and optimizers
+TOOL_IDS = (2, 3, 4)
+
+_getframe = sys._getframe                                                        # pylint: disable=protected-access, invalid-name
+
+
+def callee_codes(func):
+    """Return code objects that may start when func is called"""
+    codes = []
+    if isinstance(func, partial):
+        return callee_codes(func.func)
+    func = getattr(func, "__func__", func)
+    code = getattr(func, "__code__", None)
+    if code is not None:
+        codes.append(code)
+    elif isinstance(func, type):
+        for name in ("__new__", "__init__"):
+            code = getattr(getattr(func, name, None), "__code__", None)
+            if code is not None:
+                codes.append(code)
+    else:
+        call = getattr(type(func), "__call__", None)
+        code = getattr(call, "__code__", None)
+        if code is not None:
+            codes.append(code)
+    return codes
+
+
+class Monitoring(Profiler):                                                      # pylint: disable=too-many-instance-attributes
+    """Monitoring
+
+    Collect the same provenance as the Profiler, but using sys.monitoring
+    (Python >= 3.12) instead of sys.setprofile.
+
+    Non-user code objects that start beyond the depth thresholds are disabled
+    through sys.monitoring.DISABLE. Their calls do not produce events anymore,
+    unless they are called from a visible call site. In this case, all events
+    are restarted and the code object is never disabled again.
+    """
+
+    def __init__(self, *args):
+        super(Monitoring, self).__init__(*args)
+        self.tool_id = None
+        # Only the thread that executes the script is monitored
+        self.thread_id = None
+        # Frames that reached the Profiler handlers.
+        #   (frame, None) represents a Python call
+        #   (caller frame, callable) represents a C call
+        self.frames = []
+        # Non-user code objects that were disabled
+        self.disabled_codes = set()
+        # Non-user code objects that started in a valid depth
+        self.shallow_codes = set()
+
+    def is_visible(self, frame):
+        """Check if frame is the last frame that reached the Profiler"""
+        return self.frames[-1][0] is frame
+
+    def is_c_call(self, func, arg0):
+        """Return the object that sys.setprofile would send to c_call
+        or None, if sys.setprofile would not produce an event"""
+        if isinstance(func, types.BuiltinFunctionType):
+            return func
+        if (type(func) is types.MethodDescriptorType                            # pylint: disable=unidiomatic-typecheck
+                and arg0 is not sys.monitoring.MISSING):
+            return func.__get__(arg0, type(arg0))
+        return None
+
+    def restart(self, func):
+        """Restart events if func starts a disabled code object
+        in a valid depth"""
+        if not self.valid_non_user_call():
+            return
+        restart = False
+        for code in callee_codes(func):
+            if code in self.disabled_codes:
+                self.shallow_codes.add(code)
+                restart = True
+        if restart:
+            self.disabled_codes.clear()
+            sys.monitoring.restart_events()
+
+    def valid_non_user_call(self):
+        """Check if a non-user call would be in a valid depth"""
+        depth_non_user = self.depth_non_user + 1
+        depth = self.depth_user + depth_non_user
+        return (depth <= self.depth_threshold and
+                depth_non_user <= self.non_user_depth_threshold)
+
+    def start(self, code, disable):
+        """Trace call if the frame is visible
+
+        Arguments:
+        code -- started code object
+        disable -- value to return when the code object should be disabled
+        """
+        if get_ident() != self.thread_id:
+            return None
+        if code in self.disabled_codes:
+            return disable
+        frame = _getframe(2)
+        in_paths = code.co_filename in self.paths
+        if not self.is_visible(frame.f_back):
+            # Hidden by a disabled code object
+            if in_paths or code in self.shallow_codes:
+                return None
+            self.disabled_codes.add(code)
+            return disable
+        if self.enabled and not in_paths and code not in self.shallow_codes:
+            if not self.valid_non_user_call():
+                self.disabled_codes.add(code)
+                return disable
+            self.shallow_codes.add(code)
+        self.frames.append((frame, None))
+        self.tracer(frame, "call", None)
+        return None
+
+    def monitor_start(self, code, instruction_offset):                           # pylint: disable=unused-argument
+        """Monitor PY_START and PY_RESUME. Trace call"""
+        return self.start(code, sys.monitoring.DISABLE)
+
+    def monitor_throw(self, code, instruction_offset, exception):                # pylint: disable=unused-argument
+        """Monitor PY_THROW. Trace call. It cannot be disabled"""
+        self.start(code, None)
+
+    def monitor_return(self, code, instruction_offset, retval):                  # pylint: disable=unused-argument
+        """Monitor PY_RETURN and PY_YIELD. Trace return"""
+        if get_ident() != self.thread_id:
+            return None
+        frame = _getframe(1)
+        if not self.is_visible(frame):
+            if code in self.disabled_codes:
+                return sys.monitoring.DISABLE
+            return None
+        self.frames.pop()
+        self.tracer(frame, "return", retval)
+        return None
+
+    def monitor_unwind(self, code, instruction_offset, exception):               # pylint: disable=unused-argument
+        """Monitor PY_UNWIND. Trace return. It cannot be disabled"""
+        if get_ident() != self.thread_id:
+            return
+        frame = _getframe(1)
+        if self.is_visible(frame):
+            self.frames.pop()
+            self.tracer(frame, "return", None)
+
+    def monitor_call(self, code, instruction_offset, func, arg0):                # pylint: disable=unused-argument
+        """Monitor CALL. Trace c_call"""
+        if get_ident() != self.thread_id:
+            return None
+        if code in self.disabled_codes:
+            return sys.monitoring.DISABLE
+        frame = _getframe(1)
+        if not self.is_visible(frame):
+            return None
+        arg = self.is_c_call(func, arg0)
+        if arg is None:
+            if self.disabled_codes:
+                self.restart(func)
+            return None
+        self.frames.append((frame, func))
+        self.tracer(frame, "c_call", arg)
+        return None
+
+    def c_return(self, frame, func, event):
+        """Trace c_return or c_exception of func called by frame"""
+        if get_ident() != self.thread_id:
+            return
+        last_frame, last_func = self.frames[-1]
+        if last_frame is frame and last_func is func:
+            self.frames.pop()
+            self.tracer(frame, event, func)
+
+    def monitor_c_return(self, code, instruction_offset, func, arg0):            # pylint: disable=unused-argument
+        """Monitor C_RETURN. Trace c_return. It cannot be disabled"""
+        self.c_return(_getframe(1), func, "c_return")
+
+    def monitor_c_raise(self, code, instruction_offset, func, arg0):             # pylint: disable=unused-argument
+        """Monitor C_RAISE. Trace c_exception. It cannot be disabled"""
+        self.c_return(_getframe(1), func, "c_exception")
+
+    def callbacks(self):
+        """Return sys.monitoring events and their callbacks"""
+        events = sys.monitoring.events
+        return (
+            (events.PY_START, self.monitor_start),
+            (events.PY_RESUME, self.monitor_start),
+            (events.PY_THROW, self.monitor_throw),
+            (events.PY_RETURN, self.monitor_return),
+            (events.PY_YIELD, self.monitor_return),
+            (events.PY_UNWIND, self.monitor_unwind),
+            (events.CALL, self.monitor_call),
+            (events.C_RETURN, self.monitor_c_return),
+            (events.C_RAISE, self.monitor_c_raise),
+        )
+
+    def tearup(self):
+        """Activate monitoring"""
+        monitoring = sys.monitoring
+        events = monitoring.events
+        for tool_id in TOOL_IDS:
+            if monitoring.get_tool(tool_id) is None:
+                self.tool_id = tool_id
+                break
+        else:
+            raise RuntimeError("There is no sys.monitoring tool id available")
+        monitoring.use_tool_id(self.tool_id, TOOL_NAME)
+
+        event_set = events.NO_EVENTS
+        for event, callback in self.callbacks():
+            monitoring.register_callback(self.tool_id, event, callback)
+            event_set |= event
+
+        self.thread_id = get_ident()
+        # The caller of tearup executes the script.
+        #   (None, None) is a sentinel for events after its return
+        self.frames = [(None, None), (_getframe(1), None)]
+        # sys.monitoring does not produce the return event of tearup
+        self.skip_first_return = False
+        monitoring.set_events(self.tool_id, event_set)
+
+    def teardown(self):
+        """Deactivate monitoring"""
+        super(Monitoring, self).teardown()
+        if self.tool_id is None:
+            return
+        monitoring = sys.monitoring
+        events = monitoring.events
+        monitoring.set_events(self.tool_id, events.NO_EVENTS)
+        for event, _ in self.callbacks():
+            monitoring.register_callback(self.tool_id, event, None)
+        monitoring.free_tool_id(self.tool_id)
+        monitoring.restart_events()
+        self.tool_id = None
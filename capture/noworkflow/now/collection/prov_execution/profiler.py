@@ -16,8 +16,10 @@ import codecs
 
 from datetime import datetime
 
-from ...persistence import content
+from ...persistence import content, relational, hash_cache
+from ...persistence.hash_cache import stat_key
 from ...persistence.models import Activation, ObjectValue, FileAccess, Trial
+from ...persistence.writer import BackgroundWriter
 from ...utils.cross_version import builtins
 
 from .base import ExecutionProvider
@@ -60,6 +62,16 @@ MODES = {
     "O_SHLOCK": None,
     "O_EXLOCK": None,
 }
+# Modes that may change the content of a file
+WRITE_MODES = ("w", "a", "x", "+", "O_CREAT", "O_TRUNC")
+
+
+def is_read_only(mode):
+    """Check if open mode cannot change the file"""
+    try:
+        return not any(flag in mode for flag in WRITE_MODES)
+    except TypeError:
+        return False
 
 
 class Profiler(ExecutionProvider):                                               # pylint: disable=too-many-instance-attributes
@@ -80,6 +92,7 @@ class Profiler(ExecutionProvider):
         io.open = self.new_open(io.open)
         codecs.open = self.new_open(codecs.open)
         os.open = self.new_open(os.open, osopen=True)
+        hash_cache.set_engine(type(content.content_database_engine).__name__)
 
         # the number of user functions activated
         #   (starts with -1 to compensate the first call to the script itself)
@@ -113,6 +126,13 @@ class Profiler(ExecutionProvider):
 
         self.timer = time.time
         self.last_time = self.timer()
+        # Background writer for partial saves
+        self.writer = None
+        if self.metascript.background_store:
+            self.writer = BackgroundWriter(
+                self.metascript.background_store,
+                self.metascript.background_queue_size)
+            self.writer.start()
 
         # Events are unique
         self.unique_events = True
@@ -154,12 +174,11 @@ class Profiler(ExecutionProvider):
                 fid = self.file_accesses.add(name)
                 file_access = self.file_accesses[fid]
 
-                if os.path.exists(name):
+                stat = stat_key(name)
+                if stat is not None:
                     # Read previous content if file exists
-                    with content.std_open(name, "rb") as fil:
-                        file_access.content_hash_before = content.put(        
-                            fil.read(), name
-                        )
+                    file_access.content_hash_before = self.file_hash(
+                        name, stat)
 
                 # Update with the informed keyword arguments (mode / buffering)
                 file_access.update(kwargs)
@@ -178,11 +197,24 @@ class Profiler(ExecutionProvider):
 
                     file_access.mode = mode
 
+                if is_read_only(file_access.mode):
+                    file_access.stat = stat
                 self.add_file_access(file_access)
             return old_open(name, *args, **kwargs)
 
         return open
 
+    def file_hash(self, name, stat):
+        """Put file into content database. Reuse the hash of unchanged files
+        without reading them"""
+        content_hash = hash_cache.get(stat)
+        if content_hash is not None:
+            content.reuse(content_hash, name)
+            return content_hash
+        content_hash = content.put_path(name)
+        hash_cache.set(stat, content_hash)
+        return content_hash
+
     def add_file_access(self, file_access):
         """After activation that called open finish, add file_accesses to it"""
         activation = self.current_activation
@@ -230,9 +262,15 @@ class Profiler(ExecutionProvider):
         # Update content of accessed files
         for file_access in activation.file_accesses:
             # Checks if file still exists
-            if os.path.exists(file_access.name):
-                with content.std_open(file_access.name, "rb") as fil:
-                    file_access.content_hash_after = content.put(fil.read(), file_access.name)
+            stat = stat_key(file_access.name)
+            if stat is None:
+                pass
+            elif file_access.stat is not None and stat == file_access.stat:
+                # Read-only access of an unchanged file
+                file_access.content_hash_after = file_access.content_hash_before
+            else:
+                file_access.content_hash_after = self.file_hash(
+                    file_access.name, stat)
             file_access.done = True
         self.closed_activations += 1
         if (self.call_storage_frequency and
@@ -353,13 +391,29 @@ class Profiler(ExecutionProvider):
     def store(self, partial=False):
         """Store execution provenance"""
         tid = self.trial_id
+        if self.writer is not None:
+            # The traced thread never executes SQL
+            self.writer.store(tid, self.stores(), partial)
+            if partial:
+                return
+            self.writer.close()
         if not partial:
             now = datetime.now()
             Trial.fast_update(tid, now, self.metascript.docstring)
 
-        Activation.fast_store(tid, self.activations, partial)
-        ObjectValue.fast_store(tid, self.object_values, partial)
-        FileAccess.fast_store(tid, self.file_accesses, partial)
+        if self.writer is None:
+            # Single transaction for each save
+            with relational.engine.begin() as conn:
+                for model, object_store in self.stores():
+                    model.fast_store(tid, object_store, partial, conn)
+
+    def stores(self):
+        """Return models and object stores of execution provenance"""
+        return [
+            (Activation, self.activations),
+            (ObjectValue, self.object_values),
+            (FileAccess, self.file_accesses),
+        ]
 
     def tearup(self):
         """Activate profiler"""
@@ -667,10 +667,14 @@ class Tracer(Profiler):
             while len(self.activation_stack) > 1:
                 self.close_activation(None, "store", None)
         super(Tracer, self).store(partial=partial)
-        tid = self.trial_id
-        Variable.fast_store(tid, self.variables, partial)
-        VariableDependency.fast_store(tid, self.dependencies, partial)
-        VariableUsage.fast_store(tid, self.usages, partial)
+
+    def stores(self):
+        """Return models and object stores of execution provenance"""
+        return super(Tracer, self).stores() + [
+            (Variable, self.variables),
+            (VariableDependency, self.dependencies),
+            (VariableUsage, self.usages),
+        ]
 
     def view_slicing_data(self, show=True):
         """View captured slicing"""
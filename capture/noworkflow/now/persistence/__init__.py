@@ -8,11 +8,13 @@ from __future__ import (absolute_import, print_function,
 
 from .config import PersistenceConfig
 from .content_database import ContentDatabase
+from .hash_cache import HashCache
 from .relational_database import RelationalDatabase
 
 persistence_config = PersistenceConfig()                                         # pylint: disable=invalid-name
 content = ContentDatabase(persistence_config)                                    # pylint: disable=invalid-name
 relational = RelationalDatabase(persistence_config)                              # pylint: disable=invalid-name
+hash_cache = HashCache(persistence_config)                                       # pylint: disable=invalid-name
 
 
 def get_serializer(arg):                                                         # pylint: disable=unused-argument
@@ -30,5 +32,6 @@ __all__ = [
     "persistence_config",
     "content",
     "relational",
+    "hash_cache",
     "get_serializer"
 ]
@@ -5,8 +5,42 @@ import builtins
 import hashlib
 
 from contextlib import contextmanager
+from functools import partial
+from ...utils.io import print_msg
 from . import safeopen
 
+# Size of the chunks that are read from files while hashing and storing them
+CHUNK_SIZE = 1 << 20
+
+
+def read_chunks(fileobj, size=CHUNK_SIZE):
+    """Iterate over the remaining content of a binary file object"""
+    return iter(partial(fileobj.read, size), b"")
+
+
+def hash_stream(fileobj):
+    """Calculate sha1 of file object in chunks"""
+    sha1 = hashlib.sha1()
+    for chunk in read_chunks(fileobj):
+        sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+HEX_DIGITS = "0123456789abcdef"
+
+
+class AmbiguousHashError(ValueError):
+    """Hash prefix matches more than one object"""
+
+    def __init__(self, prefix, candidates=()):
+        self.prefix = prefix
+        self.candidates = list(candidates)
+        message = "hash prefix {} is ambiguous".format(prefix)
+        if self.candidates:
+            message += ". Candidates: " + ", ".join(self.candidates)
+        super(AmbiguousHashError, self).__init__(message)
+
+
 class ContentDatabaseEngine(object):
     def __init__(self, config):
         self.content_path = None
@@ -32,8 +66,25 @@ class ContentDatabaseEngine(object):
             """Mock get"""
             return self.temp[content_hash]
 
+        def put_stream(fileobj, filename="generic"):
+            """Mock put_stream"""
+            return put(fileobj.read(), filename)
+
+        def put_path(path, filename=None):
+            """Mock put_path"""
+            with safeopen.std_open(path, "rb") as fileobj:
+                return put(fileobj.read(), filename)
+
         self.put = put
         self.get = get
+        self.put_stream = put_stream
+        self.put_path = put_path
+
+    def set_compression(self, name):
+        """Set compression codec of new objects. None disables compression"""
+        if name is not None:
+            print_msg("content engine {} does not support compression"
+                      .format(type(self).__name__), True)
 
     def connect(self, should_mock=False):
         """Connect to content database"""
@@ -47,15 +98,36 @@ class ContentDatabaseEngine(object):
         """Put file into database"""
         raise NotImplementedError("Implement in subclass")
 
+    def _get_hash_from_content(self, content):
+        """Calculate hash from content"""
+        return hashlib.sha1(content).hexdigest()
+
+    def put_stream(self, fileobj, filename="generic"):  # pylint: disable=method-hidden
+        """Put content of binary file object into database.
+        Engines that support it should not read the whole content at once"""
+        return self.put(fileobj.read(), filename)
+
+    def put_path(self, path, filename=None):  # pylint: disable=method-hidden
+        """Put content of file into database"""
+        if filename is None:
+            filename = path
+        with safeopen.std_open(path, "rb") as fileobj:
+            return self.put_stream(fileobj, filename)
+
     def get(self, content_hash):  # pylint: disable=method-hidden
         """Get file from database"""
         raise NotImplementedError("Implement in subclass")
 
+    def reuse(self, content_hash, filename="generic"):
+        """Register a known content hash without storing its content again"""
+        pass  # do nothing by default
+
     def find_subhash(self, content_hash):
-        """Find hash in database"""
+        """Find hash in database that starts with content_hash.
+        Raise AmbiguousHashError if there are many"""
         raise NotImplementedError("Implement in subclass")
 
-    def gc(self, content_hash):
+    def gc(self, aggressive=False):
         """Collect garbage from database"""
         raise NotImplementedError("Implement in subclass")
 
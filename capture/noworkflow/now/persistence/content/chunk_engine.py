@@ -0,0 +1,330 @@
+# Copyright (c) 2019 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2019 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content-defined chunking content database engine"""
+import hashlib
+import os
+import struct
+import threading
+
+from os.path import join, isdir, isfile
+
+from ...utils.io import print_msg
+from .base import ContentDatabaseEngine, CHUNK_SIZE, hash_stream
+from .hash_index import HashIndex
+from . import hash_index
+from . import safeopen
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+CHUNK_DATABASE_DIR = "content.chunks"
+OBJECTS_DIR = "objects"
+CHUNKS_DIR = "chunks"
+
+# Object files start with their type
+RAW = b"R"
+MANIFEST = b"M"
+
+# FastCDC parameters
+MIN_SIZE = 2 * 1024
+AVG_SIZE = 8 * 1024
+MAX_SIZE = 64 * 1024
+BITS = 13  # log2(AVG_SIZE)
+WORD = (1 << 64) - 1
+# Normalized chunking: it is harder to cut before AVG_SIZE, and easier after
+MASK_S = ((1 << (BITS + 2)) - 1) << (64 - BITS - 2)
+MASK_L = ((1 << (BITS - 2)) - 1) << (64 - BITS + 2)
+# Deterministic gear table
+GEAR = [
+    struct.unpack(">Q", hashlib.sha1(struct.pack(">B", i)).digest()[:8])[0]
+    for i in range(256)
+]
+GEAR_ARRAY = None if numpy is None else numpy.array(GEAR, dtype=numpy.uint64)
+# Fingerprints depend only on the last WINDOW bytes
+WINDOW = 64
+# Number of bytes of gear_candidates blocks. Blocks that fit in the CPU
+# cache are faster than a single pass over the buffer
+BLOCK_SIZE = 64 * 1024
+
+
+def gear_candidates(data):
+    """Return positions of data where fingerprints of the last WINDOW bytes
+    satisfy MASK_S and MASK_L, as sorted arrays. Return None without numpy
+
+    A position is the index after the last byte of the fingerprint, as in
+    cut_point. Fingerprints are calculated in blocks of BLOCK_SIZE bytes"""
+    if numpy is None:
+        return None
+    values = numpy.frombuffer(data, dtype=numpy.uint8)
+    shifted = numpy.empty(BLOCK_SIZE + WINDOW, dtype=numpy.uint64)
+    small = [numpy.empty(0, dtype=numpy.intp)]
+    large = [numpy.empty(0, dtype=numpy.intp)]
+    for begin in range(0, len(values), BLOCK_SIZE):
+        # Previous bytes complete the first fingerprints of the block
+        first = max(0, begin - WINDOW + 1)
+        fingerprints = GEAR_ARRAY.take(values[first:begin + BLOCK_SIZE])
+        size = len(fingerprints)
+        # Add the gear values of previous bytes shifted by their distance.
+        # uint64 arithmetic wraps as & WORD does
+        shift = 1
+        while shift < min(WINDOW, size):
+            numpy.left_shift(fingerprints[:-shift], numpy.uint64(shift),
+                             out=shifted[:size - shift])
+            fingerprints[shift:] += shifted[:size - shift]
+            shift *= 2
+        fingerprints = fingerprints[begin - first:]
+        # Masks have the highest bits. Fingerprints without them are smaller
+        small.append(numpy.flatnonzero(
+            fingerprints <= numpy.uint64(WORD ^ MASK_S)) + begin + 1)
+        large.append(numpy.flatnonzero(
+            fingerprints <= numpy.uint64(WORD ^ MASK_L)) + begin + 1)
+    return numpy.concatenate(small), numpy.concatenate(large)
+
+
+def cut_point(data, start, end, candidates=None):
+    """Return the size of the chunk that starts at data[start]
+
+    Arguments:
+    data -- buffer
+    start -- chunk start
+    end -- end of the available data. It must be the end of the content
+           or at least start + MAX_SIZE
+    candidates -- result of gear_candidates(data). Without it, fingerprints
+                  are calculated byte by byte
+    """
+    size = end - start
+    if size <= MIN_SIZE:
+        return size
+    normal = start + min(size, AVG_SIZE)
+    limit = start + min(size, MAX_SIZE)
+    gear, word, mask_s, mask_l = GEAR, WORD, MASK_S, MASK_L
+    fingerprint = 0
+    position = start + MIN_SIZE
+    stop = limit
+    if candidates is not None:
+        # Fingerprints of the first WINDOW bytes depend on the chunk start
+        stop = min(limit, position + WINDOW)
+    # The first MIN_SIZE bytes are skipped
+    for byte in data[position:min(normal, stop)]:
+        fingerprint = ((fingerprint << 1) + gear[byte]) & word
+        position += 1
+        if not fingerprint & mask_s:
+            return position - start
+    for byte in data[position:stop]:
+        fingerprint = ((fingerprint << 1) + gear[byte]) & word
+        position += 1
+        if not fingerprint & mask_l:
+            return position - start
+    if candidates is not None:
+        for positions, last in zip(candidates, (normal, limit)):
+            index = positions.searchsorted(position, "right")
+            if index < len(positions) and positions[index] <= last:
+                return int(positions[index]) - start
+            position = max(position, last)
+    return limit - start
+
+
+def chunks(fileobj):
+    """Split content of file object into content-defined chunks"""
+    data = memoryview(b"")
+    candidates = None
+    start = 0
+    eof = False
+    while True:
+        if not eof and len(data) - start < MAX_SIZE:
+            new = fileobj.read(CHUNK_SIZE)
+            eof = not new
+            data = memoryview(data[start:].tobytes() + new)
+            candidates = gear_candidates(data)
+            start = 0
+            continue
+        if start == len(data):
+            return
+        size = cut_point(data, start, len(data), candidates)
+        yield data[start:start + size]
+        start += size
+
+
+class ChunkEngine(ContentDatabaseEngine):
+    """Store unique chunks once. Objects are manifests of chunks
+
+    Object hashes are the sha1 of their whole content, as in the plain
+    engine. Contents smaller than MIN_SIZE are stored inside the object file
+    """
+
+    def __init__(self, config):
+        self.objects_path = None
+        self.chunks_path = None
+        self.hash_index = None
+        super(ChunkEngine, self).__init__(config)
+
+    def set_path(self, config):
+        """Set content path"""
+        self.content_path = join(config.provenance_path, CHUNK_DATABASE_DIR)
+        self.objects_path = join(self.content_path, OBJECTS_DIR)
+        self.chunks_path = join(self.content_path, CHUNKS_DIR)
+        self.hash_index = HashIndex(self.content_path, self.objects_path)
+
+    def connect(self, should_mock=False):
+        """Create content directories"""
+        if not should_mock and not isdir(self.objects_path):
+            os.makedirs(self.objects_path)
+            self.hash_index.create()
+        if not should_mock and not isdir(self.chunks_path):
+            os.makedirs(self.chunks_path)
+
+    @staticmethod
+    def hash_path(base, content_hash):
+        """Return path of hash. Create its directory"""
+        dirname = join(base, content_hash[:2])
+        if not isdir(dirname):
+            os.makedirs(dirname)
+        return join(dirname, content_hash[2:])
+
+    def temp_filename(self):
+        """Return temporary path for files that are being stored"""
+        return join(self.content_path, "tmp-{}-{}".format(
+            os.getpid(), threading.current_thread().ident))
+
+    def write_object(self, content_hash, filename, parts):
+        """Write object and add it to the hash index"""
+        hash_index.append(self.content_path, content_hash)
+        self.write(filename, parts)
+
+    def write(self, filename, parts):
+        """Write parts into filename atomically"""
+        temp_filename = self.temp_filename()
+        with safeopen.std_open(temp_filename, "wb") as fil:
+            for part in parts:
+                fil.write(part)
+        os.replace(temp_filename, filename)
+
+    def put_chunk(self, chunk):
+        """Store chunk if it is new. Return manifest line"""
+        chunk_hash = hashlib.sha1(chunk).hexdigest()
+        chunk_filename = self.hash_path(self.chunks_path, chunk_hash)
+        if not isfile(chunk_filename):
+            self.write(chunk_filename, [chunk])
+        return "{} {}\n".format(chunk_hash, len(chunk)).encode("ascii")
+
+    def put(self, content, filename="generic"):  # pylint: disable=method-hidden
+        """Put content in the content database"""
+        content_hash = hashlib.sha1(content).hexdigest()
+        object_filename = self.hash_path(self.objects_path, content_hash)
+        if isfile(object_filename):
+            return content_hash
+        if len(content) < MIN_SIZE:
+            self.write_object(content_hash, object_filename, [RAW, content])
+            return content_hash
+        content = memoryview(content)
+        candidates = gear_candidates(content)
+        lines, start = [], 0
+        while start < len(content):
+            size = cut_point(content, start, len(content), candidates)
+            lines.append(self.put_chunk(content[start:start + size]))
+            start += size
+        self.write_object(content_hash, object_filename, [MANIFEST] + lines)
+        return content_hash
+
+    def put_stream(self, fileobj, filename="generic"):  # pylint: disable=method-hidden
+        """Put content of file object, reading it in chunks
+        Seekable files are hashed first, to skip the chunking of existing
+        objects"""
+        seekable = getattr(fileobj, "seekable", None)
+        if seekable is not None and seekable():
+            position = fileobj.tell()
+            content_hash = hash_stream(fileobj)
+            if isfile(join(self.objects_path, content_hash[:2],
+                           content_hash[2:])):
+                return content_hash
+            fileobj.seek(position)
+        sha1 = hashlib.sha1()
+        lines, small = [], []
+        for chunk in chunks(fileobj):
+            sha1.update(chunk)
+            if not lines and len(chunk) < MIN_SIZE:
+                # It may be a small object. Do not store the chunk yet
+                small.append(chunk.tobytes())
+                continue
+            for part in small:
+                lines.append(self.put_chunk(part))
+            small = []
+            lines.append(self.put_chunk(chunk))
+        content_hash = sha1.hexdigest()
+        object_filename = self.hash_path(self.objects_path, content_hash)
+        if not isfile(object_filename):
+            if lines:
+                self.write_object(
+                    content_hash, object_filename, [MANIFEST] + lines)
+            else:
+                self.write_object(content_hash, object_filename, [RAW] + small)
+        return content_hash
+
+    def manifest(self, content_hash):
+        """Return object type and its content or list of (chunk hash, size)"""
+        object_filename = join(
+            self.objects_path, content_hash[:2], content_hash[2:])
+        with safeopen.std_open(object_filename, "rb") as fil:
+            data = fil.read()
+        if data[:1] == RAW:
+            return RAW, data[1:]
+        result = []
+        for line in data[1:].splitlines():
+            chunk_hash, size = line.split()
+            result.append((chunk_hash.decode("ascii"), int(size)))
+        return MANIFEST, result
+
+    def get(self, content_hash):  # pylint: disable=method-hidden
+        """Get content from the content database"""
+        kind, value = self.manifest(content_hash)
+        if kind == RAW:
+            return value
+        parts = []
+        for chunk_hash, _ in value:
+            chunk_filename = join(
+                self.chunks_path, chunk_hash[:2], chunk_hash[2:])
+            with safeopen.std_open(chunk_filename, "rb") as fil:
+                parts.append(fil.read())
+        return b"".join(parts)
+
+    def find_subhash(self, content_hash):
+        """Get hash that starts by content_hash"""
+        return self.hash_index.find(content_hash)
+
+    def all_hashes(self, base):
+        """Iterate over hashes of objects or chunks"""
+        for dirname in os.listdir(base):
+            for name in os.listdir(join(base, dirname)):
+                yield dirname + name
+
+    def gc(self, aggressive=False):                                              # pylint: disable=unused-argument
+        """Remove chunks that do not belong to any object
+        and temporary files of interrupted puts.
+        It must not run while a trial is being collected"""
+        referenced = set()
+        for content_hash in self.all_hashes(self.objects_path):
+            kind, value = self.manifest(content_hash)
+            if kind == MANIFEST:
+                referenced.update(chunk_hash for chunk_hash, _ in value)
+        removed = size = 0
+        for chunk_hash in list(self.all_hashes(self.chunks_path)):
+            if chunk_hash not in referenced:
+                chunk_filename = join(
+                    self.chunks_path, chunk_hash[:2], chunk_hash[2:])
+                size += os.path.getsize(chunk_filename)
+                os.remove(chunk_filename)
+                removed += 1
+        for name in os.listdir(self.content_path):
+            if name.startswith("tmp-"):
+                os.remove(join(self.content_path, name))
+        print_msg("removed {} orphaned chunks ({} bytes)".format(removed, size),
+                  True)
+
+    def commit_content(self, message):
+        """Merge new hashes into the hash index"""
+        self.hash_index.merge()
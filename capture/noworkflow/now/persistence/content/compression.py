@@ -0,0 +1,116 @@
+# Copyright (c) 2019 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2019 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Compression codecs for content database objects"""
+import zlib
+
+
+# Compressed objects start with MAGIC, the codec name, and a new line.
+# Objects without it are raw. Raw objects that start with MAGIC are stored
+# with the "raw" codec
+MAGIC = b"\x00noworkflow-compressed "
+RAW = "raw"
+# Objects smaller than this are not compressed
+THRESHOLD = 4096
+
+
+class Codec(object):
+    """Compression codec"""
+
+    def __init__(self, name, compress, decompress, compressobj):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+        # Return object with compress(data) and flush() methods
+        self.compressobj = compressobj
+
+    @property
+    def header(self):
+        """Return header of objects compressed by this codec"""
+        return MAGIC + self.name.encode("ascii") + b"\n"
+
+
+class _Identity(object):                                                         # pylint: disable=too-few-public-methods
+    """Compress object of the raw codec"""
+
+    @staticmethod
+    def compress(data):
+        """Return data"""
+        return data
+
+    @staticmethod
+    def flush():
+        """Return nothing"""
+        return b""
+
+
+CODECS = {
+    RAW: Codec(RAW, bytes, bytes, _Identity),
+    "zlib": Codec("zlib", zlib.compress, zlib.decompress, zlib.compressobj),
+}
+
+try:
+    import zstandard
+    CODECS["zstd"] = Codec(
+        "zstd",
+        lambda data: zstandard.ZstdCompressor().compress(data),
+        # Streamed frames do not have the content size
+        lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(
+            data),
+        lambda: zstandard.ZstdCompressor().compressobj(),
+    )
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+
+    class _LZ4Compressor(object):                                                # pylint: disable=too-few-public-methods
+        """Compress object of the lz4 codec"""
+
+        def __init__(self):
+            self.compressor = lz4.frame.LZ4FrameCompressor()
+            self.started = False
+
+        def compress(self, data):
+            """Compress part of data"""
+            result = b""
+            if not self.started:
+                result = self.compressor.begin()
+                self.started = True
+            return result + self.compressor.compress(data)
+
+        def flush(self):
+            """Finish frame"""
+            return self.compress(b"") + self.compressor.flush()
+
+    CODECS["lz4"] = Codec(
+        "lz4", lz4.frame.compress, lz4.frame.decompress, _LZ4Compressor)
+except ImportError:
+    pass
+
+
+def encode(codec, content):
+    """Return data that should be written for content"""
+    if codec is None or len(content) < THRESHOLD:
+        if content.startswith(MAGIC):
+            return CODECS[RAW].header + content
+        return content
+    compressed = codec.compress(content)
+    if len(compressed) + len(codec.header) >= len(content):
+        # Incompressible content
+        return encode(None, content)
+    return codec.header + compressed
+
+
+def decode(data):
+    """Return content of stored data"""
+    if not data.startswith(MAGIC):
+        return data
+    end = data.index(b"\n", len(MAGIC))
+    name = data[len(MAGIC):end].decode("ascii")
+    if name not in CODECS:
+        raise ValueError(
+            "object compressed with {}, which is not installed".format(name))
+    return CODECS[name].decompress(data[end + 1:])
@@ -8,10 +8,12 @@ from dulwich.objects import Tree
 from dulwich.objects import Blob
 from dulwich.objects import Commit
 from dulwich.objects import parse_timezone
-from dulwich.objectspec import scan_for_short_id
+from dulwich.objectspec import scan_for_short_id, AmbiguousShortId
 
+from .base import AmbiguousHashError
 from .gitbase import GitContentDatabaseEngine
 from .parallel import create_distributed, create_pool, create_threading
+from .packfile import create_packed
 from . import safeopen
 
 class DulwichEngine(GitContentDatabaseEngine):
@@ -63,12 +65,27 @@ class DulwichEngine(GitContentDatabaseEngine):
     def find_subhash(self, content_hash):
         """Find hash in git"""
         try:
-            content_hash = content_hash.encode("utf-8")
-            result = scan_for_short_id(self.repo.object_store, content_hash)
+            result = scan_for_short_id(
+                self.repo.object_store, content_hash.encode("utf-8"))
             if result:
                 return result.id.decode("utf-8")
         except KeyError:
             return None
+        except AmbiguousShortId as error:
+            raise AmbiguousHashError(content_hash, [
+                obj.id.decode("utf-8") for obj in error.options
+            ])
+
+    def has_object(self, content_hash):
+        """Check if object is in the git repository"""
+        with self.restore_open():
+            return content_hash.encode("ascii") in self.repo.object_store
+
+    def head(self):
+        """Return hash of the last commit"""
+        with self.restore_open():
+            commit = self.repo.get_refs().get(self._commit_ref.encode("utf-8"))
+            return commit.decode("ascii") if commit is not None else None
 
     def create_initial_commit(self):
         """Create the initial commit of the git repository"""
@@ -76,7 +93,8 @@ class DulwichEngine(GitContentDatabaseEngine):
             object_store = self.repo.object_store
             empty_tree = Tree()
             object_store.add_object(empty_tree)
-            self.create_commit_object(self._initial_message, empty_tree.id)
+            self.create_commit_object(
+                self._initial_message, empty_tree.id.decode("ascii"))
 
     def create_commit_object(self, message, tree):
         """Create a commit object"""
@@ -89,7 +107,7 @@ class DulwichEngine(GitContentDatabaseEngine):
             if master_ref is not None:
                 commit.parents = [master_ref]
 
-            commit.tree = tree
+            commit.tree = tree.encode("ascii")
             author = (self._commit_name + " <" + self._commit_email + ">").encode()
             commit.author = commit.committer = author
             commit.commit_time = commit.author_time = int(time.time())
@@ -115,7 +133,7 @@ class DulwichEngine(GitContentDatabaseEngine):
 
     def insert_tree(self, tree, basename, value):
         """Insert tree into tree"""
-        tree.add(basename.encode('utf-8'), 0o040000, value)
+        tree.add(basename.encode('utf-8'), 0o040000, value.encode("ascii"))
 
     def write_tree(self, tree):
         """Write tree to git directory"""
@@ -127,3 +145,4 @@ class DulwichEngine(GitContentDatabaseEngine):
 DistributedDulwichEngine = create_distributed(DulwichEngine)
 PoolDulwichEngine = create_pool(DulwichEngine)
 ThreadingDulwichEngine = create_threading(DulwichEngine)
+PackedDulwichEngine = create_packed(DulwichEngine)
@@ -1,5 +1,14 @@
-import subprocess
+import atexit
 import os
+import re
+import shutil
+import subprocess
+import threading
+
+from . import safeopen
+from .base import CHUNK_SIZE
+
+HEX = re.compile(r"^[0-9a-fA-F]{4,40}$")
 
 def execute(cmd, default=None, **kwargs):
     p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **kwargs)
@@ -28,20 +37,44 @@ def init(path):
 
 
 def hash_object(content, git_path):
-    cmd = ["git", "hash-object", "-w", "--stdin"]
-    p = subprocess.Popen(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
-        stdin=subprocess.PIPE, cwd=git_path)
-    out = p.communicate(content)[0]
-    returncode = p.wait()
-    if returncode != 0:
-        print(out)
-        raise subprocess.CalledProcessError(returncode, cmd)
-    return out.decode().replace("\n", "")
+    return batch(HashObjectWriter, git_path).hash_content(content)
+
+
+def hash_path(path, git_path):
+    return batch(HashObjectWriter, git_path).hash_path(path)
+
+
+def hash_stream(fileobj, git_path):
+    return batch(HashObjectWriter, git_path).hash_stream(fileobj)
+
 
 def get(content_hash, git_path):
-    cmd = ["git", "cat-file", "-p", content_hash]
-    return execute(cmd, cwd=git_path)    
+    result = batch(CatFileReader, git_path).read(content_hash)
+    if result is None:
+        raise KeyError(content_hash)
+    return result[2]
+
+
+def has_object(content_hash, git_path):
+    return batch(CatFileChecker, git_path).check(content_hash)
+
+
+def find_object(prefix, git_path):
+    """Return the full hash of the object that starts with prefix"""
+    if not HEX.match(prefix):
+        return None
+    result = batch(CatFileReader, git_path).read(prefix)
+    if result is None:
+        return None
+    return result[0]
+
+
+def disambiguate(prefix, git_path):
+    """Return the full hashes of all objects that start with prefix"""
+    if not HEX.match(prefix):
+        return []
+    cmd = ["git", "rev-parse", "--disambiguate={}".format(prefix)]
+    return execute(cmd, cwd=git_path, default=b"").decode().split()
 
 
 def update_index(mode, content_hash, filename, git_path):
@@ -49,9 +82,38 @@ def update_index(mode, content_hash, filename, git_path):
     return execute(cmd, cwd=git_path)
 
 
-def write_tree(git_path):
+def update_index_info(entries, git_path, index_file=None):
+    """Add (mode, content_hash, filename) entries to the index in a single
+    update-index process"""
+    cmd = ["git", "update-index", "--add", "-z", "--index-info"]
+    env = index_env(index_file)
+    p = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        stdin=subprocess.PIPE, cwd=git_path, env=env)
+    out = p.communicate(b"".join(
+        "{} {}\t{}\0".format(mode, content_hash, filename).encode("utf-8")
+        for mode, content_hash, filename in entries
+    ))[0]
+    returncode = p.wait()
+    if returncode != 0:
+        print(out)
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return out
+
+
+def index_env(index_file):
+    """Return environment that uses index_file as the git index"""
+    if index_file is None:
+        return None
+    env = os.environ.copy()
+    env["GIT_INDEX_FILE"] = index_file
+    return env
+
+
+def write_tree(git_path, index_file=None):
     cmd = ["git", "write-tree"]
-    return execute(cmd, cwd=git_path).decode().replace("\n", "")
+    env = index_env(index_file)
+    return execute(cmd, cwd=git_path, env=env).decode().replace("\n", "")
 
 
 def read_tree(filename, content_hash, git_path):
@@ -81,6 +143,7 @@ def commit_tree(tree_hash, commit_message, git_path, author=None, parent=None):
     if author:
         env = env.copy()
         env["GIT_AUTHOR_NAME"], env["GIT_AUTHOR_EMAIL"] = author
+        env["GIT_COMMITTER_NAME"], env["GIT_COMMITTER_EMAIL"] = author
     return execute(cmd, cwd=git_path, env=env).decode().replace("\n", "")
 
 
@@ -114,3 +177,142 @@ def show_ref(ref, git_path):
 def update_ref(ref, tree, git_path):
     cmd = ["git", "update-ref", ref, tree]
     return execute(cmd, cwd=git_path)
+
+
+class BatchProcess(object):
+    """Long-lived git process that answers requests written in its stdin"""
+
+    cmd = []
+
+    def __init__(self, git_path):
+        self.git_path = git_path
+        self.lock = threading.Lock()
+        self.process = subprocess.Popen(
+            self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=git_path)
+
+    def request(self, line):
+        """Write request line and return the first line of the answer"""
+        self.process.stdin.write(line + b"\n")
+        self.process.stdin.flush()
+        answer = self.process.stdout.readline()
+        if not answer:
+            returncode = self.process.wait()
+            raise subprocess.CalledProcessError(returncode, self.cmd)
+        return answer
+
+    def is_alive(self):
+        """Check if process is still running"""
+        return self.process.poll() is None
+
+    def close(self):
+        """Stop process"""
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self.process.wait()
+        self.process.stdout.close()
+
+
+class HashObjectWriter(BatchProcess):
+    """Write blobs through git hash-object --stdin-paths"""
+
+    # Files larger than core.bigFileThreshold are streamed into packs,
+    # instead of being loaded in memory
+    cmd = ["git", "-c", "core.bigFileThreshold=32m", "hash-object", "-w",
+           "--no-filters", "--stdin-paths"]
+
+    def __init__(self, git_path):
+        super(HashObjectWriter, self).__init__(git_path)
+        self.temp_path = os.path.join(
+            os.path.abspath(git_path), "noworkflow-{}.tmp".format(os.getpid()))
+
+    def hash_path(self, path):
+        """Write file in path as a blob and return its hash"""
+        path = os.path.abspath(path)
+        if "\n" in path or path.startswith('"'):
+            with safeopen.std_open(path, "rb") as fil:
+                return self.hash_content(fil.read())
+        with self.lock:
+            return self.request(path.encode("utf-8")).decode().strip()
+
+    def hash_stream(self, fileobj):
+        """Write content of file object as a blob and return its hash"""
+        with self.lock:
+            with safeopen.std_open(self.temp_path, "wb") as fil:
+                shutil.copyfileobj(fileobj, fil, CHUNK_SIZE)
+            return self.request(self.temp_path.encode("utf-8")).decode().strip()
+
+    def hash_content(self, content):
+        """Write content as a blob and return its hash"""
+        with self.lock:
+            with safeopen.std_open(self.temp_path, "wb") as fil:
+                fil.write(content)
+            return self.request(self.temp_path.encode("utf-8")).decode().strip()
+
+    def close(self):
+        super(HashObjectWriter, self).close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class CatFileReader(BatchProcess):
+    """Read objects through git cat-file --batch"""
+
+    cmd = ["git", "cat-file", "--batch"]
+
+    def read(self, name):
+        """Return (hash, type, content) of object. None if it does not exist"""
+        with self.lock:
+            header = self.request(name.encode("utf-8")).split()
+            if len(header) != 3:
+                # <name> missing or <name> ambiguous
+                return None
+            content = self.process.stdout.read(int(header[2]))
+            self.process.stdout.read(1)
+            return header[0].decode(), header[1].decode(), content
+
+
+class CatFileChecker(BatchProcess):
+    """Check objects through git cat-file --batch-check"""
+
+    cmd = ["git", "cat-file", "--batch-check"]
+
+    def check(self, name):
+        """Check if object exists"""
+        with self.lock:
+            return len(self.request(name.encode("utf-8")).split()) == 3
+
+
+_BATCHES = {}
+_BATCHES_LOCK = threading.Lock()
+_BATCHES_PID = [os.getpid()]
+
+
+def batch(cls, git_path):
+    """Return the process of cls for the repository in git_path"""
+    with _BATCHES_LOCK:
+        if _BATCHES_PID[0] != os.getpid():
+            # Forked process. Its pipes belong to the parent
+            _BATCHES.clear()
+            _BATCHES_PID[0] = os.getpid()
+        key = (cls, os.path.abspath(git_path))
+        process = _BATCHES.get(key)
+        if process is None or not process.is_alive():
+            process = _BATCHES[key] = cls(git_path)
+        return process
+
+
+def close_batches(git_path=None):
+    """Stop the batch processes of a repository, or all of them"""
+    with _BATCHES_LOCK:
+        if _BATCHES_PID[0] != os.getpid():
+            _BATCHES.clear()
+            return
+        for key in list(_BATCHES):
+            if git_path is None or key[1] == os.path.abspath(git_path):
+                _BATCHES.pop(key).close()
+
+
+atexit.register(close_batches)
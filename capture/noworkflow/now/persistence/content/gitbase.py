@@ -1,14 +1,39 @@
 import os
 import hashlib
+import pickle
 
+from binascii import unhexlify
 from collections import Counter
 
 from ...utils.cross_version import bytes_string
 from . import git_system
+from . import safeopen
 from .base import ContentDatabaseEngine
 
 
 GIT_DATABASE_DIR = 'content.git'
+# Tree hashes of the last commit, in the git directory
+TREE_CACHE = 'noworkflow-trees'
+BLOB_MODE = '100644'
+TREE_MODE = '40000'
+
+
+def tree_order(item):
+    """Sort key of git tree entries. Trees are sorted as if they end by /"""
+    name, (mode, _) = item
+    name = name.encode('utf-8')
+    return name + b'/' if mode == TREE_MODE else name
+
+
+def tree_hash(entries):
+    """Return hash of git tree with {name: (mode, hash)} entries"""
+    data = b''.join(
+        mode.encode('ascii') + b' ' + name.encode('utf-8') + b'\0' +
+        unhexlify(value)
+        for name, (mode, value) in sorted(entries.items(), key=tree_order)
+    )
+    header = bytes_string('tree {}'.format(len(data))) + b'\0'
+    return hashlib.sha1(header + data).hexdigest()
 
 
 class GitContentDatabaseEngine(ContentDatabaseEngine):
@@ -32,25 +57,68 @@ class GitContentDatabaseEngine(ContentDatabaseEngine):
     def gc(self, aggressive=False):
         git_system.garbage_collection(self.content_path, aggressive)
 
+    def reuse(self, content_hash, filename="generic"):
+        """Add known blob to the next commit"""
+        self.object_hashes[self._inc_name(filename)] = content_hash
+
     def commit_content(self, message):
-        """Commit the current files of content database"""
+        """Commit the current files of content database
+
+        Tree hashes are calculated before writing the trees. Subtrees that
+        did not change since the previous commit are not written again"""
         self.close()
-        trees = {'': self.new_tree('')}
+        trees = {'': {}}
 
         for key, value in self.object_hashes.items():
             basename = os.path.basename(key)
-            self.insert_blob(self._get_tree(trees, key), basename, value)
+            self._get_tree(trees, key)[basename] = (BLOB_MODE, value)
 
+        previous = self.load_tree_cache()
         tree_hashes = {}
         tree_keys = sorted(list(trees.keys()), key=len, reverse=True)
         for tree in tree_keys:
             dirname = os.path.dirname(tree)
             basename = os.path.basename(tree)
-            tree_hashes[tree] = value = self.write_tree(trees[tree])
+            tree_hashes[tree] = value = tree_hash(trees[tree])
+            if previous.get(tree) != value and not self.has_object(value):
+                self.write_entries(trees[tree])
             if basename != '':
-                self.insert_tree(trees[dirname], basename, value)
+                trees[dirname][basename] = (TREE_MODE, value)
 
-        return self.create_commit_object(message, tree_hashes[''])
+        result = self.create_commit_object(message, tree_hashes[''])
+        self.save_tree_cache(tree_hashes)
+        return result
+
+    def write_entries(self, entries):
+        """Write tree with {name: (mode, hash)} entries"""
+        tree = self.new_tree(None)
+        for name, (mode, value) in entries.items():
+            if mode == TREE_MODE:
+                self.insert_tree(tree, name, value)
+            else:
+                self.insert_blob(tree, name, value)
+        return self.write_tree(tree)
+
+    def load_tree_cache(self, filename=TREE_CACHE):
+        """Return the data saved by the commit of the current head.
+        Return an empty dict if another commit moved the head"""
+        try:
+            with safeopen.std_open(
+                    os.path.join(self.content_path, filename), 'rb') as fil:
+                commit, data = pickle.load(fil)
+        except Exception:                                                        # pylint: disable=broad-except
+            return {}
+        if commit is None or commit != self.head():
+            return {}
+        return data
+
+    def save_tree_cache(self, data, filename=TREE_CACHE):
+        """Save data for the next commit"""
+        path = os.path.join(self.content_path, filename)
+        temp_path = '{}.{}'.format(path, os.getpid())
+        with safeopen.std_open(temp_path, 'wb') as fil:
+            pickle.dump((self.head(), data), fil, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
 
     def _increment(self, filename):
         """Increment filename to avoid collisions"""
@@ -92,10 +160,18 @@ class GitContentDatabaseEngine(ContentDatabaseEngine):
         """Build git tree recursively"""
         original = dirname = os.path.dirname(key)
         while dirname not in trees:
-            trees[dirname] = self.new_tree(dirname)
+            trees[dirname] = {}
             dirname = os.path.dirname(dirname)
         return trees[original]
 
+    def has_object(self, content_hash):
+        """Check if object is in the git repository"""
+        raise NotImplementedError("Implement in subclass")
+
+    def head(self):
+        """Return hash of the last commit"""
+        raise NotImplementedError("Implement in subclass")
+
     def create_initial_commit(self):
         """Create the initial commit of the git repository"""
         raise NotImplementedError("Implement in subclass")
@@ -10,6 +10,7 @@ from io import BytesIO
 from gitdb import LooseObjectDB, IStream
 
 from ...utils.cross_version import StringIO
+from .base import ContentDatabaseEngine
 from .pygit_engine import PyGitEngine
 
 # ToDo: implement other methods using GitDB to not depend on PyGitEngine
@@ -26,3 +27,7 @@ class GitDBPyGitEngine(PyGitEngine):
         filename_hash = hashlib.sha1(filename.encode('utf-8')).hexdigest()
         result = object_hashes[filename_hash] = str(content_hash.decode('utf-8'))
         return result
+
+    # Use do_put, instead of the PyGitEngine streams
+    put_stream = ContentDatabaseEngine.put_stream
+    put_path = ContentDatabaseEngine.put_path
@@ -0,0 +1,156 @@
+# Copyright (c) 2019 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2019 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Sorted index of object hashes for prefix lookups"""
+import bisect
+import mmap
+import os
+
+from binascii import hexlify, unhexlify
+from os.path import join, isdir, isfile
+
+from .base import AmbiguousHashError, HEX_DIGITS
+from . import safeopen
+
+
+INDEX_FILENAME = ".index"
+JOURNAL_FILENAME = ".index-journal"
+RECORD_SIZE = 20
+# The journal is merged into the sorted index when it is larger than this
+MAX_JOURNAL_SIZE = 4096 * RECORD_SIZE
+
+
+def append(index_path, content_hash):
+    """Add hash of new object to the journal of the index in index_path.
+    Appends of a single record are atomic, even from worker processes"""
+    descriptor = safeopen.os_open(
+        join(index_path, JOURNAL_FILENAME),
+        os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(descriptor, unhexlify(content_hash))
+    finally:
+        os.close(descriptor)
+
+
+class Records(object):                                                           # pylint: disable=too-few-public-methods
+    """Sequence of fixed size records of a buffer, for bisect"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // RECORD_SIZE
+
+    def __getitem__(self, index):
+        start = index * RECORD_SIZE
+        return self.data[start:start + RECORD_SIZE]
+
+
+class HashIndex(object):
+    """Sorted file of binary hashes, and an unsorted journal of new hashes
+
+    Objects are stored in objects_path/hash[:2]/hash[2:]. The index is
+    built from the objects directory when it does not exist"""
+
+    def __init__(self, index_path, objects_path):
+        self.index_path = index_path
+        self.objects_path = objects_path
+        self.index_filename = join(index_path, INDEX_FILENAME)
+        self.journal_filename = join(index_path, JOURNAL_FILENAME)
+
+    def create(self):
+        """Create empty index for new object directory"""
+        if not isfile(self.index_filename):
+            self.write([])
+
+    def object_hashes(self):
+        """Iterate over hashes of objects directory"""
+        for dirname in os.listdir(self.objects_path):
+            if len(dirname) != 2 or not isdir(join(self.objects_path, dirname)):
+                continue
+            for name in os.listdir(join(self.objects_path, dirname)):
+                if len(name) == 38 and not name.strip(HEX_DIGITS):
+                    yield dirname + name
+
+    def write(self, records):
+        """Replace index by sorted binary records"""
+        temp_filename = "{}.{}".format(self.index_filename, os.getpid())
+        with safeopen.std_open(temp_filename, "wb") as index_file:
+            index_file.write(b"".join(sorted(set(records))))
+        os.replace(temp_filename, self.index_filename)
+
+    def rebuild(self):
+        """Build index from the objects directory"""
+        self.write(unhexlify(content_hash)
+                   for content_hash in self.object_hashes())
+        if isfile(self.journal_filename):
+            os.remove(self.journal_filename)
+
+    def read_journal(self):
+        """Return records of the journal"""
+        if not isfile(self.journal_filename):
+            return []
+        with safeopen.std_open(self.journal_filename, "rb") as journal:
+            data = journal.read()
+        return [data[start:start + RECORD_SIZE]
+                for start in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE)]
+
+    def merge(self, force=False):
+        """Merge journal into the sorted index if it is large"""
+        if not isfile(self.journal_filename):
+            return
+        if not force and (
+                os.path.getsize(self.journal_filename) < MAX_JOURNAL_SIZE):
+            return
+        if not isfile(self.index_filename):
+            self.rebuild()
+            return
+        journal = self.read_journal()
+        with safeopen.std_open(self.index_filename, "rb") as index_file:
+            records = Records(index_file.read())
+        self.write([records[index] for index in range(len(records))] + journal)
+        os.remove(self.journal_filename)
+
+    def search(self, prefix):
+        """Return sorted hashes of the index that start with prefix"""
+        low = unhexlify((prefix + "0" * 40)[:40])
+        high = unhexlify((prefix + "f" * 40)[:40])
+        if not os.path.getsize(self.index_filename):
+            return []
+        with safeopen.std_open(self.index_filename, "rb") as index_file:
+            data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                records = Records(data)
+                result = []
+                position = bisect.bisect_left(records, low)
+                while position < len(records) and records[position] <= high:
+                    result.append(records[position])
+                    position += 1
+                return result
+            finally:
+                data.close()
+
+    def find(self, prefix):
+        """Return the full hash of the object that starts with prefix.
+        Return None if there is no object.
+        Raise AmbiguousHashError if there are many objects"""
+        prefix = prefix.lower()
+        if not prefix or prefix.strip(HEX_DIGITS) or len(prefix) > 40:
+            return None
+        if not isfile(self.index_filename):
+            self.rebuild()
+        records = set(self.search(prefix))
+        records.update(
+            record for record in self.read_journal()
+            if hexlify(record).decode("ascii").startswith(prefix)
+        )
+        candidates = sorted(
+            content_hash for content_hash in (
+                hexlify(record).decode("ascii") for record in records)
+            if isfile(join(self.objects_path, content_hash[:2],
+                           content_hash[2:]))
+        )
+        if len(candidates) > 1:
+            raise AmbiguousHashError(prefix, candidates)
+        return candidates[0] if candidates else None
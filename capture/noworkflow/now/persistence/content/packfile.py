@@ -0,0 +1,423 @@
+# Copyright (c) 2019 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2019 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Git packfile writer for the git content database engines"""
+import hashlib
+import os
+import struct
+import zlib
+
+from collections import OrderedDict
+
+from .base import CHUNK_SIZE, read_chunks
+from . import safeopen
+
+
+OBJ_TYPES = {"commit": 1, "tree": 2, "blob": 3, "tag": 4}
+OBJ_OFS_DELTA = 6
+
+# Contents larger than this are not used as delta bases or deltified
+DELTA_MAX_SIZE = 16 * 1024 * 1024
+# Maximum size of the delta bases kept in memory by a writer
+DELTA_CACHE_SIZE = 64 * 1024 * 1024
+# Matches shorter than this are inserted instead of copied
+MIN_COPY = 16
+MAX_COPY = 0xFFFFFF
+MAX_INSERT = 0x7F
+# Maximum length of delta chains
+MAX_DEPTH = 50
+
+
+def encode_size(size):
+    """Encode size as a little-endian base 128 varint of deltas"""
+    result = bytearray()
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        if not size:
+            result.append(byte)
+            return bytes(result)
+        result.append(byte | 0x80)
+
+
+def object_header(type_id, size):
+    """Return header of object entry in pack"""
+    result = bytearray([(type_id << 4) | (size & 0x0F)])
+    size >>= 4
+    while size:
+        result[-1] |= 0x80
+        result.append(size & 0x7F)
+        size >>= 7
+    return bytes(result)
+
+
+def encode_offset(offset):
+    """Encode negative offset of OFS_DELTA entries"""
+    result = bytearray([offset & 0x7F])
+    offset >>= 7
+    while offset:
+        offset -= 1
+        result.insert(0, 0x80 | (offset & 0x7F))
+        offset >>= 7
+    return bytes(result)
+
+
+def copy_op(offset, size):
+    """Return delta instruction that copies size bytes of base at offset"""
+    result = bytearray([0x80])
+    for index in range(4):
+        byte = (offset >> (8 * index)) & 0xFF
+        if byte:
+            result[0] |= 1 << index
+            result.append(byte)
+    for index in range(3):
+        byte = (size >> (8 * index)) & 0xFF
+        if byte:
+            result[0] |= 1 << (4 + index)
+            result.append(byte)
+    return bytes(result)
+
+
+def create_delta(base, target):
+    """Return git delta that transforms base into target
+
+    Matches are found line by line, which fits the text files that
+    usually change between trials. Return None if the delta is not
+    smaller than half of the target"""
+    index = {}
+    position = 0
+    for line in base.splitlines(True):
+        index.setdefault(line, position)
+        position += len(line)
+    result = [encode_size(len(base)), encode_size(len(target))]
+    insert = []
+
+    def flush():
+        """Add insert instructions for pending lines"""
+        data = b"".join(insert)
+        del insert[:]
+        for start in range(0, len(data), MAX_INSERT):
+            part = data[start:start + MAX_INSERT]
+            result.append(struct.pack(">B", len(part)))
+            result.append(part)
+
+    lines = target.splitlines(True)
+    current = 0
+    while current < len(lines):
+        line = lines[current]
+        offset = index.get(line)
+        current += 1
+        if offset is None:
+            insert.append(line)
+            continue
+        size = len(line)
+        while current < len(lines) and base.startswith(
+                lines[current], offset + size):
+            size += len(lines[current])
+            current += 1
+        if size < MIN_COPY:
+            insert.append(base[offset:offset + size])
+            continue
+        flush()
+        for start in range(0, size, MAX_COPY):
+            result.append(copy_op(offset + start, min(MAX_COPY, size - start)))
+    flush()
+    delta = b"".join(result)
+    if len(delta) >= len(target) // 2:
+        return None
+    return delta
+
+
+class PackWriter(object):
+    """Write objects into a single packfile with a version 2 index
+
+    Objects are compressed into a temporary file as they are added.
+    finish() writes the index and moves both files to objects/pack.
+    Contents added with the same delta key are stored as deltas of the
+    previous one, when the delta is small. Streamed contents are read back
+    from the pack when they are used as delta bases"""
+
+    def __init__(self, git_path, delta=True):
+        self.pack_path = os.path.join(git_path, "objects", "pack")
+        if not os.path.isdir(self.pack_path):
+            os.makedirs(self.pack_path)
+        self.temp_path = os.path.join(
+            self.pack_path, "tmp_pack_noworkflow_{}".format(os.getpid()))
+        self.file = safeopen.std_open(self.temp_path, "w+b")
+        self.file.write(b"PACK" + struct.pack(">II", 2, 0))
+        self.delta = delta
+        self.entries = OrderedDict()  # hash -> (offset, crc32)
+        # delta key -> (offset, content, depth). Content is None for streams
+        self.bases = OrderedDict()
+        self.bases_size = 0
+
+    def __contains__(self, content_hash):
+        return content_hash in self.entries
+
+    def has_base(self, delta_key):
+        """Check if there is a delta base for the next content of key"""
+        return delta_key in self.bases
+
+    def write_entry(self, content_hash, header, parts):
+        """Write entry with header and compressed parts"""
+        offset = self.file.tell()
+        crc = zlib.crc32(header)
+        self.file.write(header)
+        for part in parts:
+            crc = zlib.crc32(part, crc)
+            self.file.write(part)
+        self.entries[content_hash] = (offset, crc & 0xFFFFFFFF)
+        return offset
+
+    def add(self, content, type_name="blob", delta_key=None,
+            content_hash=None):
+        """Add object with content. Return its hash"""
+        if content_hash is None:
+            content_hash = hashlib.sha1("{} {}\0".format(
+                type_name, len(content)).encode("ascii") + content).hexdigest()
+        if content_hash in self.entries:
+            return content_hash
+        base = delta = None
+        if self.delta and delta_key is not None:
+            base = self.bases.pop(delta_key, None)
+        if base is not None:
+            base_content = base[1]
+            if base_content is None:
+                base_content = self.read_object(base[0])
+            else:
+                self.bases_size -= len(base_content)
+            if base[2] < MAX_DEPTH and len(content) <= DELTA_MAX_SIZE:
+                delta = create_delta(base_content, content)
+        depth = 0
+        if delta is not None:
+            offset = self.file.tell()
+            header = (object_header(OBJ_OFS_DELTA, len(delta)) +
+                      encode_offset(offset - base[0]))
+            self.write_entry(content_hash, header, [zlib.compress(delta)])
+            depth = base[2] + 1
+        else:
+            offset = self.write_entry(
+                content_hash,
+                object_header(OBJ_TYPES[type_name], len(content)),
+                [zlib.compress(content)])
+        if self.delta and delta_key is not None:
+            self.add_base(delta_key, (offset, content, depth))
+        return content_hash
+
+    def add_base(self, delta_key, base):
+        """Keep content as the delta base of the next content of key"""
+        if base[1] is None:
+            self.bases[delta_key] = base
+            return
+        if len(base[1]) > DELTA_MAX_SIZE:
+            return
+        self.bases[delta_key] = base
+        self.bases_size += len(base[1])
+        while self.bases_size > DELTA_CACHE_SIZE:
+            _, (_, content, _) = self.bases.popitem(last=False)
+            if content is not None:
+                self.bases_size -= len(content)
+
+    def read_object(self, offset):
+        """Return content of the undeltified entry at offset"""
+        end = self.file.tell()
+        self.file.seek(offset)
+        # Skip type and size
+        while bytearray(self.file.read(1))[0] & 0x80:
+            pass
+        decompressor = zlib.decompressobj()
+        parts = []
+        while not decompressor.eof:
+            chunk = self.file.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parts.append(decompressor.decompress(chunk))
+        self.file.seek(end)
+        return b"".join(parts)
+
+    def add_stream(self, fileobj, size, type_name="blob", delta_key=None,
+                   skip=None):
+        """Add object with size bytes read from file object in chunks.
+        Return its hash. Return None if the file object does not have
+        size bytes
+
+        Keyword arguments:
+        delta_key -- the object is the delta base of the next content of key
+        skip -- function that checks if the object is already stored
+        """
+        base = None
+        if self.delta and delta_key is not None:
+            base = self.bases.pop(delta_key, None)
+        if base is not None and base[1] is not None:
+            self.bases_size -= len(base[1])
+        sha1 = hashlib.sha1("{} {}\0".format(type_name, size).encode("ascii"))
+        offset = self.file.tell()
+        header = object_header(OBJ_TYPES[type_name], size)
+        crc = zlib.crc32(header)
+        self.file.write(header)
+        compressor = zlib.compressobj()
+        total = 0
+        for chunk in read_chunks(fileobj):
+            total += len(chunk)
+            if total > size:
+                break
+            sha1.update(chunk)
+            compressed = compressor.compress(chunk)
+            crc = zlib.crc32(compressed, crc)
+            self.file.write(compressed)
+        if total != size:
+            # The file changed. Discard the partial entry
+            self.file.seek(offset)
+            self.file.truncate()
+            return None
+        compressed = compressor.flush()
+        crc = zlib.crc32(compressed, crc)
+        self.file.write(compressed)
+        content_hash = sha1.hexdigest()
+        if content_hash in self.entries or (
+                skip is not None and skip(content_hash)):
+            self.file.seek(offset)
+            self.file.truncate()
+            return content_hash
+        self.entries[content_hash] = (offset, crc & 0xFFFFFFFF)
+        if self.delta and delta_key is not None and size <= DELTA_MAX_SIZE:
+            self.add_base(delta_key, (offset, None, 0))
+        return content_hash
+
+    def finish(self):
+        """Write pack trailer and index. Return the pack name.
+        Return None if the pack is empty"""
+        self.bases.clear()
+        if not self.entries:
+            self.abort()
+            return None
+        self.file.seek(8)
+        self.file.write(struct.pack(">I", len(self.entries)))
+        self.file.seek(0)
+        sha1 = hashlib.sha1()
+        for chunk in read_chunks(self.file):
+            sha1.update(chunk)
+        checksum = sha1.digest()
+        self.file.write(checksum)
+        self.file.close()
+        name = "pack-" + sha1.hexdigest()
+        index_temp = self.temp_path + ".idx"
+        with safeopen.std_open(index_temp, "wb") as index_file:
+            index_file.write(self.index(checksum))
+        # git finds packs through their indexes
+        os.replace(self.temp_path, os.path.join(self.pack_path, name + ".pack"))
+        os.replace(index_temp, os.path.join(self.pack_path, name + ".idx"))
+        return name
+
+    def index(self, checksum):
+        """Return version 2 index of pack"""
+        hashes = sorted(self.entries)
+        fanout = [0] * 256
+        for content_hash in hashes:
+            fanout[int(content_hash[:2], 16)] += 1
+        for position in range(1, 256):
+            fanout[position] += fanout[position - 1]
+        offsets, large = [], []
+        for content_hash in hashes:
+            offset = self.entries[content_hash][0]
+            if offset < 0x80000000:
+                offsets.append(offset)
+            else:
+                offsets.append(0x80000000 | len(large))
+                large.append(offset)
+        data = b"".join([
+            b"\xfftOc", struct.pack(">I", 2),
+            struct.pack(">256I", *fanout),
+            b"".join(bytes(bytearray.fromhex(h)) for h in hashes),
+            struct.pack(">{}I".format(len(hashes)),
+                        *(self.entries[h][1] for h in hashes)),
+            struct.pack(">{}I".format(len(offsets)), *offsets),
+            struct.pack(">{}Q".format(len(large)), *large),
+            checksum,
+        ])
+        return data + hashlib.sha1(data).digest()
+
+    def abort(self):
+        """Discard pack"""
+        self.bases.clear()
+        self.file.close()
+        os.remove(self.temp_path)
+
+
+def create_packed(cls, name=None, delta=True):
+
+    class Packed(cls):
+        """Write the new blobs of a trial into a single packfile
+
+        The pack is finished when the engine is closed, before
+        commit_content writes the trees. Versions of the same file in the
+        trial are stored as deltas of the previous version
+        """
+
+        def __init__(self, config):
+            super(Packed, self).__init__(config)
+            self.writer = None
+
+        def pack_writer(self):
+            """Return writer of the current pack"""
+            if self.writer is None:
+                self.writer = PackWriter(self.content_path, delta=delta)
+            return self.writer
+
+        @staticmethod
+        def delta_key(filename):
+            """Return delta key of filename"""
+            if filename == "generic":
+                return None
+            return os.path.abspath(filename)
+
+        def put(self, content, filename="generic"):  # pylint: disable=method-hidden
+            """Add content to the pack if it is not in the repository"""
+            content_hash = self._get_hash_from_content(content)
+            writer = self.pack_writer()
+            if content_hash not in writer and not self.has_object(content_hash):
+                writer.add(content, delta_key=self.delta_key(filename),
+                           content_hash=content_hash)
+            self.object_hashes[self._inc_name(filename)] = content_hash
+            return content_hash
+
+        def put_stream(self, fileobj, filename="generic"):  # pylint: disable=method-hidden
+            """Add content of seekable file object to the pack in chunks"""
+            seekable = getattr(fileobj, "seekable", None)
+            if seekable is None or not seekable():
+                return self.put(fileobj.read(), filename)
+            start = fileobj.tell()
+            size = fileobj.seek(0, os.SEEK_END) - start
+            fileobj.seek(start)
+            content_hash = self.pack_writer().add_stream(
+                fileobj, size, delta_key=self.delta_key(filename),
+                skip=self.has_object)
+            if content_hash is None:
+                # The file changed while it was read
+                fileobj.seek(start)
+                return self.put(fileobj.read(), filename)
+            self.object_hashes[self._inc_name(filename)] = content_hash
+            return content_hash
+
+        def put_path(self, path, filename=None):  # pylint: disable=method-hidden
+            """Add file to the pack. Only read it into memory if it may be
+            stored as a delta of a previous version"""
+            if filename is None:
+                filename = path
+            with safeopen.std_open(path, "rb") as fileobj:
+                size = os.fstat(fileobj.fileno()).st_size
+                if (size <= DELTA_MAX_SIZE and
+                        self.pack_writer().has_base(self.delta_key(filename))):
+                    return self.put(fileobj.read(), filename)
+                return self.put_stream(fileobj, filename)
+
+        def close(self):
+            """Write pack and its index"""
+            super(Packed, self).close()
+            if self.writer is not None:
+                writer, self.writer = self.writer, None
+                writer.finish()
+
+    Packed.__name__ = name or ("Packed" + cls.__name__)
+    return Packed
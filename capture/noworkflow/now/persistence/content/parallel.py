@@ -3,52 +3,158 @@
 # This file is part of noWorkflow.
 # Please, consult the license terms in the LICENSE file.
 """Content database engine parallel generics"""
+import itertools
+import os
+import tempfile
 import threading
 
-from multiprocessing import Process, JoinableQueue, cpu_count, Manager, Pool
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing import Process, Queue, cpu_count, Pool
+
+from . import safeopen
+
+
+# Maximum size of contents waiting for the threads of create_threading
+MAX_PENDING_BYTES = 64 * 1024 * 1024
+# Contents are passed to the processes of create_distributed and create_pool
+# through files in shared memory (tmpfs), when it is available
+SHARED_MEMORY_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+SHARED_COUNTER = itertools.count()
+
+
+class Placeholder(object):                                                       # pylint: disable=too-few-public-methods
+    """put_attr value that is replaced in the worker process"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, Placeholder) and other.name == self.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+CONTENT = Placeholder("content")
+OBJECT_HASHES = Placeholder("object_hashes")
+
+
+def shared_directory():
+    """Return directory of shared memory files"""
+    return SHARED_MEMORY_DIR or tempfile.gettempdir()
+
+
+def write_shared(content):
+    """Write content to a new shared memory file. Return its path"""
+    path = os.path.join(shared_directory(), "noworkflow-{}-{}".format(
+        os.getpid(), next(SHARED_COUNTER)))
+    # tempfile uses os.open, which may be replaced by the Profiler
+    descriptor = safeopen.os_open(
+        path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with safeopen.std_open(descriptor, "wb") as shared:
+        shared.write(content)
+    return path
+
+
+def shared_attrs(engine, filename):
+    """Return put_attr of engine with placeholders for the content and
+    for the object_hashes of git engines"""
+    object_hashes = getattr(engine, "object_hashes", None)
+    return [
+        OBJECT_HASHES if object_hashes is not None and
+        attr is object_hashes else attr
+        for attr in engine.put_attr(CONTENT, filename)
+    ]
+
+
+def put_shared(do_put, path, attrs, object_hashes):
+    """Put content of shared memory file with do_put. Remove the file
+    Git engines add the filename -> hash mapping to object_hashes"""
+    try:
+        with safeopen.std_open(path, "rb") as shared:
+            content = shared.read()
+    finally:
+        os.remove(path)
+    values = {CONTENT: content, OBJECT_HASHES: object_hashes}
+    return do_put(*[
+        values[attr] if isinstance(attr, Placeholder) else attr
+        for attr in attrs
+    ])
+
+
+def put_pool(do_put, path, attrs):
+    """Put content of shared memory file in a pool process.
+    Return its filename -> hash mapping"""
+    object_hashes = {}
+    put_shared(do_put, path, attrs, object_hashes)
+    return object_hashes
+
+
+def check_errors(errors):
+    """Raise errors of worker processes"""
+    if errors:
+        raise IOError("failed to store {} contents. {}".format(
+            len(errors), errors[0]))
 
 
 class Worker(Process):
+    """Process that puts contents of shared memory files.
+    It sends its filename -> hash mapping and errors when it stops"""
 
-    def __init__(self, task_queue, engine):
+    def __init__(self, task_queue, result_queue, do_put):
         Process.__init__(self)
         self.task_queue = task_queue
-        self.engine = engine
+        self.result_queue = result_queue
+        self.do_put = do_put
 
     def run(self):
+        object_hashes = {}
+        errors = []
         while True:
             queue_content = self.task_queue.get()
             if queue_content is None:
                 # Poison pill means shutdown
-                self.task_queue.task_done()
                 break
-
-            self.engine.do_put(*queue_content)
-            self.task_queue.task_done()
+            path, attrs = queue_content
+            try:
+                put_shared(self.do_put, path, attrs, object_hashes)
+            except Exception as error:                                           # pylint: disable=broad-except
+                errors.append("{}: {}".format(type(error).__name__, error))
+        self.result_queue.put((object_hashes, errors))
 
 
 def create_distributed(cls, name=None):
 
     class Distributed(cls):
+        """Put contents through worker processes
+
+        Contents are passed to the workers in shared memory files, instead
+        of being pickled through pipes. Workers keep their filename -> hash
+        mappings and send them in a single batch when the engine is closed
+        """
 
         def __init__(self, config):
             super(Distributed, self).__init__(config)
             self.tasks = None
+            self.results = None
             self.consumers = []
             self.num_consumers = None
             self.processes_started = False
-            self.object_hashes = Manager().dict()
 
         def start_processes(self):
             """Start processes"""
-            self.object_hashes = Manager().dict()
-
             self.num_consumers = cpu_count()
-            self.tasks = JoinableQueue()
+            # Bound the number of contents waiting in shared memory
+            self.tasks = Queue(2 * self.num_consumers)
+            self.results = Queue()
             self.consumers = []
 
             for _ in range(self.num_consumers):
-                consumer = Worker(self.tasks, self)
+                consumer = Worker(self.tasks, self.results, self.do_put)
                 self.consumers.append(consumer)
                 consumer.start()
             self.processes_started = True
@@ -58,21 +164,36 @@ def create_distributed(cls, name=None):
             if not self.processes_started:
                 self.start_processes()
 
-            self.tasks.put(self.put_attr(content, filename))
+            self.tasks.put(
+                (write_shared(content), shared_attrs(self, filename)))
             content_hash = self._get_hash_from_content(content)
             return content_hash
 
+        # Files are stored in this process by the streaming methods of cls.
+        # Passing them to the workers would read them into memory
+        put_stream = cls.put_stream
+        put_path = cls.put_path
+
         def close(self):
-            """Join and close processes"""
+            """Join processes and merge their filename -> hash mappings"""
             if self.processes_started:
                 # Add a poison pill for each consumer
                 for _ in range(self.num_consumers):
                     self.tasks.put(None)
 
-                # Wait for all of the tasks to finish
-                self.tasks.join()
+                errors = []
+                for _ in range(self.num_consumers):
+                    object_hashes, worker_errors = self.results.get()
+                    if object_hashes:
+                        self.object_hashes.update(object_hashes)
+                    errors.extend(worker_errors)
+                for consumer in self.consumers:
+                    consumer.join()
+                self.consumers = []
                 self.processes_started = False
-        
+                check_errors(errors)
+            super(Distributed, self).close()
+
     Distributed.__name__ = name or ("Distributed" + cls.__name__)
     return Distributed
 
@@ -80,62 +201,146 @@ def create_distributed(cls, name=None):
 def create_pool(cls, name=None):
 
     class ProcessingPool(cls):
+        """Put contents through a process pool
+
+        Contents are passed to the pool in shared memory files. The
+        filename -> hash mappings of the tasks are merged when the engine
+        is closed
+        """
 
         def __init__(self, config):
             super(ProcessingPool, self).__init__(config)
             self.pool = None
-            self.object_hashes = Manager().dict()
+            self.results = []
+            self.slots = None
             self.processes_started = False
 
         def start_processes(self):
             """Start processes"""
-            self.object_hashes = Manager().dict()
             self.pool = Pool(cpu_count())
+            # Bound the number of contents waiting in shared memory
+            self.slots = threading.BoundedSemaphore(2 * cpu_count())
             self.processes_started = True
 
+        def release(self, _):
+            """Release slot of finished task"""
+            self.slots.release()
+
         def put(self, content, filename="generic"):  # pylint: disable=method-hidden
             """Put content in the content database"""
             if not self.processes_started:
                 self.start_processes()
 
-            self.pool.apply_async(self.do_put, self.put_attr(content, filename))
+            self.slots.acquire()
+            self.results.append(self.pool.apply_async(
+                put_pool,
+                (self.do_put, write_shared(content),
+                 shared_attrs(self, filename)),
+                callback=self.release, error_callback=self.release))
             content_hash = self._get_hash_from_content(content)
             return content_hash
 
+        # Files are stored in this process by the streaming methods of cls.
+        # Passing them to the pool would read them into memory
+        put_stream = cls.put_stream
+        put_path = cls.put_path
+
         def close(self):
-            """Join and close processes"""
+            """Join processes and merge their filename -> hash mappings"""
             if self.processes_started:
                 self.pool.close()
                 self.pool.join()
+                errors = []
+                for result in self.results:
+                    try:
+                        object_hashes = result.get()
+                    except Exception as error:                                   # pylint: disable=broad-except
+                        errors.append("{}: {}".format(
+                            type(error).__name__, error))
+                        continue
+                    if object_hashes:
+                        self.object_hashes.update(object_hashes)
+                self.results = []
                 self.processes_started = False
-        
+                check_errors(errors)
+            super(ProcessingPool, self).close()
+
     ProcessingPool.__name__ = name or ("Pool" + cls.__name__)
     return ProcessingPool
 
 
-def create_threading(cls, name=None):
+def create_threading(cls, name=None, max_workers=None,
+                     max_pending_bytes=MAX_PENDING_BYTES):
 
     class Threading(cls):
+        """Put contents through a fixed-size thread pool
+
+        Submissions wait while pending contents hold more than
+        max_pending_bytes. Contents that are already being written are not
+        submitted again. Errors of workers are raised by close()
+        """
 
         def __init__(self, config):
             super(Threading, self).__init__(config)
-            self.persistence_threads = []
+            self.executor = None
+            self.condition = threading.Condition()
+            self.pending = set()  # hashes of contents that are being written
+            self.pending_bytes = 0
+            self.errors = []
+
+        def start_threads(self):
+            """Start thread pool"""
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        def reserve(self, size):
+            """Wait for space in the pending contents"""
+            with self.condition:
+                while (self.pending_bytes and
+                       self.pending_bytes + size > max_pending_bytes):
+                    self.condition.wait()
+                self.pending_bytes += size
+
+        def done(self, content_hash, size, future):
+            """Release space of finished put and keep its error"""
+            with self.condition:
+                self.pending_bytes -= size
+                self.pending.discard(content_hash)
+                if future.exception() is not None:
+                    self.errors.append(future.exception())
+                self.condition.notify_all()
 
         def put(self, content, filename="generic"):  # pylint: disable=method-hidden
             """Put content in the content database"""
-            t = threading.Thread(target=self.do_put, args=self.put_attr(content, filename))
-            self.persistence_threads.append(t)
-            t.start()
+            if self.executor is None:
+                self.start_threads()
             content_hash = self._get_hash_from_content(content)
+            with self.condition:
+                in_flight = content_hash in self.pending
+                self.pending.add(content_hash)
+            if in_flight:
+                self.reuse(content_hash, filename)
+                return content_hash
+            size = len(content)
+            self.reserve(size)
+            future = self.executor.submit(
+                self.do_put, *self.put_attr(content, filename))
+            future.add_done_callback(partial(self.done, content_hash, size))
             return content_hash
 
+        # Files are stored in this process by the streaming methods of cls.
+        # Passing them to the thread pool would read them into memory
+        put_stream = cls.put_stream
+        put_path = cls.put_path
+
         def close(self):
-            """Join and close threads"""
-            for t in self.persistence_threads:
-                t.join()
-            
-            self.persistence_threads = []
+            """Wait for pending puts and raise their first error"""
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
+            super(Threading, self).close()
+            if self.errors:
+                error, self.errors = self.errors[0], []
+                raise error
 
     Threading.__name__ = name or ("Threading" + cls.__name__)
     return Threading
-        
\ No newline at end of file
@@ -1,43 +1,226 @@
 import hashlib
 import os
+import threading
 from os.path import join, isdir, isfile
 
-from .base import ContentDatabaseEngine
+from ...utils.io import print_msg
+from .base import ContentDatabaseEngine, read_chunks, hash_stream
+from .compression import CODECS, MAGIC, THRESHOLD, encode, decode
 from .parallel import create_distributed, create_pool, create_threading
+from .hash_index import HashIndex
+from . import hash_index
 from . import safeopen
 
 STANDARD_DATABASE_DIR = 'content'
+# Codec of new objects. Defined by --content-engine plain+<codec>
+COMPRESSION_FILENAME = '.compression'
+
+
+def write_all(fd, data):
+    """Write data to file descriptor"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def kernel_copy(source_fd, target_fd, count, offset):
+    """Copy count bytes from source_fd offset to the position of target_fd"""
+    if hasattr(os, "copy_file_range"):
+        return os.copy_file_range(source_fd, target_fd, count, offset)
+    return os.sendfile(target_fd, source_fd, offset, count)
+
+
+def read_head(fileobj, size):
+    """Read the first size bytes of file object, or all of them if it is
+    smaller"""
+    parts, missing = [], size
+    while missing:
+        part = fileobj.read(missing)
+        if not part:
+            break
+        parts.append(part)
+        missing -= len(part)
+    return b"".join(parts)
+
+
+def copy_file(source, target, size):
+    """Copy size bytes of source into unbuffered target.
+    Use copy_file_range or sendfile to copy in the kernel, if possible"""
+    source_fd, target_fd = source.fileno(), target.fileno()
+    offset = 0
+    if hasattr(os, "copy_file_range") or hasattr(os, "sendfile"):
+        try:
+            while offset < size:
+                copied = kernel_copy(source_fd, target_fd, size - offset, offset)
+                if not copied:
+                    break
+                offset += copied
+            return
+        except OSError:
+            # Not supported between these files. Copy the rest in user space
+            pass
+    source.seek(offset)
+    for chunk in read_chunks(source):
+        write_all(target_fd, chunk)
 
 
 class PlainEngine(ContentDatabaseEngine):
     def __init__(self, config):
+        self.hash_index = None
         super(PlainEngine, self).__init__(config)
+        self.compression = None
+        # The codec was given by --content-engine. Otherwise, use the saved one
+        self.explicit_compression = False
+
+    @property
+    def codec(self):
+        """Return compression codec of new objects"""
+        return CODECS.get(self.compression)
+
+    def set_compression(self, name):
+        """Compress new objects with codec. Use zlib if it is not installed.
+        None does not compress new objects"""
+        if name is not None and name not in CODECS:
+            print_msg("compression codec {} is not available. Using zlib"
+                      .format(name), True)
+            name = "zlib"
+        self.compression = name
+        self.explicit_compression = True
 
     def connect(self, should_mock=False):
-        """Create content directory"""
-        if not should_mock and not isdir(self.content_path):
+        """Create content directory. Load or save the compression codec"""
+        if should_mock:
+            return
+        if not isdir(self.content_path):
             os.makedirs(self.content_path)
+            self.hash_index.create()
+        setting = join(self.content_path, COMPRESSION_FILENAME)
+        if not self.explicit_compression:
+            if isfile(setting):
+                with safeopen.std_open(setting, "r") as setting_file:
+                    self.set_compression(setting_file.read().strip())
+        elif self.compression is not None:
+            with safeopen.std_open(setting, "w") as setting_file:
+                setting_file.write(self.compression)
+        elif isfile(setting):
+            os.remove(setting)
 
     def set_path(self, config):
         """Set content path"""
         self.content_path = os.path.join(config.provenance_path, STANDARD_DATABASE_DIR)
+        self.hash_index = HashIndex(self.content_path, self.content_path)
 
     @staticmethod
-    def do_put(content_path, content):
+    def do_put(content_path, content, compression=None):
         """Perform put operation. This is used in the distributed wrapper"""
         content_hash = hashlib.sha1(content).hexdigest()
+        content_filename = PlainEngine.object_filename(content_path, content_hash)
+        if not isfile(content_filename):
+            hash_index.append(content_path, content_hash)
+            with safeopen.std_open(content_filename, "wb") as content_file:
+                content_file.write(encode(CODECS.get(compression), content))
+        return content_hash
+
+    @staticmethod
+    def object_filename(content_path, content_hash):
+        """Return path of object. Create its directory"""
         content_dirname = join(content_path, content_hash[:2])
         if not isdir(content_dirname):
             os.makedirs(content_dirname)
-        content_filename = join(content_dirname, content_hash[2:])
-        if not isfile(content_filename):
-            with safeopen.std_open(content_filename, "wb") as content_file:
-                content_file.write(content)
+        return join(content_dirname, content_hash[2:])
+
+    def temp_filename(self):
+        """Return temporary path for objects that are being stored"""
+        return join(self.content_path, "tmp-{}-{}".format(
+            os.getpid(), threading.current_thread().ident))
+
+    def write_stream(self, fileobj, target):
+        """Write encoded content of file object in chunks. Return its hash
+
+        As in encode, content is stored raw if the codec does not reduce its
+        size. Only seekable file objects are compressed, since the raw
+        content is read again"""
+        seekable = getattr(fileobj, "seekable", None)
+        start = fileobj.tell() if seekable is not None and seekable() else None
+        sha1 = hashlib.sha1()
+        head = read_head(fileobj, THRESHOLD)
+        sha1.update(head)
+        codec = self.codec
+        if codec is not None and len(head) == THRESHOLD and start is not None:
+            compressor = codec.compressobj()
+            data = compressor.compress(head)
+            target.write(codec.header)
+            target.write(data)
+            size, written = len(head), len(codec.header) + len(data)
+            for chunk in read_chunks(fileobj):
+                sha1.update(chunk)
+                size += len(chunk)
+                data = compressor.compress(chunk)
+                written += len(data)
+                target.write(data)
+            data = compressor.flush()
+            target.write(data)
+            if written + len(data) < size:
+                return sha1.hexdigest()
+            # Incompressible content
+            fileobj.seek(start)
+            target.seek(0)
+            target.truncate()
+            sha1 = hashlib.sha1()
+            head = read_head(fileobj, THRESHOLD)
+            sha1.update(head)
+        target.write(encode(None, head))
+        for chunk in read_chunks(fileobj):
+            sha1.update(chunk)
+            target.write(chunk)
+        return sha1.hexdigest()
+
+    def put_stream(self, fileobj, filename="generic"):  # pylint: disable=method-hidden
+        """Hash and store content of file object in chunks"""
+        temp_filename = self.temp_filename()
+        with safeopen.std_open(temp_filename, "wb") as temp_file:
+            content_hash = self.write_stream(fileobj, temp_file)
+        content_filename = self.object_filename(self.content_path, content_hash)
+        if isfile(content_filename):
+            os.remove(temp_filename)
+        else:
+            hash_index.append(self.content_path, content_hash)
+            os.replace(temp_filename, content_filename)
         return content_hash
 
+    def put_path(self, path, filename=None):  # pylint: disable=method-hidden
+        """Hash file in chunks. Copy it to the database only if it is new"""
+        with safeopen.std_open(path, "rb") as fileobj:
+            before = os.fstat(fileobj.fileno())
+            content_hash = hash_stream(fileobj)
+            content_filename = self.object_filename(
+                self.content_path, content_hash)
+            if isfile(content_filename):
+                return content_hash
+            fileobj.seek(0)
+            temp_filename = self.temp_filename()
+            if ((self.codec is None or before.st_size < THRESHOLD) and
+                    read_head(fileobj, len(MAGIC)) != MAGIC):
+                # Raw object
+                with safeopen.std_open(temp_filename, "wb", buffering=0) as temp_file:
+                    copy_file(fileobj, temp_file, before.st_size)
+            else:
+                fileobj.seek(0)
+                with safeopen.std_open(temp_filename, "wb") as temp_file:
+                    self.write_stream(fileobj, temp_file)
+            after = os.fstat(fileobj.fileno())
+            if (before.st_size, before.st_mtime) != (after.st_size, after.st_mtime):
+                # The file changed after the hash. Store what is read now
+                os.remove(temp_filename)
+                fileobj.seek(0)
+                return self.put_stream(fileobj, filename)
+            hash_index.append(self.content_path, content_hash)
+            os.replace(temp_filename, content_filename)
+            return content_hash
+
     def put_attr(self, content, filename):
         """Return attributes for the do_put operation"""
-        return (self.content_path, content)
+        return (self.content_path, content, self.compression)
 
     def put(self, content, filename):  # pylint: disable=method-hidden
         """Put content in the content database"""
@@ -49,28 +232,19 @@ class PlainEngine(ContentDatabaseEngine):
                                 content_hash[:2],
                                 content_hash[2:])
         with self.std_open(content_filename, "rb") as content_file:
-            return content_file.read()
+            return decode(content_file.read())
 
     def find_subhash(self, content_hash):
         """Get hash that starts by content_hash"""
-        content_dirname = content_hash[:2]
-        content_filename = content_hash[2:]
-        content_dir = join(self.content_path, content_dirname)
-        if not isdir(content_dir):
-            return None
-        for _, _, filenames in os.walk(content_dir):
-            for name in filenames:
-                if name.startswith(content_filename):
-                    return content_dirname + name
-        return None
-
-    def gc(self, content_hash):
-        """Do nothing for plain storage"""
-        pass
+        return self.hash_index.find(content_hash)
+
+    def gc(self, aggressive=False):                                              # pylint: disable=unused-argument
+        """Rebuild hash index from the stored objects"""
+        self.hash_index.rebuild()
 
     def commit_content(self, message):
-        """Do nothing for plain storage"""
-        pass
+        """Merge new hashes into the hash index"""
+        self.hash_index.merge()
 
 
 DistributedPlainEngine = create_distributed(PlainEngine)
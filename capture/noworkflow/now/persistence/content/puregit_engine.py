@@ -3,9 +3,18 @@ import os
 from os.path import isdir
 from . import git_system
 from . import safeopen
+from .base import AmbiguousHashError
 from .gitbase import GitContentDatabaseEngine
+from .packfile import create_packed
 
 
+# update-index --index-info removes entries with mode 0
+NULL_HASH = "0" * 40
+# Index of the last commit and its file -> blob entries, in the git directory.
+# Other engines keep tree hashes in TREE_CACHE
+INDEX_FILE = "noworkflow-index"
+INDEX_CACHE = "noworkflow-index-entries"
+
 
 class PureGitEngine(GitContentDatabaseEngine):
 
@@ -37,24 +46,87 @@ class PureGitEngine(GitContentDatabaseEngine):
         """Put content in the content database"""
         return self.do_put(*self.put_attr(content, filename))
 
+    def put_stream(self, fileobj, filename="generic"):  # pylint: disable=method-hidden
+        """Put content of file object in the content database"""
+        filename = self._inc_name(filename)
+        with safeopen.restore_open():
+            content_hash = git_system.hash_stream(fileobj, self.content_path)
+        self.object_hashes[filename] = content_hash
+        return content_hash
+
+    def put_path(self, path, filename=None):  # pylint: disable=method-hidden
+        """Put file in the content database. git reads it directly"""
+        if isinstance(path, int):
+            return super(PureGitEngine, self).put_path(path, filename)
+        filename = self._inc_name(path if filename is None else filename)
+        with safeopen.restore_open():
+            content_hash = git_system.hash_path(path, self.content_path)
+        self.object_hashes[filename] = content_hash
+        return content_hash
+
     def get(self, content_hash):  # pylint: disable=method-hidden
         """Get content from the content database"""
         return git_system.get(content_hash, self.content_path)
- 
-    def gc(self):
-        git_system.garbage_collection(self.content_path)
+
+    def gc(self, aggressive=False):
+        git_system.close_batches(self.content_path)
+        git_system.garbage_collection(self.content_path, aggressive)
+
+    def has_object(self, content_hash):
+        """Check if object is in the git repository"""
+        return git_system.has_object(content_hash, self.content_path)
+
+    def head(self):
+        """Return hash of the last commit"""
+        return git_system.show_ref(self._commit_ref, self.content_path)
 
     def find_subhash(self, content_hash):
         """Find hash in database"""
-        bytes_content_hash = content_hash.encode("utf-8")
-        print(bytes_content_hash)
-        objects = git_system.all_objects(self.content_path)
-        print(objects)
-        for obj in objects:
-            print(obj)
-            if obj.startswith(bytes_content_hash):
-                return obj
-        return None
+        candidates = git_system.disambiguate(content_hash, self.content_path)
+        if len(candidates) > 1:
+            raise AmbiguousHashError(content_hash, candidates)
+        return candidates[0] if candidates else None
+
+    def close(self):
+        """Stop batch processes"""
+        git_system.close_batches(self.content_path)
+
+    def commit_content(self, message):
+        """Commit the current files of content database
+
+        The index of the previous commit is kept in the git directory.
+        Only entries that changed are sent to update-index --index-info,
+        and write-tree reuses the cached trees of unchanged directories"""
+        self.close()
+        index_file = os.path.join(
+            os.path.abspath(self.content_path), INDEX_FILE)
+        # The entries are only valid if this engine wrote the head commit
+        previous = self.load_tree_cache(INDEX_CACHE)
+        if not os.path.exists(index_file):
+            previous = {}
+        elif not previous:
+            os.remove(index_file)
+        # Interrupted commits must not reuse the index
+        self.save_tree_cache({}, INDEX_CACHE)
+        try:
+            entries = [
+                ("0", NULL_HASH, key)
+                for key in sorted(set(previous) - set(self.object_hashes))
+            ]
+            entries.extend(
+                ("100644", value, key)
+                for key, value in sorted(self.object_hashes.items())
+                if previous.get(key) != value
+            )
+            git_system.update_index_info(entries, self.content_path, index_file)
+            tree = git_system.write_tree(self.content_path, index_file)
+            result = self.create_commit_object(message, tree)
+            self.save_tree_cache(dict(self.object_hashes), INDEX_CACHE)
+        except Exception:
+            if os.path.exists(index_file):
+                os.remove(index_file)
+            raise
+        return result
 
     def create_initial_commit(self):
         """Create the initial commit of the git repository"""
@@ -72,41 +144,5 @@ class PureGitEngine(GitContentDatabaseEngine):
         git_system.update_ref(self._commit_ref, result, self.content_path)
         return result
 
-    def new_tree(self, parent):
-        if parent == '':
-            git_system.rm_all(self.content_path)
-        return Tree(parent, self.content_path)
-
-    def insert_blob(self, tree, basename, value):
-        """Insert blob into tree"""
-        tree.insert_blob(basename, value)
-    
-    def insert_tree(self, tree, basename, value):
-        """Pure-git commands to update tree allow paths on insert-blob. We do not need to break down trees"""
-        pass
-
-    def write_tree(self, tree):
-        """Write tree to git directory"""
-        return tree.write()
-
-class Tree(object):
-
-    def __init__(self, dirname, content_path):
-        self.operations = []
-        self.dirname = dirname
-        self.content_path = os.path.join(content_path)
-
-    def insert_blob(self, basename, value):
-        self.operations.append((
-            git_system.update_index,
-            ("100644", value, os.path.join(self.dirname, basename), self.content_path)
-        ))
-
-    def write(self):
-        for op, args in self.operations:
-            op(*args)
-        result = "auto"
-        if self.dirname == '':
-            result = git_system.write_tree(self.content_path)
-            git_system.rm_all(self.content_path)
-        return result
+
+PackedPureGitEngine = create_packed(PureGitEngine)
@@ -14,8 +14,10 @@ from pygit2 import Repository
 from pygit2 import GIT_FILEMODE_BLOB, GIT_FILEMODE_TREE
 from pygit2 import Signature
 
+from .base import AmbiguousHashError, HEX_DIGITS
 from .gitbase import GitContentDatabaseEngine
 from .parallel import create_distributed, create_pool, create_threading
+from .packfile import create_packed
 
 
 class PyGitEngine(GitContentDatabaseEngine):
@@ -50,6 +52,24 @@ class PyGitEngine(GitContentDatabaseEngine):
         """Put content in the content database"""
         return self.do_put(*self.put_attr(content, filename))
     
+    def put_stream(self, fileobj, filename="generic"):  # pylint: disable=method-hidden
+        """Put content of file object in the content database"""
+        if not hasattr(self.repo, "create_blob_fromiobase"):
+            return super(PyGitEngine, self).put_stream(fileobj, filename)
+        filename = self._inc_name(filename)
+        content_hash = str(self.repo.create_blob_fromiobase(fileobj))
+        self.object_hashes[filename] = content_hash
+        return content_hash
+
+    def put_path(self, path, filename=None):  # pylint: disable=method-hidden
+        """Put file in the content database. libgit2 reads it directly"""
+        if isinstance(path, int):
+            return super(PyGitEngine, self).put_path(path, filename)
+        filename = self._inc_name(path if filename is None else filename)
+        content_hash = str(self.repo.create_blob_fromdisk(os.path.abspath(path)))
+        self.object_hashes[filename] = content_hash
+        return content_hash
+
     def get(self, content_hash):  # pylint: disable=method-hidden
         """Get content from the content database"""
         return_data = self.repo[content_hash].data
@@ -57,11 +77,27 @@ class PyGitEngine(GitContentDatabaseEngine):
     
     def find_subhash(self, content_hash):
         """Find hash in git"""
+        if content_hash.lower().strip(HEX_DIGITS):
+            return None
         try:
             blob = self.repo.revparse_single(content_hash)
             return str(blob.id)
         except KeyError:
             return None
+        except ValueError:
+            # libgit2 reports ambiguous prefixes as ValueError
+            raise AmbiguousHashError(content_hash)
+
+    def has_object(self, content_hash):
+        """Check if object is in the git repository"""
+        return content_hash in self.repo
+
+    def head(self):
+        """Return hash of the last commit"""
+        try:
+            return str(self.repo.lookup_reference(self._commit_ref).target)
+        except KeyError:
+            return None
 
     def create_initial_commit(self):
         """Create the initial commit of the git repository"""
@@ -105,3 +141,4 @@ class PyGitEngine(GitContentDatabaseEngine):
 DistributedPyGitEngine = create_distributed(PyGitEngine)
 PoolPyGitEngine = create_pool(PyGitEngine)
 ThreadingPyGitEngine = create_threading(PyGitEngine)
+PackedPyGitEngine = create_packed(PyGitEngine)
@@ -0,0 +1,70 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""In-process read cache of the content database"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import threading
+
+from collections import OrderedDict
+
+from ..utils.metaprofiler import meta_profiler
+
+
+CACHE_SIZE = 64 * 1024 * 1024
+# Contents larger than CACHE_SIZE / LARGE_FRACTION are not cached.
+# They would evict everything else
+LARGE_FRACTION = 4
+HITS = meta_profiler.counter("content_cache_hits")
+HIT_BYTES = meta_profiler.counter("content_cache_hit_bytes")
+MISSES = meta_profiler.counter("content_cache_misses")
+
+
+class ContentCache(object):
+    """Size-bounded LRU cache of contents
+
+    Contents never change, since they are addressed by their hashes.
+    Hits and misses are counted in the metaprofiler"""
+
+    def __init__(self, max_bytes=CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, content_hash, load):
+        """Return content of hash. Call load(content_hash) on misses"""
+        with self.lock:
+            content = self.entries.pop(content_hash, None)
+            if content is not None:
+                self.entries[content_hash] = content
+                meta_profiler.count(HITS)
+                meta_profiler.count(HIT_BYTES, len(content))
+            else:
+                meta_profiler.count(MISSES)
+        if content is not None:
+            return content
+        content = load(content_hash)
+        self.add(content_hash, content)
+        return content
+
+    def add(self, content_hash, content):
+        """Add content to the cache. Evict least recently used contents"""
+        if len(content) > self.max_bytes // LARGE_FRACTION:
+            return
+        with self.lock:
+            if content_hash in self.entries:
+                return
+            self.entries[content_hash] = content
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old)
+
+    def clear(self):
+        """Remove all contents"""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -9,6 +9,8 @@ from __future__ import (absolute_import, print_function,
 import importlib
 from os.path import join, isdir
 from .content.plain_engine import STANDARD_DATABASE_DIR
+from .content.chunk_engine import CHUNK_DATABASE_DIR
+from .content_cache import ContentCache
 from ..utils.io import print_msg
 
 class ContentDatabase(object):
@@ -18,30 +20,38 @@ class ContentDatabase(object):
         self.content_path = None  # Base path for storing content of files
         persistence_config.add(self)
         self.content_database_engine = None
+        self.cache = ContentCache()
 
         self.content_engines = {
             "plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
             "sequential_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
             "distributed_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
             "pool_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
-            "threading_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
+            "threading_plain": "noworkflow.now.persistence.content.plain_engine.ThreadingPlainEngine",
             "pygit": "noworkflow.now.persistence.content.pygit_engine.DistributedPyGitEngine",
             "sequential_pygit": "noworkflow.now.persistence.content.pygit_engine.PyGitEngine",
             "distributed_pygit": "noworkflow.now.persistence.content.pygit_engine.DistributedPyGitEngine",
             "pool_pygit": "noworkflow.now.persistence.content.pygit_engine.PoolPyGitEngine",
             "threading_pygit": "noworkflow.now.persistence.content.pygit_engine.ThreadingPyGitEngine",
+            "packed_pygit": "noworkflow.now.persistence.content.pygit_engine.PackedPyGitEngine",
             "dulwich": "noworkflow.now.persistence.content.dulwich_engine.DulwichEngine",
             "sequential_dulwich": "noworkflow.now.persistence.content.dulwich_engine.DulwichEngine",
             "distributed_dulwich": "noworkflow.now.persistence.content.dulwich_engine.DistributedDulwichEngine",
             "pool_dulwich": "noworkflow.now.persistence.content.dulwich_engine.PoolDulwichEngine",
             "threading_dulwich": "noworkflow.now.persistence.content.dulwich_engine.ThreadingDulwichEngine",
+            "packed_dulwich": "noworkflow.now.persistence.content.dulwich_engine.PackedDulwichEngine",
             "puregit": "noworkflow.now.persistence.content.puregit_engine.PureGitEngine",
+            "packed_puregit": "noworkflow.now.persistence.content.puregit_engine.PackedPureGitEngine",
             "gitdb": "noworkflow.now.persistence.content.gitdb_engine.GitDBPyGitEngine",
+            "chunked": "noworkflow.now.persistence.content.chunk_engine.ChunkEngine",
         }
 
     def define_engine(self, config):
         if config.content_engine is not None:
             engine = config.content_engine
+        elif isdir(join(config.provenance_path, CHUNK_DATABASE_DIR)):
+            # Use content-defined chunks
+            engine = "chunked"
         elif isdir(join(config.provenance_path, STANDARD_DATABASE_DIR)):
             # Use plain directory
             engine = "plain"
@@ -57,6 +67,8 @@ class ContentDatabase(object):
                 except ImportError:
                     # Use plain
                     engine = "plain"
+        # engine+codec compresses new objects with codec
+        engine, _, compression = engine.partition("+")
         if '.' in engine:
             full_name = engine
         else:
@@ -66,12 +78,22 @@ class ContentDatabase(object):
         module = importlib.import_module(module_name) 
         cls = getattr(module, class_name)
         self.content_database_engine = cls(config)
+        if compression:
+            self.content_database_engine.set_compression(compression)
+        elif config.content_engine is not None:
+            # An explicit engine without codec does not compress new objects
+            self.content_database_engine.set_compression(None)
         
 
+    def get(self, content_hash):
+        """Get content from the engine or from the read cache"""
+        return self.cache.get(content_hash, self.content_database_engine.get)
+
     def __getattr__(self, attr):
         return getattr(self.content_database_engine, attr)
 
     def set_path(self, config):
+        self.cache.clear()
         if self.content_database_engine is None:
             self.define_engine(config)
         self.content_database_engine.set_path(config)
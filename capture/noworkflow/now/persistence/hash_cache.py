@@ -0,0 +1,121 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content hashes of files keyed by their stat"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import io
+import os
+import pickle
+import time
+
+from os.path import join, exists
+
+
+HASH_CACHE_FILENAME = "hash_cache.pickle"
+# Files modified less than RACY_NS before being hashed may change again
+# without changing their stat, due to the mtime granularity of the filesystem
+RACY_NS = 2 * 10 ** 9
+MAX_ENTRIES = 100000
+
+# The Profiler replaces open functions. The cache must not use them
+_open = io.open                                                                  # pylint: disable=invalid-name
+
+
+def stat_key(name):
+    """Return (device, inode, size, mtime_ns) of file. None if it does not
+    exist"""
+    try:
+        stat = os.stat(name)
+    except (OSError, TypeError, ValueError):
+        return None
+    mtime_ns = getattr(stat, "st_mtime_ns", None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 10 ** 9)
+    return (stat.st_dev, stat.st_ino, stat.st_size, mtime_ns)
+
+
+class HashCache(object):
+    """Map file stats to content hashes across activations and trials
+
+    Entries are valid only for the content engine that produced them"""
+
+    def __init__(self, persistence_config):
+        self.path = None
+        self.engine = None
+        self.entries = None
+        self.changed = False
+        self.should_mock = False
+        persistence_config.add(self)
+
+    def set_path(self, config):
+        """Set cache path"""
+        self.path = join(config.provenance_path, HASH_CACHE_FILENAME)
+        self.entries = None
+
+    def mock(self, config):                                                      # pylint: disable=unused-argument
+        """Disable cache"""
+        self.should_mock = True
+
+    def connect(self, config):                                                   # pylint: disable=unused-argument
+        """Load cache lazily"""
+        pass
+
+    def set_engine(self, engine):
+        """Set content engine name. Discard entries of other engines"""
+        self.load()
+        if engine != self.engine:
+            self.engine = engine
+            self.entries = {}
+            self.changed = True
+
+    def load(self):
+        """Load cache from .noworkflow"""
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if self.path is None or self.should_mock or not exists(self.path):
+            return
+        try:
+            with _open(self.path, "rb") as cache_file:
+                self.engine, self.entries = pickle.load(cache_file)
+        except Exception:                                                        # pylint: disable=broad-except
+            self.engine, self.entries = None, {}
+
+    def get(self, key):
+        """Return content hash of file with stat key. None if it is unknown"""
+        if key is None or self.should_mock:
+            return None
+        self.load()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        content_hash, stat_time = entry
+        if key[3] + RACY_NS > stat_time:
+            return None
+        return content_hash
+
+    def set(self, key, content_hash):
+        """Associate stat key to content hash"""
+        if key is None or self.should_mock:
+            return
+        self.load()
+        self.entries[key] = (content_hash, int(time.time() * 10 ** 9))
+        self.changed = True
+
+    def save(self):
+        """Save cache into .noworkflow"""
+        if not self.changed or self.should_mock or self.path is None:
+            return
+        entries = self.entries
+        if len(entries) > MAX_ENTRIES:
+            newest = sorted(entries, key=lambda key: entries[key][1])
+            entries = {key: entries[key] for key in newest[-MAX_ENTRIES:]}
+        temp_path = "{}.{}".format(self.path, os.getpid())
+        with _open(temp_path, "wb") as cache_file:
+            pickle.dump((self.engine, entries), cache_file,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+        self.changed = False
@@ -39,7 +39,7 @@ cdef class FileAccessLw(BaseLW):
     cdef public int trial_id, id, function_activation_id;
     cdef public str name, mode, buffering;
     cdef public str content_hash_before, content_hash_after;
-    cdef public object timestamp;
+    cdef public object timestamp, stat;
     cdef public bint done;
 
 cdef class VariableLW(BaseLW):
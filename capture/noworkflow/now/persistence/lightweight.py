@@ -6,7 +6,10 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
-from datetime import datetime
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from weakref import WeakValueDictionary
 
 from future.utils import viewitems, viewvalues
 
@@ -356,6 +359,409 @@ class ActivationLW(BaseLW):
         )
 
 
+try:
+    array("q")
+    LONG = "q"
+except ValueError:
+    LONG = "l"
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+# Timestamp of activations that did not finish
+NO_TIME = -1
+
+
+def to_time(value):
+    """Convert datetime into microseconds since EPOCH"""
+    if value is None:
+        return NO_TIME
+    return (value - EPOCH) // MICROSECOND
+
+
+def from_time(value):
+    """Convert microseconds since EPOCH into datetime"""
+    if value == NO_TIME:
+        return None
+    return EPOCH + timedelta(microseconds=value)
+
+
+class LazyList(list):
+    """Empty list that is only kept by the store after its first append"""
+
+    __slots__ = ("store", "aid", "name")
+
+    def __init__(self, store, aid, name):                                        # pylint: disable=super-init-not-called
+        self.store = store
+        self.aid = aid
+        self.name = name
+
+    def append(self, value):
+        self.store.extras_of(self.aid)[self.name] = self
+        list.append(self, value)
+
+
+def column(name, load=None, dump=None):
+    """Create property that reads and writes a store column
+
+    Arguments:
+    name -- column name in ColumnarActivationStore
+    load -- function (store, value) that converts stored values
+    dump -- function (store, value) that converts values before storing them
+    """
+    def fget(self):
+        value = getattr(self.store, name)[self.row]
+        if load is not None:
+            return load(self.store, value)
+        return value
+
+    def fset(self, value):
+        if dump is not None:
+            value = dump(self.store, value)
+        getattr(self.store, name)[self.row] = value
+
+    return property(fget, fset)
+
+
+def extra(name, factory, lazy=False, slicing=False):
+    """Create property for auxiliary containers
+    Containers are allocated only when they are accessed
+
+    Arguments:
+    name -- container name
+    factory -- function that creates the container
+    lazy -- do not keep the container before its first append
+    slicing -- only keep the container when the store is used for slicing
+    """
+    def fget(self):
+        store = self.store
+        if slicing and not store.slicing:
+            return factory()
+        extras = store.extras.get(self.id)
+        if extras is not None and name in extras:
+            return extras[name]
+        if lazy and not store.slicing:
+            return LazyList(store, self.id, name)
+        value = store.extras_of(self.id)[name] = factory()
+        return value
+
+    def fset(self, value):
+        if slicing and not self.store.slicing:
+            return
+        self.store.extras_of(self.id)[name] = value
+
+    return property(fget, fset)
+
+
+def load_string(store, value):
+    """Load interned string"""
+    return store.strings[value]
+
+
+def dump_string(store, value):
+    """Intern string"""
+    return store.intern(value)
+
+
+class ActivationView(BaseLW):                                                    # pylint: disable=too-many-instance-attributes
+    """Activation stored in a ColumnarActivationStore
+    It has the same interface as ActivationLW
+    """
+
+    __slots__ = ("store", "id", "_row", "_version")
+    attributes = ActivationLW.attributes
+    special = ActivationLW.special
+
+    def __init__(self, store, aid):
+        self.store = store
+        self.id = aid                                                            # pylint: disable=invalid-name
+        self._row = None
+        self._version = None
+
+    @property
+    def row(self):
+        """Return the row of the activation in the store"""
+        store = self.store
+        if self._version != store.version:
+            self._row = store.row(self.id)
+            self._version = store.version
+        return self._row
+
+    @property
+    def trial_id(self):
+        """Return trial id"""
+        return self.store.trial_id
+
+    @trial_id.setter
+    def trial_id(self, value):
+        """Set trial id of the whole store"""
+        self.store.trial_id = value
+
+    @property
+    def is_main(self):
+        """Activation is __main__"""
+        return self.id == 1
+
+    name = column("name_ids", load_string, dump_string)
+    filename = column("filename_ids", load_string, dump_string)
+    definition_file = column("definition_file_ids", load_string, dump_string)
+    line = column("lines")
+    lasti = column("lastis")
+    caller_id = column("caller_ids")
+    start = column("starts", lambda store, value: from_time(value),
+                   lambda store, value: to_time(value))
+    finish = column("finishes", lambda store, value: from_time(value),
+                    lambda store, value: to_time(value))
+    return_value = column("return_values")
+    with_definition = column("with_definitions", lambda store, value: bool(value))
+    has_parameters = column("has_parameters", lambda store, value: bool(value))
+
+    file_accesses = extra("file_accesses", list, lazy=True)
+    context = extra("context", dict)
+    temp_context = extra("temp_context", set)
+    temp_line = extra("temp_line", lambda: None)
+    slice_stack = extra("slice_stack", list)
+    args = extra("args", list, slicing=True)
+    kwargs = extra("kwargs", list, slicing=True)
+    starargs = extra("starargs", list, slicing=True)
+    loops = extra("loops", list)
+    conditions = extra("conditions", list)
+    permanent_conditions = extra("permanent_conditions", list)
+
+    is_complete = ActivationLW.__dict__["is_complete"]
+    is_comprehension = ActivationLW.__dict__["is_comprehension"]
+    __repr__ = ActivationLW.__dict__["__repr__"]
+
+
+class ColumnarActivationStore(object):                                           # pylint: disable=too-many-instance-attributes
+    """Temporary array-backed storage for activations
+    It has the same interface as ObjectStore(ActivationLW), but stores each
+    attribute in a column and creates ActivationView objects on demand.
+    Auxiliary containers are only allocated when they are used
+    """
+
+    def __init__(self, slicing=False):
+        """Initialize Columnar Activation Store
+
+
+        Arguments:
+        slicing -- keep containers that are only read by slicing
+        """
+        self.cls = ActivationLW
+        self.id = 0                                                              # pylint: disable=invalid-name
+        self.count = 0
+        self.trial_id = -1
+        self.slicing = slicing
+        # Changes whenever rows move
+        self.version = 0
+        # Rows removed by __delitem__ are only compacted on next add
+        self.dirty = False
+
+        # Interned strings
+        self.strings = []
+        self.string_ids = {}
+
+        # Columns
+        self.ids = array(LONG)
+        self.caller_ids = array(LONG)
+        self.lines = array("l")
+        self.lastis = array("l")
+        self.name_ids = array("l")
+        self.filename_ids = array("l")
+        self.definition_file_ids = array("l")
+        self.starts = array(LONG)
+        self.finishes = array(LONG)
+        self.return_values = []
+        self.with_definitions = bytearray()
+        self.has_parameters = bytearray()
+        self.deleted = bytearray()
+
+        # Auxiliary containers by activation id
+        self.extras = {}
+        # Views that may be referenced by the collection
+        self.views = WeakValueDictionary()
+
+    def intern(self, string):
+        """Return the id of an interned string"""
+        sid = self.string_ids.get(string)
+        if sid is None:
+            sid = self.string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        return sid
+
+    def extras_of(self, aid):
+        """Return auxiliary containers of activation"""
+        extras = self.extras.get(aid)
+        if extras is None:
+            extras = self.extras[aid] = {}
+        return extras
+
+    def row(self, aid):
+        """Return row of activation id"""
+        ids = self.ids
+        if ids:
+            row = aid - ids[0]
+            if 0 <= row < len(ids) and ids[row] == aid:
+                return row
+            row = bisect_left(ids, aid)
+            if row < len(ids) and ids[row] == aid:
+                return row
+        raise KeyError(aid)
+
+    def __getitem__(self, index):
+        view = self.views.get(index)
+        if view is None:
+            view = ActivationView(self, index)
+            self.views[index] = view
+        if self.deleted[view.row]:
+            return None
+        return view
+
+    def __delitem__(self, index):
+        self.deleted[self.row(index)] = 1
+        self.count -= 1
+
+    def add(self, definition_file, filename, name, line, lasti,                  # pylint: disable=too-many-arguments
+            caller_id, with_definition):
+        """Add activation using ActivationLW arguments and return id"""
+        if self.dirty:
+            self.compact()
+        self.id += 1
+        aid = self.id
+        values = (
+            aid, caller_id if caller_id else -1, line, lasti,
+            self.intern(name), self.intern(filename),
+            self.intern(definition_file), to_time(datetime.now()), NO_TIME,
+            None, bool(with_definition), True, False
+        )
+        ids = self.ids
+        if ids and ids[-1] >= aid:
+            # The id counter was reset. Replace the existing activation
+            row = self.row(aid)
+            self.detach(aid)
+            if self.deleted[row]:
+                self.count += 1
+            for col, value in zip(self.columns(), values):
+                col[row] = value
+        else:
+            for col, value in zip(self.columns(), values):
+                col.append(value)
+            self.count += 1
+        return aid
+
+    def add_object(self, *args):
+        """Add activation using ActivationLW arguments and return view"""
+        return self[self.add(*args)]
+
+    def dry_add(self, *args):
+        """Return object that would be added by add_object
+        Do not add it to storage
+        """
+        return self.cls(-1, *args)
+
+    def remove(self, value):
+        """Remove object from storage"""
+        try:
+            if not self.deleted[self.row(value.id)]:
+                del self[value.id]
+        except KeyError:
+            pass
+
+    def columns(self):
+        """Return all columns"""
+        return (
+            self.ids, self.caller_ids, self.lines, self.lastis, self.name_ids,
+            self.filename_ids, self.definition_file_ids, self.starts,
+            self.finishes, self.return_values, self.with_definitions,
+            self.has_parameters, self.deleted
+        )
+
+    def detach(self, aid):
+        """Move a referenced view and its containers into a new store"""
+        view = self.views.pop(aid, None)
+        extras = self.extras.pop(aid, None)
+        if view is None:
+            return
+        row = self.row(aid)
+        store = ColumnarActivationStore(self.slicing)
+        store.trial_id = self.trial_id
+        store.count = 1 - self.deleted[row]
+        for target, source in zip(store.columns(), self.columns()):
+            target.append(source[row])
+        for attr in ("name_ids", "filename_ids", "definition_file_ids"):
+            col = getattr(store, attr)
+            col[0] = store.intern(self.strings[col[0]])
+        if extras is not None:
+            store.extras[aid] = extras
+        view.store = store
+        view._version = None                                                     # pylint: disable=protected-access
+        store.views[aid] = view
+
+    def compact(self):
+        """Remove deleted rows"""
+        self.dirty = False
+        deleted = self.deleted
+        if not any(deleted):
+            return
+        for row, aid in enumerate(self.ids):
+            if deleted[row]:
+                self.detach(aid)
+        keep = [row for row, removed in enumerate(deleted) if not removed]
+        for attr in ("ids", "caller_ids", "lines", "lastis", "name_ids",
+                     "filename_ids", "definition_file_ids", "starts",
+                     "finishes"):
+            col = getattr(self, attr)
+            setattr(self, attr, array(col.typecode, [col[row] for row in keep]))
+        self.return_values = [self.return_values[row] for row in keep]
+        for attr in ("with_definitions", "has_parameters", "deleted"):
+            col = getattr(self, attr)
+            setattr(self, attr, bytearray(col[row] for row in keep))
+        self.version += 1
+
+    def __iter__(self):
+        """Iterate on objects, and not ids"""
+        return self.values()
+
+    def items(self):
+        """Iterate on both ids and objects"""
+        for view in self.values():
+            yield view.id, view
+
+    def iteritems(self):
+        """Iterate on both ids and objects"""
+        return self.items()
+
+    def values(self):
+        """Iterate on objects if they exist"""
+        deleted = self.deleted
+        for row, aid in enumerate(self.ids):
+            if not deleted[row]:
+                yield self[aid]
+
+    def clear(self):
+        """Remove deleted objects from storage on next add"""
+        self.dirty = True
+
+    def generator(self, trial_id, partial=False):
+        """Generator used for storing objects in database
+        Yielded views remain valid until the next add"""
+        self.trial_id = trial_id
+        deleted, finishes = self.deleted, self.finishes
+        for row, aid in enumerate(self.ids):
+            if deleted[row]:
+                continue
+            view = ActivationView(self, aid)
+            if partial and finishes[row] != NO_TIME:
+                deleted[row] = 1
+                self.count -= 1
+            yield view
+        if partial:
+            self.clear()
+
+    def has_items(self):
+        """Return true if it has items"""
+        return bool(self.count)
+
+
 class ObjectValueLW(BaseLW):
     """ObjectValue lightweight object
     There are type definitions on lightweight.pxd
@@ -397,7 +803,7 @@ class FileAccessLW(BaseLW):
         ["id", "name", "mode", "buffering", "timestamp", "trial_id",
          "content_hash_before", "content_hash_after",
          "function_activation_id"],
-        ["done"]
+        ["done", "stat"]
     )
     special = {"function_activation_id"}
 
@@ -412,6 +818,8 @@ class FileAccessLW(BaseLW):
         self.timestamp = datetime.now()
         self.function_activation_id = -1
         self.done = False
+        # Stat key of files opened in read-only mode
+        self.stat = None
 
     def update(self, variables):
         """Update file access with dict"""
@@ -19,6 +19,7 @@ from .file_access import FileAccess, UniqueFileAccess
 from .function_def import FunctionDef
 from .graph_cache import GraphCache
 from .head import Head
+from .history_node import HistoryNode
 from .module import Module
 from .object import Object
 from .object_value import ObjectValue
@@ -35,7 +36,7 @@ from .trial_prolog import TrialProlog
 
 
 ORDER = [
-    Trial, Head, Tag, GraphCache,  # Trial
+    Trial, Head, Tag, GraphCache, HistoryNode,  # Trial
     Module, Dependency, EnvironmentAttr,  # Deployment
     FunctionDef, Object,  # Definition
     Activation, ObjectValue, FileAccess,  # Execution
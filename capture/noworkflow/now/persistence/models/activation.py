@@ -7,13 +7,14 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from future.builtins import map as cvmap
-from sqlalchemy import Column, Integer, Text, TIMESTAMP
+from sqlalchemy import Column, Integer, Text, TIMESTAMP, select
 from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
 from sqlalchemy.orm import backref
 
 from ...utils.prolog import PrologDescription, PrologTrial, PrologTimestamp
 from ...utils.prolog import PrologAttribute, PrologRepr, PrologNullable
 
+from .. import relational
 from .base import AlchemyProxy, proxy_class, one, many_viewonly_ref, many_ref
 from .base import backref_one, backref_many, query_many_property
 from .object_value import ObjectValue
@@ -117,6 +118,19 @@ class Activation(AlchemyProxy):
         """Calculate activation duration"""
         return int((self.finish - self.start).total_seconds() * 1000000)
 
+    @classmethod  # query
+    def fast_load_by_trial(cls, trial_id, session=None):
+        """Return tuples (id, trial_id, name, line, caller_id, start, finish)
+        of trial activations ordered by start, as Trial.activations"""
+        session = session or relational.session
+        model = cls.m
+        return session.execute(
+            select([model.id, model.trial_id, model.name, model.line,
+                    model.caller_id, model.start, model.finish])
+            .where(model.trial_id == trial_id)
+            .order_by(model.start)
+        )
+
     def show(self, _print=lambda x, offset=0: print(x)):
         """Show object
 
@@ -10,14 +10,21 @@ import weakref
 
 from collections import OrderedDict, namedtuple
 from functools import wraps
+from itertools import islice
+from operator import attrgetter
 
 from future.utils import with_metaclass, viewitems, viewvalues, viewkeys
-from sqlalchemy import Column
+from sqlalchemy import Column, DateTime
 from sqlalchemy.orm import relationship
 
 from .. import relational
 
 
+# Maximum number of rows for each executemany in fast_insert
+CHUNK_SIZE = 10000
+DATETIME_SEPARATOR = str(" ")
+
+
 class MetaModel(type):
     """Model metaclass
 
@@ -232,13 +239,100 @@ class AlchemyProxy(Model):
     def fast_store(cls, trial_id, object_store, partial, conn=None):
         """Bulk insert lightweight objects from ObjectStore"""
         if object_store.has_items():
-            _conn = conn if conn else relational.engine.connect()
-            _conn.execute(
-                cls.__model__.__table__.insert().prefix_with("OR REPLACE"),
-                *object_store.generator(trial_id, partial)
-            )
-            if conn is None:
-                _conn.close()
+            keys, rows = cls.fast_rows(trial_id, object_store, partial)
+            if conn is not None:
+                cls.fast_insert(conn, keys, rows)
+                return
+            with relational.engine.begin() as _conn:
+                cls.fast_insert(_conn, keys, rows)
+
+    @classmethod
+    def fast_rows(cls, trial_id, object_store, partial):
+        """Return column names and generator of tuples from ObjectStore"""
+        columns, lwcls = cls.__table__.c, object_store.cls
+        keys = [key for key in lwcls.attributes if key in columns]
+        getter = attrgetter(*keys)
+        special = [index for index, key in enumerate(keys)
+                   if key in lwcls.special]
+        objects = object_store.generator(trial_id, partial)
+        if not special:
+            return keys, (getter(obj) for obj in objects)
+        return keys, (replace_special(getter(obj), special) for obj in objects)
+
+    @classmethod
+    def fast_insert(cls, conn, keys, rows, chunk_size=CHUNK_SIZE):
+        """Insert tuples with chunked executemany
+        Skip SQLAlchemy statement compilation and per-row dict processing
+
+        Arguments:
+        conn -- SQLAlchemy connection to a SQLite database
+        keys -- column names of tuples
+        rows -- iterable of tuples
+
+
+        Keyword arguments:
+        chunk_size -- maximum number of rows for each executemany
+        """
+        table = cls.__table__
+        dialect = conn.dialect
+        quote = dialect.identifier_preparer.quote
+        sql = "INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(
+            quote(table.name), ", ".join(quote(key) for key in keys),
+            ", ".join("?" for _ in keys)
+        )
+        processors = [
+            (index, processor) for index, processor in (
+                (index, bind_processor(table.c[key].type, dialect))
+                for index, key in enumerate(keys)
+            ) if processor is not None
+        ]
+        cursor = conn.connection.cursor()
+        try:
+            rows = iter(rows)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                if processors:
+                    chunk = [process_row(row, processors) for row in chunk]
+                cursor.executemany(sql, chunk)
+        finally:
+            cursor.close()
+
+
+def replace_special(row, special):
+    """Replace -1 by None in special columns"""
+    row = list(row)
+    for index in special:
+        if row[index] == -1:
+            row[index] = None
+    return row
+
+
+def format_datetime(value):
+    """Format datetime as the SQLAlchemy SQLite dialect, but faster"""
+    if value is None:
+        return None
+    text = value.isoformat(DATETIME_SEPARATOR)
+    if not value.microsecond:
+        text += ".000000"
+    return text
+
+
+def bind_processor(column_type, dialect):
+    """Return bind processor of column type for dialect"""
+    if isinstance(column_type, DateTime) and dialect.name == "sqlite":
+        return format_datetime
+    return column_type.dialect_impl(dialect).bind_processor(dialect)
+
+
+def process_row(row, processors):
+    """Apply bind processors to row values"""
+    row = list(row)
+    for index, processor in processors:
+        row[index] = processor(row[index])
+    return row
+
 
 def create_relationship(proxy_func):
     """Create proxy descriptor"""
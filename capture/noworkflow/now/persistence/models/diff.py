@@ -35,6 +35,12 @@ class Diff(Model):
     You can change the graph width and height by the variables:
         diff.graph.width = 600
         diff.graph.height = 400
+
+    The activation trees are matched by one of the algorithms:
+        fast: matches identical subtrees first. Scales to large trees
+            diff.graph.algorithm = "fast"
+        exact: minimum tree edit distance mapping (APTED)
+            diff.graph.algorithm = "exact"
     """
 
     __modelname__ = "Diff"
@@ -44,6 +50,7 @@ class Diff(Model):
         "graph.height": 500,
         "graph.mode": 3,
         "graph.time_limit": None,
+        "graph.algorithm": "fast",
     }
 
     REPLACE = {
@@ -51,6 +58,7 @@ class Diff(Model):
         "graph_height": "graph.height",
         "graph_mode": "graph.mode",
         "graph_time_limit": "graph.time_limit",
+        "graph_algorithm": "graph.algorithm",
     }
 
     def __init__(self, trial_ref1, trial_ref2, **kwargs):
@@ -0,0 +1,453 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Compact cache format of trial and diff graphs
+
+Nodes are stored as flat arrays of fixed size integers, and edges as an
+edge list. Per trial attributes (activations, duration, tooltip) are
+stored as entries that are indexed by offset arrays. All arrays are
+little-endian and each one is preceded by its size as a struct.
+
+Loaded graphs create DotDict nodes only when a consumer reaches them.
+Entries that were not written in this format are loaded by pickle
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import struct
+import sys
+
+from array import array
+from collections import defaultdict
+
+from ....utils.cross_version import pickle
+from ....utils.data import DotDict
+
+
+MAGIC = b"NOWGRAPH\x01"
+
+# Columns of the node array
+INDEX, PARENT_INDEX, CALLER_ID, CHILDREN_INDEX = 0, 1, 2, 3
+NAME, REPR, ORIGINAL1, ORIGINAL2, FLAGS = 4, 5, 6, 7, 8
+NODE_COLUMNS = 9
+
+# FLAGS bits
+HAS_RETURN, FULL_TOOLTIP = 1, 2
+
+# ORIGINAL values that do not refer to nodes
+NONE, MISSING = -1, -2
+
+# Bits of entries: dicts of the node that have the trial
+IN_ACTIVATIONS, IN_DURATION, IN_TOOLTIP, INT_DURATION = 1, 2, 4, 8
+
+NODE_KEYS = frozenset((
+    "index", "parent_index", "name", "caller_id", "children", "activations",
+    "duration", "full_tooltip", "tooltip", "children_index", "trial_ids",
+    "has_return", "repr", "original1", "original2",
+))
+EDGE_KEYS = frozenset(("count", "source", "target", "type"))
+
+# Order of sections after the magic
+SECTIONS = (
+    ("nodes", "q"),
+    ("child_offsets", "q"), ("children", "q"),
+    ("trial_offsets", "q"), ("trials", "q"),
+    ("entry_offsets", "q"), ("entry_keys", "q"), ("entry_flags", "B"),
+    ("durations", "d"), ("tooltips", "q"),
+    ("activation_offsets", "q"), ("activations", "q"),
+    ("edges", "q"),
+    ("count_offsets", "q"), ("count_keys", "q"), ("counts", "q"),
+    ("string_offsets", "q"), ("strings", "s"),
+    ("meta", "s"),
+)
+
+
+class CompactError(ValueError):
+    """Graph does not fit the compact format"""
+
+
+class Table(object):
+    """Map values to sequential ids"""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __call__(self, value):
+        key = (type(value), value)
+        result = self.ids.get(key)
+        if result is None:
+            result = self.ids[key] = len(self.values)
+            self.values.append(value)
+        return result
+
+
+def check_int(value):
+    """Return value if it is an int. Raise CompactError otherwise"""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise CompactError("expected int: {!r}".format(value))
+    return value
+
+
+class Encoder(object):
+    """Flatten graph into arrays"""
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self):
+        self.arrays = {name: [] for name, _ in SECTIONS}
+        for name in ("child_offsets", "trial_offsets", "entry_offsets",
+                     "activation_offsets", "count_offsets"):
+            self.arrays[name].append(0)
+        self.strings = Table()
+        self.keys = Table()
+        self.positions = {}
+
+    def string(self, value):
+        """Return id of string"""
+        if not isinstance(value, str):
+            raise CompactError("expected str: {!r}".format(value))
+        return self.strings(value)
+
+    def encode_node(self, node):
+        """Add node columns, children and entries"""
+        # pylint: disable=too-many-locals
+        arrays = self.arrays
+        if not NODE_KEYS.issuperset(node.keys()):
+            raise CompactError("unknown node attributes")
+        activations, duration = node["activations"], node["duration"]
+        tooltip = node["tooltip"]
+        if not (isinstance(activations, defaultdict) and
+                isinstance(duration, defaultdict) and
+                isinstance(tooltip, defaultdict)):
+            raise CompactError("expected defaultdicts")
+        originals = []
+        for key in ("original1", "original2"):
+            value = node.get(key, MISSING)
+            originals.append(
+                NONE if value is None else
+                value if value == MISSING else check_int(value))
+        arrays["nodes"].extend((
+            check_int(node["index"]), check_int(node["parent_index"]),
+            check_int(node["caller_id"]), check_int(node["children_index"]),
+            self.string(node["name"]),
+            self.string(node["repr"]) if "repr" in node else NONE,
+            originals[0], originals[1],
+            (HAS_RETURN if node["has_return"] else 0) |
+            (FULL_TOOLTIP if node["full_tooltip"] else 0),
+        ))
+        for child in node["children"]:
+            position = self.positions.get(id(child))
+            if position is None:
+                raise CompactError("child is not in the node list")
+            arrays["children"].append(position)
+        arrays["child_offsets"].append(len(arrays["children"]))
+        arrays["trials"].extend(self.keys(key) for key in node["trial_ids"])
+        arrays["trial_offsets"].append(len(arrays["trials"]))
+
+        entries = list(activations)
+        entries.extend(key for key in duration if key not in activations)
+        entries.extend(key for key in tooltip
+                       if key not in activations and key not in duration)
+        for key in entries:
+            flags = 0
+            if key in activations:
+                flags |= IN_ACTIVATIONS
+                arrays["activations"].extend(
+                    check_int(aid) for aid in activations[key])
+            arrays["activation_offsets"].append(len(arrays["activations"]))
+            value = 0
+            if key in duration:
+                flags |= IN_DURATION
+                value = duration[key]
+                if isinstance(value, int) and not isinstance(value, bool):
+                    flags |= INT_DURATION
+                elif not isinstance(value, float):
+                    raise CompactError("expected number: {!r}".format(value))
+            arrays["durations"].append(value)
+            if key in tooltip:
+                flags |= IN_TOOLTIP
+            arrays["tooltips"].append(
+                self.string(tooltip[key]) if key in tooltip else NONE)
+            arrays["entry_keys"].append(self.keys(key))
+            arrays["entry_flags"].append(flags)
+        arrays["entry_offsets"].append(len(arrays["entry_keys"]))
+
+    def encode_edge(self, edge):
+        """Add edge and its counts"""
+        arrays = self.arrays
+        if set(edge) != EDGE_KEYS or not isinstance(edge["count"], dict):
+            raise CompactError("unknown edge attributes")
+        arrays["edges"].extend((
+            check_int(edge["source"]),
+            check_int(edge["target"]),
+            self.string(edge["type"]),
+        ))
+        for key, count in edge["count"].items():
+            arrays["count_keys"].append(self.keys(key))
+            arrays["counts"].append(check_int(count))
+        arrays["count_offsets"].append(len(arrays["counts"]))
+
+    def __call__(self, result):
+        """Return compact bytes of (finished, graph, nodes)"""
+        finished, graph, nodes = result
+        graph = dict(graph)
+        root = graph.pop("root")
+        edges = graph.pop("edges")
+        nodes = list(nodes)
+        self.positions = {id(node): position
+                          for position, node in enumerate(nodes)}
+        for node in nodes:
+            self.encode_node(node)
+        for edge in edges:
+            self.encode_edge(edge)
+        root_position = NONE
+        if root is not None:
+            root_position = self.positions.get(id(root))
+            if root_position is None:
+                raise CompactError("root is not in the node list")
+
+        encoded = [value.encode("utf-8") for value in self.strings.values]
+        arrays = self.arrays
+        arrays["strings"] = b"".join(encoded)
+        offsets = arrays["string_offsets"]
+        offsets.append(0)
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        arrays["meta"] = pickle.dumps(
+            (finished, root_position, self.keys.values, graph), 2)
+
+        parts = [MAGIC]
+        for name, code in SECTIONS:
+            values = arrays[name]
+            if code == "s":
+                data = values
+            else:
+                values = array(code, values)
+                if sys.byteorder == "big":
+                    values.byteswap()
+                data = values.tobytes()
+            parts.append(struct.pack("<Q", len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+
+class LazyNode(DotDict):
+    """Node of a compact graph. Children are created on first access"""
+
+    def __init__(self, graph, position, fields):
+        super(LazyNode, self).__init__(fields)
+        object.__setattr__(self, "_graph", graph)
+        object.__setattr__(self, "_position", position)
+
+    def load(self):
+        """Create children nodes"""
+        if not dict.__contains__(self, "children"):
+            self["children"] = self._graph.children(self._position)
+        return self
+
+    def __getattr__(self, attr):
+        if attr == "children":
+            return self.load()["children"]
+        if dict.__contains__(self, attr):
+            return dict.__getitem__(self, attr)
+        return super(LazyNode, self).__getattr__(attr)
+
+    def __missing__(self, key):
+        if key == "children":
+            return self.load()["children"]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self.load(), key)
+
+    def __iter__(self):
+        return dict.__iter__(self.load())
+
+    def __len__(self):
+        return dict.__len__(self) + (not dict.__contains__(self, "children"))
+
+    def __eq__(self, other):
+        return dict.__eq__(self.load(), other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return dict.__repr__(self.load())
+
+    def keys(self):
+        return dict.keys(self.load())
+
+    def values(self):
+        return dict.values(self.load())
+
+    def items(self):
+        return dict.items(self.load())
+
+    def get(self, key, default=None):
+        return dict.get(self.load(), key, default)
+
+    def copy(self):
+        return DotDict(self.items())
+
+    def __reduce_ex__(self, protocol):
+        # Copies and pickles are regular nodes
+        return (DotDict, (), None, None, iter(list(self.items())))
+
+
+class LazyNodes(object):
+    """Sequence of nodes of a compact graph. Nodes are created on access"""
+
+    def __init__(self, data):
+        self.arrays = {}
+        self.offset = len(MAGIC)
+        for name, code in SECTIONS:
+            self.arrays[name] = self.read(data, code)
+        finished, self.root_position, self.keys, self.graph = pickle.loads(
+            self.arrays.pop("meta"))
+        self.finished = finished
+        self.strings = {}
+        self.cache = [None] * (len(self.arrays["nodes"]) // NODE_COLUMNS)
+
+    def read(self, data, code):
+        """Read section at offset"""
+        size, = struct.unpack_from("<Q", data, self.offset)
+        start = self.offset + 8
+        self.offset = start + size
+        if code == "s":
+            return data[start:self.offset]
+        result = array(code)
+        result.frombytes(data[start:self.offset])
+        if sys.byteorder == "big":
+            result.byteswap()
+        return result
+
+    def string(self, sid):
+        """Return string of id"""
+        result = self.strings.get(sid)
+        if result is None:
+            offsets = self.arrays["string_offsets"]
+            result = self.strings[sid] = self.arrays["strings"][
+                offsets[sid]:offsets[sid + 1]].decode("utf-8")
+        return result
+
+    def __len__(self):
+        return len(self.cache)
+
+    def __iter__(self):
+        for position in range(len(self.cache)):
+            yield self[position]
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index]
+                    for index in range(*position.indices(len(self)))]
+        node = self.cache[position]
+        if node is None:
+            node = self.cache[position] = self.create(
+                range(len(self))[position])
+        return node
+
+    def children(self, position):
+        """Return children list of node"""
+        offsets = self.arrays["child_offsets"]
+        return [
+            self[child] for child in
+            self.arrays["children"][offsets[position]:offsets[position + 1]]
+        ]
+
+    def create(self, position):
+        """Create node at position"""
+        # pylint: disable=too-many-locals
+        arrays, keys, string = self.arrays, self.keys, self.string
+        columns = arrays["nodes"]
+        base = position * NODE_COLUMNS
+        flags = columns[base + FLAGS]
+        activations = defaultdict(list)
+        duration = defaultdict(int)
+        tooltip = defaultdict(str)
+        offsets = arrays["trial_offsets"]
+        node = LazyNode(self, position, {
+            "index": columns[base + INDEX],
+            "parent_index": columns[base + PARENT_INDEX],
+            "name": string(columns[base + NAME]),
+            "caller_id": columns[base + CALLER_ID],
+            "activations": activations,
+            "duration": duration,
+            "full_tooltip": bool(flags & FULL_TOOLTIP),
+            "tooltip": tooltip,
+            "children_index": columns[base + CHILDREN_INDEX],
+            "trial_ids": [keys[key] for key in arrays["trials"][
+                offsets[position]:offsets[position + 1]]],
+            "has_return": bool(flags & HAS_RETURN),
+        })
+        if columns[base + REPR] != NONE:
+            node["repr"] = string(columns[base + REPR])
+        original = columns[base + ORIGINAL1]
+        if original != MISSING:
+            node["original1"] = None if original == NONE else original
+        original = columns[base + ORIGINAL2]
+        if original != MISSING:
+            node["original2"] = None if original == NONE else original
+
+        offsets = arrays["entry_offsets"]
+        entry_keys, entry_flags = arrays["entry_keys"], arrays["entry_flags"]
+        activation_offsets = arrays["activation_offsets"]
+        for entry in range(offsets[position], offsets[position + 1]):
+            key = keys[entry_keys[entry]]
+            flags = entry_flags[entry]
+            if flags & IN_ACTIVATIONS:
+                activations[key] = arrays["activations"][
+                    activation_offsets[entry]:activation_offsets[entry + 1]
+                ].tolist()
+            if flags & IN_DURATION:
+                value = arrays["durations"][entry]
+                duration[key] = int(value) if flags & INT_DURATION else value
+            if flags & IN_TOOLTIP:
+                tooltip[key] = string(arrays["tooltips"][entry])
+        return node
+
+    def edges(self):
+        """Return edge list"""
+        arrays, keys = self.arrays, self.keys
+        values, offsets = arrays["edges"], arrays["count_offsets"]
+        result = []
+        for edge in range(len(values) // 3):
+            count = defaultdict(int)
+            for position in range(offsets[edge], offsets[edge + 1]):
+                count[keys[arrays["count_keys"][position]]] = (
+                    arrays["counts"][position])
+            result.append({
+                'count': count,
+                'source': values[3 * edge],
+                'target': values[3 * edge + 1],
+                'type': self.string(values[3 * edge + 2]),
+            })
+        return result
+
+
+def dump_graph(result):
+    """Return cache bytes of (finished, graph, nodes).
+    Use pickle if the graph does not fit the compact format"""
+    try:
+        return Encoder()(result)
+    except (CompactError, KeyError, TypeError):
+        return pickle.dumps(result)
+
+
+def load_graph(data):
+    """Load (finished, graph, nodes) from cache bytes"""
+    if not data.startswith(MAGIC):
+        return pickle.loads(data)
+    try:
+        nodes = LazyNodes(data)
+    except struct.error as error:
+        raise ValueError("invalid graph cache: {}".format(error))
+    graph = dict(nodes.graph)
+    graph["root"] = (
+        None if nodes.root_position == NONE else nodes[nodes.root_position])
+    graph["edges"] = nodes.edges()
+    return nodes.finished, graph, nodes
@@ -17,6 +17,10 @@ from future.utils import viewitems
 
 from .trial_graph import Node
 from .structures import Graph, prepare_cache
+from .tree_mapping import fast_edit_mapping
+
+
+ALGORITHMS = ["fast", "exact"]
 
 
 class NowConfig(Config):
@@ -62,16 +66,20 @@ def merge(node1, node2, id_to_node1, id_to_node2):
     return new_node
 
 
-def create_mapping(root1, root2):
+def create_mapping(root1, root2, algorithm="exact"):
     """Creates mapping between trees rooted at root1 and root2
+    The exact algorithm runs APTED on the whole trees. The fast algorithm
+    runs it only on small regions that differ
 
     Returns:
     -- new root
     -- map from node index 1 to resulting node
     -- map from node index 2 to resulting node
     """
-    apted = APTED(root1, root2, CONFIG)
-    mapping = apted.compute_edit_mapping()
+    if algorithm == "exact":
+        mapping = APTED(root1, root2, CONFIG).compute_edit_mapping()
+    else:
+        mapping = fast_edit_mapping(root1, root2, CONFIG)
 
     combined_duration = copy(root1.duration)
     combined_duration.update(root2.duration)
@@ -148,13 +156,13 @@ def merge_edges(edges1, edges2, id_to_node1, id_to_node2):
     return edges
 
 
-def create_diff(trial_graph1, trial_graph2):
+def create_diff(trial_graph1, trial_graph2, algorithm="exact"):
     """Creates a graph structure that combines both graphs"""
     # pylint: disable=too-many-locals
     finished1, graph1, _ = trial_graph1
     finished2, graph2, _ = trial_graph2
     root, id_to_node1, id_to_node2 = create_mapping(
-        graph1['root'], graph2['root']
+        graph1['root'], graph2['root'], algorithm
     )
 
     nodes = []
@@ -217,8 +225,9 @@ def create_diff(trial_graph1, trial_graph2):
 
 
 cache = prepare_cache(  # pylint: disable=invalid-name
-    lambda self, *args, **kwargs: "diff {}:{}".format(self.diff.trial1.id,
-                                                      self.diff.trial2.id))
+    lambda self, *args, **kwargs: "diff {}:{}{}".format(
+        self.diff.trial1.id, self.diff.trial2.id,
+        "" if self.algorithm == "exact" else " " + self.algorithm))
 
 class DiffGraph(Graph):
     """Diff Graph Class. Present diff graph on Jupyter"""
@@ -228,6 +237,7 @@ class DiffGraph(Graph):
         self.use_cache = False
         self.width = 500
         self.height = 500
+        self.algorithm = "fast"
 
         self.mode = 2
 
@@ -243,7 +253,8 @@ class DiffGraph(Graph):
         """Convert tree structure into dict tree structure"""
         return create_diff(
             self.diff.trial1.graph.tree(),
-            self.diff.trial2.graph.tree()
+            self.diff.trial2.graph.tree(),
+            self.algorithm
         )
 
     @cache("no_match")
@@ -251,7 +262,8 @@ class DiffGraph(Graph):
         """Convert tree structure into dict graph without node matchings"""
         return create_diff(
             self.diff.trial1.graph.no_match(),
-            self.diff.trial2.graph.no_match()
+            self.diff.trial2.graph.no_match(),
+            self.algorithm
         )
 
     @cache("exact_match")
@@ -259,7 +271,8 @@ class DiffGraph(Graph):
         """Convert tree structure into dict graph and match equal calls"""
         return create_diff(
             self.diff.trial1.graph.exact_match(),
-            self.diff.trial2.graph.exact_match()
+            self.diff.trial2.graph.exact_match(),
+            self.algorithm
         )
 
     @cache("namespace_match")
@@ -267,7 +280,8 @@ class DiffGraph(Graph):
         """Convert tree structure into dict graph and match namespaces"""
         return create_diff(
             self.diff.trial1.graph.namespace_match(),
-            self.diff.trial2.graph.namespace_match()
+            self.diff.trial2.graph.namespace_match(),
+            self.algorithm
         )
 
     def _ipython_display_(self):
@@ -14,6 +14,7 @@ from collections import OrderedDict, defaultdict
 from future.utils import viewvalues
 
 from ....utils.cross_version import zip_longest
+from ..history_node import HistoryNode
 from ..trial import Trial
 from ..tag import Tag
 from .structures import Graph
@@ -45,6 +46,8 @@ class HistoryGraph(Graph):
         nodes -- list of trials in filtered history
         edges -- list of edges dicts with keys source and target as node index
         """
+        if not self.history.summarize:
+            return self._incremental_data()
 
         key = (
             self.history.script, self.history.status, self.history.summarize,
@@ -62,8 +65,9 @@ class HistoryGraph(Graph):
 
         nodes, scripts = self._filter_graph(tmap, graph)
 
-        edges, order, children, actual_graph = self._create_edges(
-            graph, nodes, tmap
+        order = OrderedDict()
+        edges, children, actual_graph = self._create_edges(
+            self._edges(graph, nodes, script_order=order), tmap
         )
 
         self._set_trials_level(tmap, scripts, order, children, actual_graph)
@@ -78,21 +82,108 @@ class HistoryGraph(Graph):
 
         return result
 
-    def graph(self):
-        """Return history_data as a dict graph"""
+    def _incremental_data(self):
+        """Create history data of unsummarized graphs
+
+        Edges connect trials to their nearest visible ancestor.
+        The layout is stored in HistoryNode by filter. When the filtered
+        trials extend the stored ones, only the new trials are linked and
+        stored, together with levels that changed. Otherwise, the stored
+        layout is rebuilt. Tags only change the display of trials
+        """
+        tmap = self._load_trials(
+            HistoryTrial(row) for row in Trial.fast_reverse_trials(MAXTRIALS)
+        )
+        for trial_id, tag_type, name in Tag.fast_load_tags():
+            trial = tmap.get(trial_id)
+            if trial is None:
+                continue  # Ignore filtered out
+            trial.tags.append(name)
+            if tag_type == "AUTO":
+                self._set_display(trial, name)
+
+        nodes, scripts = self._filter_trials(tmap)
+
+        key = "{}|{}".format(self.history.status.lower(), self.history.script)
+        stored = HistoryNode.fast_load(key) if self.use_cache else []
+        replace = not self.use_cache or [row[1] for row in stored] != [
+            trial.id for trial in nodes[:len(stored)]
+        ]
+        if replace:
+            stored = []
+        new_nodes = nodes[len(stored):]
+
+        targets = {row[1]: row[2] for row in stored}
+        targets.update(self._nearest_ancestors(
+            new_nodes, tmap, {trial.id for trial in nodes}
+        ))
+
+        order = OrderedDict()
+        edges, children, actual_graph = self._create_edges(
+            self._target_edges(targets, nodes, script_order=order), tmap
+        )
+
+        if new_nodes or replace:
+            self._set_trials_level(tmap, scripts, order, children,
+                                   actual_graph)
+            HistoryNode.fast_update(key, [
+                (trial.nid, trial.id, targets[trial.id], trial.level)
+                for trial in new_nodes
+            ], [
+                (row[0], trial.level) for trial, row in zip(nodes, stored)
+                if trial.level != row[3]
+            ], replace=replace)
+        else:
+            for trial, row in zip(nodes, stored):
+                trial.level = row[3]
+
+        return {
+            "nodes": nodes,
+            "edges": edges,
+            "scripts": list(self.history.scripts),
+        }
+
+    def graph(self, first=None, last=None, since=None, until=None):
+        """Return history_data as a dict graph
+
+        Keyword arguments restrict nodes to a window of trials.
+        Nodes keep the levels of the whole graph. Edges that leave the
+        window are removed. total is the number of nodes of the whole graph
+
+        Keyword arguments:
+        first -- first trial id (default=None)
+        last -- last trial id (default=None)
+        since -- first start timestamp, or prefix of it (default=None)
+        until -- last start timestamp, or prefix of it (default=None)
+        """
         result = self.history_data()
+        window = (first, last, since, until)
+        windowed = any(value is not None for value in window)
 
         # To JSON
         final = []
+        positions = {}
         for trial in result["nodes"]:
+            if windowed and not _in_window(trial, *window):
+                continue
+            positions[trial.nid] = len(final)
             dic = trial.to_dict(ignore=("start", "finish"), extra=(
                 "level", "status", "tooltip", "duration_text", "code_hash",
                 "str_start", "str_finish", "display"
             ))
             final.append(dic)
+        edges = result["edges"]
+        if len(final) != len(result["nodes"]):
+            edges = [
+                dict(edge, source=positions[edge["source"]],
+                     target=positions[edge["target"]])
+                for edge in edges
+                if edge["source"] in positions and edge["target"] in positions
+            ]
         return {
-            "edges": result["edges"],
+            "edges": edges,
             "nodes": final,
+            "total": len(result["nodes"]),
             "scripts": result["scripts"],
             "width": self.width,
             "height": self.height,
@@ -135,6 +226,14 @@ class HistoryGraph(Graph):
 
         return tmap
 
+    def _set_display(self, trial, name):  # pylint: disable=no-self-use
+        """Display trial by auto tag name"""
+        trial.display = name
+        trial.tooltip = "<b> Trial {}</b><br>{}".format(
+            trial.display,
+            trial.tooltip
+        )
+
     def _create_graph(self, trial_map):  # pylint: disable=no-self-use
         """Create graph with initial distances
 
@@ -168,11 +267,7 @@ class HistoryGraph(Graph):
 
             tag_node = Version(tag.name.split('.')[:2])
             trial = trial_map[tag.trial_id]
-            trial.display = tag.name
-            trial.tooltip = "<b> Trial {}</b><br>{}".format(
-                trial.display,
-                trial.tooltip
-            )
+            self._set_display(trial, tag.name)
             if tag_node not in node_map:
                 node_obj = node_map[tag_node] = Node(tag_node)
 
@@ -234,6 +329,68 @@ class HistoryGraph(Graph):
                     if graph[i][j] > graph[i][k] + graph[k][j]:
                         graph[i][j] = graph[i][k] + graph[k][j]
 
+    def _nearest_ancestors(self, trials, trial_map, visible):  # pylint: disable=no-self-use
+        """Return dict of trial id to the id of its nearest visible ancestor
+
+        Follow parent_id links, instead of calculating all distances.
+        Ancestors that are not visible remember the result for other trials.
+        Trials without visible ancestors target themselves, as in _edges
+
+
+        Arguments:
+        trials -- trials that require ancestors
+        trial_map -- map trial.id to trial
+        visible -- set of ids of trials that appear in the graph
+        """
+        nearest = {}
+        for trial in trials:
+            path, current, target = [], trial, None
+            seen = {trial.id}
+            while True:
+                parent_id = current.parent_id
+                if parent_id not in trial_map or parent_id in seen:
+                    break
+                if parent_id in visible:
+                    target = parent_id
+                    break
+                if parent_id in nearest:
+                    target = nearest[parent_id]
+                    break
+                path.append(parent_id)
+                seen.add(parent_id)
+                current = trial_map[parent_id]
+            for tid in path:
+                nearest[tid] = target
+            nearest[trial.id] = target
+        return {
+            trial.id: trial.id if nearest[trial.id] is None
+                      else nearest[trial.id]
+            for trial in trials
+        }
+
+    def _filter_trials(self, trial_map):
+        """Filter trials by script and status
+
+        Return:
+        nodes -- filtered trials from the oldest to the newest
+        scripts -- group trials by scripts
+
+
+        Arguments:
+        trial_map -- ordered trial map
+        """
+        status = self.history.status.lower()
+        script = self.history.script
+        nodes = []
+        scripts = defaultdict(list)
+        for trial in reversed(list(trial_map.values())):
+            if trial.match_status(status) and trial.match_script(script):
+                trial.nid = len(nodes)
+                nodes.append(trial)
+                scripts[trial.script].append(trial)
+
+        return nodes, scripts
+
     def _filter_graph(self, trial_map, graph):
         """Filter history graph
 
@@ -267,28 +424,25 @@ class HistoryGraph(Graph):
 
         return nodes, scripts
 
-    def _create_edges(self, graph, nodes, trial_map):
+    def _create_edges(self, edge_gen, trial_map):  # pylint: disable=no-self-use
         """Create edges for graph
 
         Arguments:
-        graph -- dict of dict of int with min distances between trials
-        nodes -- list of nodes from the oldest to the newest
+        edge_gen -- generator of (source, target) trial ids
         trial_map -- map of trial.id to trial node
 
 
         Return:
         edges -- edge list of dicts with source and target keys
-        order -- ordered dict with desired script order
         children -- dict with list of trials that have key trial as target
         actual_graph -- edge dict by trial id
         """
 
         edges = []
-        order = OrderedDict()
         children = defaultdict(list)
         actual_graph = {}
 
-        for source, target in self._edges(graph, nodes, script_order=order):
+        for source, target in edge_gen:
             edges.append({
                 "source": trial_map[source].nid,
                 "target": trial_map[target].nid,
@@ -298,7 +452,7 @@ class HistoryGraph(Graph):
             actual_graph[source] = target
             children[target].append(source)
 
-        return (edges, order, children, actual_graph)
+        return (edges, children, actual_graph)
 
     def _edges(self, graph, nodes, script_order=None):  # pylint: disable=no-self-use
         """Edge generator. Iterate through all edges on graph
@@ -324,6 +478,24 @@ class HistoryGraph(Graph):
                 yield (tid, target)
             script_order[trial.script] = 1
 
+    def _target_edges(self, targets, nodes, script_order=None):  # pylint: disable=no-self-use
+        """Edge generator. Iterate through edges of nearest ancestors
+
+
+        Arguments:
+        targets -- dict of trial id to the id of its target
+        nodes -- list of nodes from the oldest to the newest
+
+        Keyword arguments:
+        script_order -- ordered dict to be touched for setting the script order
+        """
+        if script_order is None:
+            script_order = {}
+
+        for trial in reversed(nodes):
+            yield (trial.id, targets[trial.id])
+            script_order[trial.script] = 1
+
     def _set_trials_level(self, tmap, scripts, order, children, actual_graph):  # pylint: disable=no-self-use, too-many-arguments
         """Adjust levels of trials according to their script and branchs
 
@@ -371,7 +543,7 @@ class HistoryGraph(Graph):
                     continue
 
                 parent_id = actual_graph[trial.id]
-                if children[parent_id].index(trial.id) > 0:
+                if children[parent_id][0] != trial.id:
                     # trial is not the first child
                     # increase level
                     trial.level = level
@@ -433,6 +605,71 @@ class HistoryGraph(Graph):
         return "\n".join(lines)
 
 
+class HistoryTrial(object):
+    """Trial of unsummarized history graphs
+
+    Load the columns of a trial row and provide the Trial properties that
+    the graph uses, without creating Trial proxies"""
+
+    def __init__(self, row):
+        for column in Trial.__columns__:
+            setattr(self, column, row[column])
+        self.tags = []
+
+    @property
+    def finished(self):
+        """Check if trial has finished"""
+        return bool(self.finish)
+
+    @property
+    def status(self):
+        """Check trial status
+        Possible statuses: finished, unfinished, backup"""
+        if not self.run:
+            return "backup"
+        return "finished" if self.finished else "unfinished"
+
+    @property
+    def status_letter(self):
+        """Return first letter of trial status"""
+        return self.status[0]
+
+    @property
+    def duration_text(self):
+        """Calculate trial duration. Return formatted str"""
+        if self.finish:
+            return str(self.finish - self.start)
+        return "None"
+
+    @property
+    def str_start(self):
+        """Return start date as string"""
+        return str(self.start)
+
+    @property
+    def str_finish(self):
+        """Return finish date as string"""
+        return str(self.finish)
+
+    def match_status(self, status):
+        """Check if trial statuses matches"""
+        return status == "*" or self.status == status
+
+    def match_script(self, script):
+        """Check if trial scripts matches"""
+        return script == "*" or self.script == script
+
+    def to_dict(self, ignore=tuple(), extra=tuple()):
+        """Return trial as dict, as Trial.to_dict"""
+        result = OrderedDict(
+            (attr, getattr(self, attr)) for attr in extra
+        )
+        for key in Trial.__columns__:
+            if key not in ignore and key not in extra:
+                result[key] = getattr(self, key)
+        return result
+
+
 class Node(object):
     """Node object with specific fields for graph"""
 
@@ -523,6 +760,21 @@ class Version(object):
         return cls([number])
 
 
+def _in_window(trial, first, last, since, until):
+    """Check if trial is in window of ids and start timestamps
+    Summarized nodes are in window if any of their trials is"""
+    if isinstance(trial, Node):
+        return any(_in_window(sub, first, last, since, until)
+                   for sub in trial.trials)
+    start = trial.str_start
+    return (
+        (first is None or trial.id >= first) and
+        (last is None or trial.id <= last) and
+        (since is None or start >= since) and
+        (until is None or start[:len(until)] <= until)
+    )
+
+
 def _line_text(active, trial, current, moving=False, width=25):
     """Return text for line history"""
     text = []
@@ -538,7 +790,7 @@ def _line_text(active, trial, current, moving=False, width=25):
         return "".join(text)
     return "{line}  {id: <4} {script: <{width}} {tags}".format(
         line="".join(text), id=trial.id, script=trial.script,
-        tags=", ".join(tag.name for tag in trial.tags), width=width
+        tags=", ".join(trial.tags), width=width
     )
 
 
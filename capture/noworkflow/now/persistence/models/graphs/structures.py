@@ -16,9 +16,11 @@ from sqlalchemy import exc
 from ... import relational, content
 from ...models import GraphCache
 
-from ....utils.cross_version import pickle
+from ....utils.data import DotDict
 from ....utils.io import print_msg
 
+from .compact import dump_graph, load_graph
+
 
 class Graph(object):                                                             # pylint: disable=too-few-public-methods
     """Graph superclass. Handle json transformation"""
@@ -30,6 +32,58 @@ class Graph(object):
                 .replace(">", "\\u003e"))
 
 
+def subtree(root, depth=None):
+    """Return copy of the tree of root and set of indexes of its nodes
+
+    Nodes at depth have no children in the copy. children_count keeps
+    the number of children of every copied node
+
+    Keyword arguments:
+    depth -- maximum depth. Root is at depth 0 (default=None: unlimited)
+    """
+    indexes = set()
+    result = None
+    stack = [(root, None, 0)]
+    while stack:
+        node, parent, level = stack.pop()
+        copy = DotDict(
+            (key, value) for key, value in node.items() if key != "children"
+        )
+        children = node.children
+        copy.children = []
+        copy.children_count = len(children)
+        indexes.add(node.index)
+        if parent is None:
+            result = copy
+        else:
+            parent.children.append(copy)
+        if depth is None or level < depth:
+            stack.extend(
+                (child, copy, level + 1) for child in reversed(children)
+            )
+    return result, indexes
+
+
+def tree_window(graph, root, depth=None):
+    """Return copy of graph JSON with the subtree of root
+    Keep edges between nodes of the subtree
+
+    Arguments:
+    graph -- graph JSON, with root and edges
+    root -- node of graph that is the root of the window
+
+    Keyword arguments:
+    depth -- maximum depth of the window (default=None: unlimited)
+    """
+    result = dict(graph)
+    result["root"], indexes = subtree(root, depth)
+    result["edges"] = [
+        edge for edge in graph["edges"]
+        if edge["source"] in indexes and edge["target"] in indexes
+    ]
+    return result
+
+
 def prepare_cache(get_type):
     """Decorator: Load graph from cache"""
     def cache(name, attrs=""):
@@ -58,7 +112,7 @@ def prepare_cache(get_type):
                         caches = GraphCache.select_cache(*information,
                                                          session=cache_session)
                         for cache in caches:
-                            result = pickle.loads(
+                            result = load_graph(
                                 content.get(cache.content_hash))
                             if not result[0]:
                                 continue
@@ -74,7 +128,7 @@ def prepare_cache(get_type):
                     GraphCache.remove(*information, session=cache_session)
                     GraphCache.create(
                         typ, name, duration, attributes,
-                        content.put(pickle.dumps(graph), name),
+                        content.put(dump_graph(graph), name),
                         session=cache_session, commit=True
                     )
                 except exc.SQLAlchemyError:
@@ -0,0 +1,170 @@
+# Copyright (c) 2017 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2017 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Scalable edit mapping between summarized activation trees
+
+APTED computes the optimal mapping, but it takes O(n^3) time and O(n^2)
+memory. fast_edit_mapping anchors identical subtrees first, matches the
+remaining subtrees top-down by name, and runs APTED only on residual
+regions that are small. Trees that are small are mapped by APTED
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from difflib import SequenceMatcher
+
+from apted import APTED
+
+from ....utils.data import DotDict
+
+
+# Residual regions with at most this number of nodes are mapped by APTED
+EXACT_SIZE = 80
+# Sequences whose product of lengths is larger than this are aligned
+# greedily instead of by SequenceMatcher
+ALIGN_LIMIT = 250000
+# Number of elements that the greedy alignment looks ahead
+LOOK_AHEAD = 8
+
+
+def structures(roots, children):
+    """Return map of id(node) to (structure id, subtree size)
+
+    Subtrees have the same structure id iff they have the same names
+    and the same children structures, in all roots"""
+    ids = {}
+    result = {}
+    for root in roots:
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            nodes = children(node)
+            if not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in nodes)
+                continue
+            key = (node.name, tuple(result[id(child)][0] for child in nodes))
+            result[id(node)] = (
+                ids.setdefault(key, len(ids)),
+                1 + sum(result[id(child)][1] for child in nodes)
+            )
+    return result
+
+
+def greedy_opcodes(seq1, seq2):
+    """Align sequences by pairing equal elements in order.
+    Skip at most LOOK_AHEAD elements to find the next pair"""
+    pos1 = pos2 = 0
+    while pos1 < len(seq1) and pos2 < len(seq2):
+        if seq1[pos1] == seq2[pos2]:
+            yield "equal", pos1, pos1 + 1, pos2, pos2 + 1
+            pos1, pos2 = pos1 + 1, pos2 + 1
+            continue
+        skip = None
+        for distance in range(1, LOOK_AHEAD + 1):
+            if (pos2 + distance < len(seq2) and
+                    seq2[pos2 + distance] == seq1[pos1]):
+                skip = (0, distance)
+                break
+            if (pos1 + distance < len(seq1) and
+                    seq1[pos1 + distance] == seq2[pos2]):
+                skip = (distance, 0)
+                break
+        if skip is None:
+            skip = (1, 1)
+        yield "replace", pos1, pos1 + skip[0], pos2, pos2 + skip[1]
+        pos1, pos2 = pos1 + skip[0], pos2 + skip[1]
+    if pos1 < len(seq1) or pos2 < len(seq2):
+        yield "replace", pos1, len(seq1), pos2, len(seq2)
+
+
+def align(seq1, seq2):
+    """Return opcodes that align two lists, as SequenceMatcher.
+    Tags are 'equal' or 'replace'. Replace blocks may have an empty side"""
+    prefix = 0
+    limit = min(len(seq1), len(seq2))
+    while prefix < limit and seq1[prefix] == seq2[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix and
+           seq1[-1 - suffix] == seq2[-1 - suffix]):
+        suffix += 1
+    end1, end2 = len(seq1) - suffix, len(seq2) - suffix
+    if prefix:
+        yield "equal", 0, prefix, 0, prefix
+    middle1, middle2 = seq1[prefix:end1], seq2[prefix:end2]
+    if len(middle1) * len(middle2) <= ALIGN_LIMIT:
+        opcodes = SequenceMatcher(
+            None, middle1, middle2, autojunk=False).get_opcodes()
+    else:
+        opcodes = greedy_opcodes(middle1, middle2)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if (i1, j1) != (i2, j2):
+            yield ("equal" if tag == "equal" else "replace",
+                   prefix + i1, prefix + i2, prefix + j1, prefix + j2)
+    if suffix:
+        yield "equal", end1, len(seq1), end2, len(seq2)
+
+
+def fast_edit_mapping(root1, root2, config, exact_size=EXACT_SIZE):
+    """Compute edit mapping between two trees, as APTED.compute_edit_mapping
+
+    Returns list of pairs of nodes that are mapped as pairs
+    Nodes that are deleted or inserted are mapped to None
+    """
+    # pylint: disable=too-many-locals
+    children = config.children
+    info = structures([root1, root2], children)
+    if info[id(root1)][1] + info[id(root2)][1] <= exact_size:
+        return APTED(root1, root2, config).compute_edit_mapping()
+
+    mapping = []
+
+    def subtree(root):
+        """Return nodes of subtree in preorder"""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(children(node)))
+
+    def residual(forest1, forest2, matched):
+        """Map unmatched sibling subtrees.
+        Add pairs that should be matched top-down to matched"""
+        size = sum(info[id(node)][1] for node in forest1 + forest2)
+        if forest1 and forest2 and size <= exact_size:
+            virtual1 = DotDict(name="", parent_index=-1, children=forest1)
+            virtual2 = DotDict(name="", parent_index=-1, children=forest2)
+            mapping.extend(
+                pair for pair in APTED(
+                    virtual1, virtual2, config).compute_edit_mapping()
+                if pair[0] is not virtual1 and pair[1] is not virtual2
+            )
+            return
+        for tag, i1, i2, j1, j2 in align([node.name for node in forest1],
+                                         [node.name for node in forest2]):
+            if tag == "equal":
+                matched.extend(zip(forest1[i1:i2], forest2[j1:j2]))
+                continue
+            for root in forest1[i1:i2]:
+                mapping.extend((node, None) for node in subtree(root))
+            for root in forest2[j1:j2]:
+                mapping.extend((None, node) for node in subtree(root))
+
+    stack = [(root1, root2)]
+    while stack:
+        node1, node2 = stack.pop()
+        mapping.append((node1, node2))
+        children1, children2 = children(node1), children(node2)
+        for tag, i1, i2, j1, j2 in align(
+                [info[id(child)][0] for child in children1],
+                [info[id(child)][0] for child in children2]):
+            if tag == "equal":
+                # Identical subtrees
+                for child1, child2 in zip(children1[i1:i2],
+                                          children2[j1:j2]):
+                    mapping.extend(zip(subtree(child1), subtree(child2)))
+            else:
+                residual(children1[i1:i2], children2[j1:j2], stack)
+    return mapping
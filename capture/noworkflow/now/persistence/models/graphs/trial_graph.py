@@ -8,18 +8,24 @@ from __future__ import (absolute_import, print_function,
 
 import weakref
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 
 from future.utils import viewitems
 
 from ....utils.data import DotDict
 
+from ..activation import Activation
 from .structures import prepare_cache
 from .structures import Graph
 
 
 Node = DotDict  # pylint: disable=invalid-name
 
+ActivationRow = namedtuple(                                                      # pylint: disable=invalid-name
+    "ActivationRow", "id trial_id name line caller_id duration")
+
+MODES = ["tree", "no_match", "exact_match", "namespace_match"]
+
 
 class Summarization(object):
     """Summarization algorithm
@@ -28,9 +34,10 @@ class Summarization(object):
     Creates graph based on caller_id
     """
 
-    def __init__(self, preorder):
+    def __init__(self, preorder=None):
         self.nid = 0
         self.root = None
+        self.last = None
         self.stack = []
         self.nodes = []
         self.matches = defaultdict(dict)
@@ -38,7 +45,8 @@ class Summarization(object):
             lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
         )
 
-        self(preorder)
+        if preorder is not None:
+            self(preorder)
 
     def graph(self, colors, width=0, height=0):  # pylint: disable=too-many-locals
         """Generate JSON"""
@@ -179,27 +187,34 @@ class Summarization(object):
         self.add_edge(last, node, 'sequence')
         return node
 
-    def __call__(self, preorder):
-
-        for call in preorder:
-            if not call.caller_id:
-                last = self.insert_first(call)
-                continue
-            if call.caller_id > last.caller_id:
-                last = self.insert_call(call, last)
-                continue
-
-            while call.caller_id < last.caller_id:
-                last = self.insert_return(last)
+    def add(self, call):
+        """Add next activation of the preorder"""
+        last = self.last
+        if not call.caller_id:
+            self.last = self.insert_first(call)
+            return
+        if call.caller_id > last.caller_id:
+            self.last = self.insert_call(call, last)
+            return
+
+        while call.caller_id < last.caller_id:
+            last = self.insert_return(last)
 
-            if call.caller_id == last.caller_id:
-                last = self.insert_sequence(call, last)
+        if call.caller_id == last.caller_id:
+            last = self.insert_sequence(call, last)
+        self.last = last
 
+    def finish(self):
+        """Close open calls after the last activation"""
         while self.stack:
-            last = self.insert_return(last)
-
+            self.last = self.insert_return(self.last)
         return self
 
+    def __call__(self, preorder):
+        for call in preorder:
+            self.add(call)
+        return self.finish()
+
 
 class LineNameSummarization(Summarization):
     """Summarize Activations by line and name"""
@@ -226,7 +241,7 @@ class NoMatchSummarization(LineNameSummarization):
     """Create repr for all nodes. Does not summarize tree"""
     # ToDo: Diff equivalent
 
-    def __init__(self, preorder):
+    def __init__(self, preorder=None):
         self.match_id = 0
         super(NoMatchSummarization, self).__init__(preorder)
 
@@ -288,8 +303,8 @@ class StructureSummarization(Summarization):
 class TreeSummarization(NoMatchSummarization):
     """Build tree"""
 
-    def __call__(self, preorder):
-        result = super(TreeSummarization, self).__call__(preorder)
+    def finish(self):
+        result = super(TreeSummarization, self).finish()
         self.edges.clear()
         stack = [self.root]
         while stack:
@@ -300,6 +315,50 @@ class TreeSummarization(NoMatchSummarization):
         return result
 
 
+class MultiSummarization(object):                                                # pylint: disable=too-few-public-methods
+    """Summarize activations into many modes in a single pass
+
+    Each activation is added to the summarizations of all modes.
+    exact_match summarizes the nodes of no_match after the pass
+    """
+
+    classes = {
+        "tree": TreeSummarization,
+        "no_match": NoMatchSummarization,
+        "namespace_match": LineNameSummarization,
+    }
+
+    def __init__(self, preorder, modes=MODES):
+        self.summarizations = {
+            mode: self.classes[mode]() for mode in modes
+            if mode in self.classes
+        }
+        no_match = self.summarizations.get("no_match")
+        if "exact_match" in modes and no_match is None:
+            no_match = NoMatchSummarization()
+            steps = [no_match]
+        else:
+            steps = []
+        steps.extend(self.summarizations.values())
+
+        adds = [summarization.add for summarization in steps]
+        for call in preorder:
+            for add in adds:
+                add(call)
+        for summarization in steps:
+            summarization.finish()
+
+        if "exact_match" in modes:
+            exact_match = self.summarizations["exact_match"] = (
+                StructureSummarization())
+            for node in no_match.nodes:
+                exact_match.add(node)
+            exact_match.finish()
+
+    def __getitem__(self, mode):
+        return self.summarizations[mode]
+
+
 cache = prepare_cache(                                                           # pylint: disable=invalid-name
     lambda self, *args, **kwargs: "trial {}".format(self.trial.id))
 
@@ -321,6 +380,8 @@ class TrialGraph(Graph):
             2: self.exact_match,
             3: self.namespace_match
         }
+        self._warm_modes = None
+        self._summarizations = {}
 
     def result(self, summarization):
         """Get summarization graph result"""
@@ -328,25 +389,53 @@ class TrialGraph(Graph):
             {self.trial.id: 0}, self.width, self.height
         ), summarization.nodes
 
+    def activation_rows(self):
+        """Return trial activations in preorder, loaded as tuples"""
+        for (aid, trial_id, name, line, caller_id, start,
+             finish) in Activation.fast_load_by_trial(self.trial.id):
+            yield ActivationRow(
+                aid, trial_id, name, line, caller_id,
+                int((finish - start).total_seconds() * 1000000))
+
+    def summarize(self, mode):
+        """Return summarization of mode.
+        During warm, the pass also summarizes the modes that follow mode"""
+        if mode not in self._summarizations:
+            self._summarizations = MultiSummarization(
+                self.activation_rows(), self._warm_modes or [mode]
+            ).summarizations
+        return self._summarizations.pop(mode)
+
+    def warm(self):
+        """Calculate the graphs of all modes that are not cached
+        in a single pass over the activations"""
+        try:
+            for index, mode in enumerate(MODES):
+                self._warm_modes = MODES[index:]
+                getattr(self, mode)()
+        finally:
+            self._warm_modes = None
+            self._summarizations = {}
+
     @cache("tree")
     def tree(self):
         """Convert tree structure into dict tree structure"""
-        return self.result(TreeSummarization(self.trial.activations))
+        return self.result(self.summarize("tree"))
 
     @cache("no_match")
     def no_match(self):
         """Convert tree structure into dict graph without node matchings"""
-        return self.result(NoMatchSummarization(self.trial.activations))
+        return self.result(self.summarize("no_match"))
 
     @cache("exact_match")
     def exact_match(self):
         """Convert tree structure into dict graph and match equal calls"""
-        return self.result(StructureSummarization(self.trial.activations))
+        return self.result(self.summarize("exact_match"))
 
     @cache("namespace_match")
     def namespace_match(self):
         """Convert tree structure into dict graph and match namespaces"""
-        return self.result(LineNameSummarization(self.trial.activations))
+        return self.result(self.summarize("namespace_match"))
 
     def _ipython_display_(self):
         from IPython.display import display
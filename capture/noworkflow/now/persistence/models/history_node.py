@@ -0,0 +1,88 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""History Node Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from sqlalchemy import Column, Integer, Text
+from sqlalchemy import select, bindparam
+
+from .. import relational
+
+from .base import AlchemyProxy, proxy_class
+
+
+@proxy_class
+class HistoryNode(AlchemyProxy):
+    """Represent the layout of a trial in a filtered history graph"""
+
+    __tablename__ = "history_node"
+    __table_args__ = (
+        {"sqlite_autoincrement": True},
+    )
+    id = Column(Integer, primary_key=True)                                       # pylint: disable=invalid-name
+    key = Column(Text, index=True)
+    position = Column(Integer)
+    trial_id = Column(Integer)
+    target_id = Column(Integer)
+    level = Column(Integer)
+
+    def __repr__(self):
+        return "HistoryNode({0.key}, {0.trial_id}, {0.level})".format(self)
+
+    @classmethod  # query
+    def fast_load(cls, key, session=None):
+        """Return tuples (id, trial_id, target_id, level) of the history
+        graph identified by key, ordered by position
+
+        Arguments:
+        key -- history filter key
+
+
+        Keyword arguments:
+        session -- specify session for loading (default=relational.session)
+        """
+        session = session or relational.session
+        table = cls.t
+        return session.execute(
+            select([table.c.id, table.c.trial_id, table.c.target_id,
+                    table.c.level])
+            .where(table.c.key == key)
+            .order_by(table.c.position)
+        ).fetchall()
+
+    @classmethod  # query
+    def fast_update(cls, key, nodes, levels, replace=False, session=None):       # pylint: disable=too-many-arguments
+        """Store the layout of a history graph
+
+
+        Arguments:
+        key -- history filter key
+        nodes -- list of (position, trial_id, target_id, level) to insert
+        levels -- list of (id, level) of stored nodes with changed levels
+
+
+        Keyword arguments:
+        replace -- remove stored nodes of key before inserting
+        session -- specify session for loading (default=relational.session)
+        """
+        session = session or relational.session
+        table = cls.t
+        if replace:
+            session.execute(table.delete().where(table.c.key == key))
+        if nodes:
+            session.execute(table.insert(), [
+                dict(key=key, position=position, trial_id=trial_id,
+                     target_id=target_id, level=level)
+                for position, trial_id, target_id, level in nodes
+            ])
+        if levels:
+            session.execute(
+                table.update()
+                .where(table.c.id == bindparam("node_id"))
+                .values(level=bindparam("node_level")),
+                [dict(node_id=nid, node_level=level) for nid, level in levels]
+            )
+        session.commit()
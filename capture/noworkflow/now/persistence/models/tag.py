@@ -149,6 +149,19 @@ class Tag(AlchemyProxy):
         ))
         session.commit()
 
+    @classmethod  # query
+    def fast_load_tags(cls, session=None):
+        """Return tuples (trial_id, type, name) of all tags ordered by id
+        Keyword arguments:
+        session -- specify session for loading (default=relational.session)
+        """
+        session = session or relational.session
+        table = cls.t
+        return session.execute(
+            select([table.c.trial_id, table.c.type, table.c.name])
+            .order_by(table.c.id)
+        )
+
     @classmethod  # query
     def auto_tags(cls, session=None):
         """Return auto tags
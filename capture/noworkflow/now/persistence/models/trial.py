@@ -174,6 +174,7 @@ class Trial(AlchemyProxy):
     ))
 
     def __init__(self, *args, **kwargs):
+        obj = None
         if args and isinstance(args[0], relational.base):
             obj = args[0]
             trial_ref = obj.id
@@ -190,13 +191,13 @@ class Trial(AlchemyProxy):
             kwargs["prolog_use_cache"] = kwargs.get("graph_use_cache", cache)
 
         session = relational.session
-        if not trial_ref or trial_ref == -1:
+        if obj is None and (not trial_ref or trial_ref == -1):
             obj = Trial.last_trial(script=script, session=session)
             if "graph_use_cache" not in kwargs:
                 kwargs["graph_use_cache"] = False
             if "prolog_use_cache" not in kwargs:
                 kwargs["prolog_use_cache"] = False
-        else:
+        elif obj is None:
             obj = Trial.load_trial(trial_ref, session=session)
 
         if obj is None:
@@ -242,6 +243,11 @@ class Trial(AlchemyProxy):
             return "backup"
         return "finished" if self.finished else "unfinished"
 
+    @property
+    def status_letter(self):
+        """Return first letter of trial status"""
+        return self.status[0]
+
     @property
     def duration(self):
         """Calculate trial duration. Return microseconds"""
@@ -366,6 +372,17 @@ class Trial(AlchemyProxy):
             .limit(limit)
         )
 
+    @classmethod  # query
+    def fast_reverse_trials(cls, limit, session=None):
+        """Return rows with the columns of <limit> trials ordered by start
+        time desc, without creating proxies"""
+        session = session or relational.session
+        return session.execute(
+            select([cls.t])
+            .order_by(cls.m.start.desc())
+            .limit(limit)
+        )
+
     @classmethod  # query
     def last_trial(cls, script=None, parent_required=False,
                    session=None):
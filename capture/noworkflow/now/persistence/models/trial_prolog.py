@@ -6,9 +6,17 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
+import hashlib
+import os
+import tempfile
 import weakref
 
+from glob import glob
+
 from ...utils.functions import resource
+from ...utils.io import open_output, write_lines
+from ...utils.prolog import PrologTimestamp
+from .. import persistence_config
 
 from .base import Model
 from .graphs.diagram import ViewPrologDiagram
@@ -19,6 +27,37 @@ from . import Variable, VariableUsage, VariableDependency
 
 
 RULES = "../resources/rules.pl"
+# Directory of the provenance store with facts files of trials
+PROLOG_DIRNAME = "prolog"
+# Number of rows that server-side cursors fetch at once
+FETCH_SIZE = 5000
+
+
+def quote(path):
+    """Return path as a quoted Prolog atom"""
+    return "'{}'".format(path.replace("\\", "/").replace("'", "''"))
+
+
+def prolog_directory():
+    """Return absolute path of the directory of facts files
+    swipl resolves relative paths from its own working directory"""
+    return os.path.join(
+        os.path.abspath(persistence_config.provenance_path), PROLOG_DIRNAME)
+
+
+def load_file(prolog_cli, path, compile_=True):
+    """Consult file in a single call
+    If compile_ is set, swipl loads and writes a .qlf file next to it
+    when the .qlf file is missing or older than the file"""
+    list(prolog_cli.query("load_files({}, [qcompile({})])".format(
+        quote(path), "auto" if compile_ else "never")))
+
+
+def stream(trial, relationship):
+    """Return rows of a trial relationship, fetching FETCH_SIZE rows at once
+    Rows are not wrapped by proxies"""
+    instance = trial._get_instance()                                             # pylint: disable=protected-access
+    return getattr(instance, relationship).yield_per(FETCH_SIZE)
 
 
 class TrialProlog(Model):
@@ -40,14 +79,14 @@ class TrialProlog(Model):
         from . import Trial
         return [
             (Trial, lambda: [trial]),
-            (Tag, lambda: trial.tags),
-            (Dependency, lambda: trial.dependencies),
-            (EnvironmentAttr, lambda: trial.environment_attrs),
-            (FunctionDef, lambda: trial.function_defs),
-            (Object, lambda: trial.objects),
-            (Activation, lambda: trial.activations),
-            (ObjectValue, lambda: trial.object_values),
-            (FileAccess, lambda: trial.file_accesses),
+            (Tag, lambda: stream(trial, "tags")),
+            (Dependency, lambda: stream(trial, "dependencies")),
+            (EnvironmentAttr, lambda: stream(trial, "environment_attrs")),
+            (FunctionDef, lambda: stream(trial, "function_defs")),
+            (Object, lambda: stream(trial, "objects")),
+            (Activation, lambda: stream(trial, "activations")),
+            (ObjectValue, lambda: stream(trial, "object_values")),
+            (FileAccess, lambda: stream(trial, "file_accesses")),
             (Variable, lambda: trial.prolog_variables.variables),
             (VariableUsage, lambda: trial.prolog_variables.usages),
             (VariableDependency, lambda: trial.prolog_variables.dependencies),
@@ -65,20 +104,22 @@ class TrialProlog(Model):
             list(self.prolog_cli.query(
                 cls.prolog_description.retract(self.trial.id)))
 
-    def _export_facts(self, with_doc=True):
-        """Export facts from trial as a list"""
-        result = []
+    def export_facts(self, with_doc=True, multifile=False):
+        """Export facts from trial as a generator of str
+        Models are queried as the generator advances"""
         for cls, query in self.models:
+            description = cls.prolog_description
             if with_doc:
-                result.append(cls.prolog_description.comment())
-            result.append(cls.prolog_description.dynamic())
+                yield description.comment()
+            if multifile:
+                yield description.multifile()
+            yield description.dynamic()
             for obj in query():
-                result.append(cls.prolog_description.fact(obj))
-        return result
+                yield description.fact(obj)
 
     def export_text_facts(self):
         """Export facts from trial as text"""
-        return "\n".join(self._export_facts())
+        return "\n".join(self.export_facts())
 
     def rules(self, with_facts=False):
         """Export prolog rules
@@ -93,26 +134,78 @@ class TrialProlog(Model):
         result += resource(RULES, "UTF-8").split("\n")
         return result
 
+    def facts_key(self):
+        """Return key of the facts file of the trial
+        Tags, dependency config and PrologTimestamp.use_nil change the
+        exported facts"""
+        tags = sorted(
+            (tag.type, tag.name) for tag in stream(self.trial, "tags"))
+        config = sorted(vars(self.trial.dependency_config).items())
+        return hashlib.sha1(
+            repr((tags, config, PrologTimestamp.use_nil)).encode("utf-8")).hexdigest()[:12]
+
+    def facts_file(self):
+        """Return path of the cached facts file of the trial
+        Write the file if it does not exist yet. Remove stale files"""
+        directory = prolog_directory()
+        prefix = os.path.join(directory, "trial_{}_".format(self.trial.id))
+        path = prefix + self.facts_key() + ".pl"
+        if os.path.exists(path):
+            return path
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for stale in glob(prefix + "*"):
+            os.remove(stale)
+        self._write_facts(path + ".tmp")
+        os.rename(path + ".tmp", path)
+        return path
+
+    def _write_facts(self, path):
+        """Write facts that can be consulted with facts of other trials"""
+        with open_output(path) as output:
+            write_lines(output, self.export_facts(
+                with_doc=False, multifile=True))
+
     def load_cli_facts(self):
-        """Load prolog facts an rules into swipl"""
+        """Load prolog facts an rules into swipl
+        Facts of finished trials are consulted from a cached file that swipl
+        compiles to .qlf. Facts of unfinished trials use a temporary file"""
         self.init_cli()
         load_trial = self.trial.prolog_description.fact(self.trial)[:-1]
         if not list(self.prolog_cli.query(load_trial)):
-            for fact in self._export_facts(with_doc=False):
-                self.prolog_cli.assertz(fact[:-1])
+            if self.trial.finished and persistence_config.provenance_path:
+                load_file(self.prolog_cli, self.facts_file())
+            else:
+                handle, path = tempfile.mkstemp(suffix=".pl")
+                os.close(handle)
+                try:
+                    self._write_facts(path)
+                    load_file(self.prolog_cli, path, compile_=False)
+                finally:
+                    os.remove(path)
         load_rules = "load_rules(1)"
         if not list(self.prolog_cli.query(load_rules)):
-            rule = []
-            for line in self.rules():
-                line = line.strip()
-                if not line or line[0] == "%":
-                    continue
-                rule.append(line)
-                if "." in line:
-                    self.prolog_cli.assertz(" ".join(rule)[:-1])
-                    rule = []
+            load_file(self.prolog_cli, self.rules_file())
             self.prolog_cli.assertz(load_rules)
 
+    @classmethod
+    def rules_file(cls):
+        """Return path of a file with the rules of this version"""
+        rules = resource(RULES, "UTF-8")
+        name = "rules_{}.pl".format(
+            hashlib.sha1(rules.encode("utf-8")).hexdigest()[:12])
+        directory = tempfile.gettempdir()
+        if persistence_config.provenance_path:
+            directory = prolog_directory()
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open_output(path + ".tmp") as output:
+                write_lines(output, [":- style_check(-discontiguous).", rules])
+            os.rename(path + ".tmp", path)
+        return path
+
     def query(self, query):
         """Run prolog query on trial"""
         self.load_cli_facts()
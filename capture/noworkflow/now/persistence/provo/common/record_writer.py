@@ -0,0 +1,152 @@
+import datetime
+import json
+
+from noworkflow.now.utils.io import write_lines
+
+
+class QualifiedName(str):
+    """Attribute value that is a qualified name, such as prov:Collection"""
+
+
+COLLECTION = QualifiedName("prov:Collection")
+SOFTWARE_AGENT = QualifiedName("prov:SoftwareAgent")
+
+# Names of the positional arguments of records, as in PROV-JSON
+ARGUMENTS = {
+    "entity": (),
+    "agent": (),
+    "activity": ("prov:startTime", "prov:endTime"),
+    "used": ("prov:activity", "prov:entity", "prov:time"),
+    "wasGeneratedBy": ("prov:entity", "prov:activity", "prov:time"),
+    "wasInformedBy": ("prov:informed", "prov:informant"),
+    "wasAssociatedWith": ("prov:activity", "prov:agent", "prov:plan"),
+    "hadMember": ("prov:collection", "prov:entity"),
+}
+
+
+class RecordWriter(object):
+    """Write PROV records as they are produced, without a ProvDocument
+    Records are (type, identifier, args, attributes) tuples.
+    Records of bundles are between ("bundle", identifier) and ("endBundle",)"""
+
+    def __init__(self, output, namespace):
+        self.output = output
+        self.namespace = namespace
+
+    def lines(self, records):
+        """Return generator of lines of records"""
+        raise NotImplementedError
+
+    def write(self, records):
+        write_lines(self.output, self.lines(records))
+
+
+class ProvNWriter(RecordWriter):
+    """Write records in PROV-N, with the layout of prov serializer"""
+
+    def lines(self, records):
+        yield "document"
+        yield "  default <{}>".format(self.namespace)
+        yield "  "
+        indent = "  "
+        for record in records:
+            if record[0] == "bundle":
+                yield "  bundle {}".format(record[1])
+                yield "    default <{}>".format(self.namespace)
+                yield "    "
+                indent = "    "
+            elif record[0] == "endBundle":
+                yield "  endBundle"
+                indent = "  "
+            else:
+                yield indent + self.record(*record)
+        yield "endDocument"
+
+    def record(self, type_, identifier, args, attributes):
+        values = ["-" if arg is None else self.time(arg) for arg in args]
+        attributes = ", ".join(
+            "{}={}".format(key, self.value(value)) for key, value in attributes if value is not None
+        )
+        if attributes:
+            values.append("[{}]".format(attributes))
+        if type_ in ("entity", "agent", "activity"):
+            return "{}({})".format(type_, ", ".join([identifier] + values))
+        if identifier is not None:
+            return "{}({}; {})".format(type_, identifier, ", ".join(values))
+        return "{}({})".format(type_, ", ".join(values))
+
+    @staticmethod
+    def time(value):
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def value(value):
+        if isinstance(value, QualifiedName):
+            return "'{}'".format(value)
+        if isinstance(value, str):
+            value = value.replace('"', '\\"')
+            return '"""{}"""'.format(value) if "\n" in value else '"{}"'.format(value)
+        if isinstance(value, datetime.datetime):
+            return '"{}" %% xsd:dateTime'.format(value.isoformat())
+        return str(value)
+
+
+class ProvJsonLinesWriter(RecordWriter):
+    """Write records in PROV-JSON lines
+    The first line declares the prefixes. Each other line is a PROV-JSON document with a single record.
+    Records of bundles are nested in their bundle. Merging all lines produces a PROV-JSON document"""
+
+    def __init__(self, output, namespace):
+        super(ProvJsonLinesWriter, self).__init__(output, namespace)
+        self.bundle = None
+        self.blank = 0
+
+    def lines(self, records):
+        yield json.dumps({"prefix": {"default": self.namespace}})
+        for record in records:
+            if record[0] == "bundle":
+                self.bundle = record[1]
+            elif record[0] == "endBundle":
+                self.bundle = None
+            else:
+                yield json.dumps(self.record(*record))
+
+    def record(self, type_, identifier, args, attributes):
+        content = {
+            name: self.time(arg) for name, arg in zip(ARGUMENTS[type_], args) if arg is not None
+        }
+        # PROV attributes, such as prov:time, have implicit types
+        content.update(
+            (key, self.time(value) if key.startswith("prov:") and not isinstance(value, QualifiedName)
+             else self.value(value))
+            for key, value in attributes if value is not None
+        )
+        if identifier is None:
+            self.blank += 1
+            identifier = "_:id{}".format(self.blank)
+        result = {type_: {identifier: content}}
+        if self.bundle is not None:
+            result = {"bundle": {self.bundle: result}}
+        return result
+
+    @staticmethod
+    def time(value):
+        if isinstance(value, datetime.datetime):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def value(value):
+        if isinstance(value, QualifiedName):
+            return {"$": str(value), "type": "prov:QUALIFIED_NAME"}
+        if isinstance(value, datetime.datetime):
+            return {"$": value.isoformat(), "type": "xsd:dateTime"}
+        return value
+
+
+WRITERS = {
+    "provn": ProvNWriter,
+    "jsonl": ProvJsonLinesWriter,
+}
@@ -0,0 +1,205 @@
+from itertools import groupby
+
+from sqlalchemy import select
+
+from noworkflow.now.persistence import relational
+from noworkflow.now.persistence.models import Trial, Activation, ObjectValue, FunctionDef, Object
+from noworkflow.now.persistence.models import EnvironmentAttr, FileAccess
+from noworkflow.now.persistence.provo.common.record_writer import WRITERS, COLLECTION, SOFTWARE_AGENT
+from noworkflow.now.utils.functions import truncate
+from noworkflow.now.utils.io import open_output, print_msg
+
+
+# Number of rows fetched by each query at once
+BATCH_SIZE = 5000
+# Trials with more activations are exported in PROV-N by the streaming writer
+STREAM_THRESHOLD = 10000
+
+
+def should_stream(trial: Trial, args):
+    if args.format == "jsonl" or args.stream:
+        return True
+    if args.format != "provn":
+        return False
+    query = relational.session.query(Activation.m).filter(Activation.m.trial_id == trial.id)
+    return query.count() > STREAM_THRESHOLD
+
+
+def rows(model, trial_id, *order_by):
+    """Yield rows of model in trial, fetching BATCH_SIZE rows at once"""
+    result = relational.session.execute(
+        select([model.t]).where(model.t.c.trial_id == trial_id).order_by(*order_by))
+    batch = result.fetchmany(BATCH_SIZE)
+    while batch:
+        for row in batch:
+            yield row
+        batch = result.fetchmany(BATCH_SIZE)
+
+
+def merge(parents, children, key):
+    """Yield (parent, children) pairs of rows ordered by parent id and by children key"""
+    groups = groupby(children, key=key)
+    group = next(groups, None)
+    for parent in parents:
+        while group is not None and group[0] < parent.id:
+            group = next(groups, None)
+        if group is not None and group[0] == parent.id:
+            yield parent, list(group[1])
+            group = next(groups, None)
+        else:
+            yield parent, []
+
+
+def export_provo(trial: Trial, args, extension):
+    filename = "{}{}".format(args.file, extension)
+    print_msg("Exporting provenance of trial {} in PROV-O format".format(trial.id), force=True)
+    print_msg("  Streaming records to local storage")
+    with open_output(filename) as output:
+        WRITERS[args.format](output, args.defaultns).write(records(trial, args))
+    print_msg("Export to file \"{}\" done.".format(filename), force=True)
+
+
+def records(trial: Trial, args):
+    """Yield records in the order of export_writer.export_provo"""
+    bundles = []
+    if args.function_defs:
+        bundles.append(("trial{}DefinitionProv".format(trial.id), _function_defs(trial)))
+    if args.modules or args.environment:
+        bundles.append(("trial{}DeploymentProv".format(trial.id), _deployment(trial, args)))
+    if args.function_activations or args.file_accesses:
+        bundles.append(("trial{}ExecutionProv".format(trial.id), _execution(trial, args)))
+
+    yield ("entity", "trial{}Prov".format(trial.id), (),
+           [("prov:label", "provenance collected by noworfklow"), ("prov:type", COLLECTION)])
+    for record in _basic_info(trial):
+        yield record
+    for identifier, _ in bundles:
+        yield "hadMember", None, ("trial{}Prov".format(trial.id), identifier), ()
+        yield "wasGeneratedBy", None, (identifier, "trial{}Execution".format(trial.id), None), ()
+    for identifier, bundle in bundles:
+        yield "bundle", identifier
+        for record in bundle:
+            yield record
+        yield ("endBundle",)
+
+
+def _basic_info(trial: Trial):
+    print_msg("  Exporting basic trial information")
+    identifier = trial.script.replace(".", "_")
+    yield ("agent", identifier, (),
+           [("prov:type", SOFTWARE_AGENT), ("codeHash", trial.code_hash), ("script", trial.script), ("id", trial.id)])
+    yield ("activity", "trial{}Execution".format(trial.id), (trial.start, trial.finish),
+           [("nowCommand", trial.command), ("parentId", trial.parent_id), ("inheritedId", trial.inherited_id)])
+    yield ("wasAssociatedWith", "trial{}ExecutionByScript".format(trial.id),
+           ("trial{}Execution".format(trial.id), identifier, None), ())
+
+
+def _function_defs(trial: Trial):
+    print_msg("  Exporting function definitions")
+    functions = rows(FunctionDef, trial.id, FunctionDef.m.id)
+    objects = rows(Object, trial.id, Object.m.function_def_id, Object.m.id)
+    for function, objs in merge(functions, objects, lambda obj: obj.function_def_id):
+        docstring = (function.docstring or "").strip()
+        yield ("activity", "functionDefinition{}".format(function.id), (None, None),
+               [("prov:label", function.name), ("prov:type", "functionDefinition"),
+                ("codeHash", function.code_hash), ("firstLine", function.first_line),
+                ("lastLine", function.last_line),
+                ("docString", truncate(docstring.replace("\n", " ")) if docstring else None)])
+        for type_, name, short in (("ARGUMENT", "argument", "Arg"), ("GLOBAL", "global", "Global")):
+            selected = [obj for obj in objs if obj.type == type_]
+            for obj in selected:
+                yield ("entity", "{}Definition{}".format(name, obj.id), (),
+                       [("prov:label", obj.name), ("prov:type", "{}Definition".format(name))])
+            for obj in selected:
+                yield ("used", "funcDef{}Used{}Def{}".format(function.id, short, obj.id),
+                       ("functionDefinition{}".format(function.id), "{}Definition{}".format(name, obj.id), None),
+                       [("prov:role", name), ("prov:type", "{}Definition".format(name))])
+        calls = [obj for obj in objs if obj.type == "FUNCTION_CALL"]
+        for call in calls:
+            yield ("activity", "callDefinition{}".format(call.id), (None, None),
+                   [("prov:label", call.name), ("prov:type", "callDefinition")])
+        for call in calls:
+            yield ("wasInformedBy", "callDef{}CalledByFuncDef{}".format(call.id, function.id),
+                   ("callDefinition{}".format(call.id), "functionDefinition{}".format(function.id)),
+                   [("prov:type", "callDefinition")])
+
+
+def _deployment(trial: Trial, args):
+    if args.modules:
+        print_msg("  Exporting module dependencies")
+        yield "entity", "moduleDependencies", (), [("prov:type", COLLECTION)]
+        for module in trial.modules:
+            yield ("entity", "module{}".format(module.id), (),
+                   [("prov:label", module.name), ("prov:type", "moduleDependency"),
+                    ("version", module.version), ("prov:location", truncate(module.path)),
+                    ("codeHash", module.code_hash)])
+            yield "hadMember", None, ("moduleDependencies", "module{}".format(module.id)), ()
+    if args.environment:
+        print_msg("  Exporting environment conditions")
+        yield "entity", "environmentAttributes", (), [("prov:type", COLLECTION)]
+        for attr in rows(EnvironmentAttr, trial.id, EnvironmentAttr.m.id):
+            yield ("entity", "environmentAttribute{}".format(attr.id), (),
+                   [("prov:label", attr.name), ("prov:value", truncate(attr.value)),
+                    ("prov:type", "environmentAttribute")])
+            yield "hadMember", None, ("environmentAttributes", "environmentAttribute{}".format(attr.id)), ()
+
+
+def _execution(trial: Trial, args):
+    # Depths of exported activations. File accesses refer to them
+    depths = {}
+    if args.function_activations:
+        print_msg("  Exporting function activations")
+        activations = rows(Activation, trial.id, Activation.m.id)
+        values = rows(ObjectValue, trial.id, ObjectValue.m.function_activation_id, ObjectValue.m.id)
+        for activation, objs in merge(activations, values, lambda obj: obj.function_activation_id):
+            if activation.caller_id is None:
+                depth = 1
+            elif activation.caller_id in depths:
+                depth = depths[activation.caller_id] + 1
+            else:
+                continue
+            if args.recursion_depth and depth > args.recursion_depth:
+                continue
+            depths[activation.id] = depth
+            for record in _activation(activation, objs, depth):
+                yield record
+    if args.file_accesses:
+        print_msg("  Exporting file accesses")
+        for access in rows(FileAccess, trial.id, FileAccess.m.id):
+            yield ("activity", "fileAccess{}".format(access.id), (None, None),
+                   [("prov:location", access.name), ("prov:type", access.mode),
+                    ("prov:time", access.timestamp), ("buffering", access.buffering),
+                    ("contentHashBefore", access.content_hash_before),
+                    ("contentHashAfter", access.content_hash_after)])
+            if access.function_activation_id in depths:
+                yield ("wasInformedBy",
+                       "fileAcc{}ByFuncAct{}".format(access.id, access.function_activation_id),
+                       ("fileAccess{}".format(access.id),
+                        "functionActivation{}".format(access.function_activation_id)),
+                       [("prov:type", "fileAccess")])
+
+
+def _activation(activation, objs, depth):
+    identifier = "functionActivation{}".format(activation.id)
+    yield ("activity", identifier, (activation.start, activation.finish),
+           [("prov:label", activation.name), ("prov:type", "functionActivation"),
+            ("line", activation.line), ("depth", depth)])
+    if activation.caller_id is not None:
+        yield ("wasInformedBy", "funcAct{}CalledBy{}".format(activation.id, activation.caller_id),
+               (identifier, "functionActivation{}".format(activation.caller_id)),
+               [("prov:type", "callActivation")])
+    for type_, name, short in (("ARGUMENT", "argument", "Arg"), ("GLOBAL", "global", "Global")):
+        for obj in objs:
+            if obj.type != type_:
+                continue
+            yield ("entity", "{}Activation{}".format(name, obj.id), (),
+                   [("prov:label", obj.name), ("prov:value", truncate(obj.value)),
+                    ("prov:type", "{}Activation".format(name))])
+            yield ("used", "funcAct{}Used{}Act{}".format(activation.id, short, obj.id),
+                   (identifier, "{}Activation{}".format(name, obj.id), activation.start),
+                   [("prov:role", name), ("prov:type", "{}Activation".format(name))])
+    if activation.return_value is not None and activation.return_value != "None":
+        yield ("entity", "funcAct{}ReturnValue".format(activation.id), (),
+               [("prov:value", truncate(activation.return_value)), ("prov:type", "returnValue")])
+        yield ("wasGeneratedBy", "funcAct{}RetValGeneration".format(activation.id),
+               ("funcAct{}ReturnValue".format(activation.id), identifier, activation.finish), ())
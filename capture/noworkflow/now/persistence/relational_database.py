@@ -10,7 +10,7 @@ import threading
 
 from os.path import join, exists
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
 
@@ -19,6 +19,32 @@ from ..utils.io import print_msg
 
 DB_FILENAME = "db.sqlite"
 
+# Pragmas for high-throughput ingestion. WAL allows concurrent readers
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+# Tables that receive most rows during the execution of a trial
+BULK_TABLES = [
+    "function_activation",
+    "object_value",
+    "variable",
+    "variable_usage",
+    "variable_dependency",
+]
+
+
+def set_pragmas(dbapi_connection, connection_record):                           # pylint: disable=unused-argument
+    """Set PRAGMAS on new SQLite connections"""
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 
 class RelationalDatabase(object):
     """Relational Database deal with SQLite connection"""
@@ -53,13 +79,16 @@ class RelationalDatabase(object):
         self.engine = create_engine(
             "sqlite://" + ("/" if self.db_path else "") + self.db_path,
             echo=False)
+        if self.db_path:
+            event.listen(self.engine, "connect", set_pragmas)
         self.session_factory.configure(bind=self.engine, autoflush=False,
                                        expire_on_commit=True)
         self._session_map = {}
 
         if new_db:
             print_msg("creating provenance database")
-            self.base.metadata.create_all(self.engine)
+        # Existing databases receive tables added by newer versions
+        self.base.metadata.create_all(self.engine)
 
     def make_session(self):
         """Create thread safe session"""
@@ -74,6 +103,58 @@ class RelationalDatabase(object):
             self._session_map[ident].configure(expire_on_commit=False)
         return self._session_map[ident]
 
+    def existing_indexes(self, conn):                                          # pylint: disable=no-self-use
+        """Return names of indexes in the database"""
+        return {
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+
+    def indexes(self, tables=None):
+        """Return declared secondary indexes of tables
+        Default to all tables"""
+        metadata_tables = self.base.metadata.tables
+        if tables is None:
+            tables = sorted(metadata_tables)
+        for name in tables:
+            for index in sorted(metadata_tables[name].indexes,
+                                key=lambda idx: idx.name):
+                yield index
+
+    def drop_indexes(self, tables=BULK_TABLES):
+        """Drop secondary indexes of tables for bulk loading
+        Return number of dropped indexes"""
+        count = 0
+        with self.engine.begin() as conn:
+            existing = self.existing_indexes(conn)
+            quote = conn.dialect.identifier_preparer.quote
+            for index in self.indexes(tables):
+                if index.name in existing:
+                    conn.execute("DROP INDEX {}".format(quote(index.name)))
+                    count += 1
+        return count
+
+    def create_indexes(self, tables=None, rebuild=False):
+        """Create missing secondary indexes of tables
+        Return number of created and rebuilt indexes
+
+        Keyword arguments:
+        tables -- list of table names (default: all tables)
+        rebuild -- rebuild existing indexes as well
+        """
+        created = rebuilt = 0
+        with self.engine.begin() as conn:
+            existing = self.existing_indexes(conn)
+            quote = conn.dialect.identifier_preparer.quote
+            for index in self.indexes(tables):
+                if index.name not in existing:
+                    index.create(conn)
+                    created += 1
+                elif rebuild:
+                    conn.execute("REINDEX {}".format(quote(index.name)))
+                    rebuilt += 1
+        return created, rebuilt
+
     def query(self, text):
         """Perform SQL query"""
         return self.session.execute(text).fetchall()
@@ -0,0 +1,183 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Background writer for partial provenance saves"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import io
+import os
+import pickle
+import threading
+import traceback
+
+from collections import deque
+
+from future.moves.queue import Queue, Empty, Full
+
+from . import relational, persistence_config
+from ..utils.io import print_msg
+
+
+BLOCK = "block"
+DROP_ARGS = "drop-args"
+SPILL = "spill"
+POLICIES = [BLOCK, DROP_ARGS, SPILL]
+
+SPILL_DIRNAME = "spill"
+STOP = None
+
+# The Profiler replaces open functions. The writer must not use them
+_open = io.open                                                                  # pylint: disable=invalid-name
+
+
+class BackgroundWriter(object):                                                  # pylint: disable=too-many-instance-attributes
+    """Write batches of lightweight objects in a dedicated thread
+
+    The traced thread only copies the objects of each ObjectStore into a
+    batch of tuples. The writer thread inserts the batch in a single
+    transaction, using its own connection.
+
+    When the queue is full, the policy defines what happens to a new batch:
+        block -- wait for the writer thread
+        drop-args -- remove ARGUMENT object values and wait for the writer
+        spill -- pickle the batch into .noworkflow/spill
+    """
+
+    def __init__(self, policy=BLOCK, maxsize=8):
+        self.policy = policy
+        self.queue = Queue(maxsize)
+        # Spilled batch files, in order. The queue is always older than them
+        self.spilled = deque()
+        self.spill_dir = None
+        self.spill_count = 0
+        self.thread = None
+        self.dropped = 0
+        self.errors = 0
+
+    def start(self):
+        """Start writer thread"""
+        self.thread = threading.Thread(target=self.run,
+                                       name="noworkflow-writer")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def store(self, trial_id, stores, partial=False):
+        """Copy objects from stores and send them to the writer thread
+
+        Arguments:
+        trial_id -- trial id
+        stores -- list of (AlchemyProxy class, ObjectStore) pairs
+        partial -- remove complete objects from stores
+        """
+        batch = []
+        for model, object_store in stores:
+            if object_store.has_items():
+                keys, rows = model.fast_rows(trial_id, object_store, partial)
+                batch.append((model, keys, list(rows)))
+        if batch:
+            self.put(batch)
+
+    def put(self, batch):
+        """Send batch to writer thread according to policy"""
+        if self.spilled:
+            # Keep the order of batches while there are spilled batches
+            self.spill(batch)
+            return
+        try:
+            self.queue.put_nowait(batch)
+            return
+        except Full:
+            pass
+        if self.policy == SPILL:
+            self.spill(batch)
+            return
+        if self.policy == DROP_ARGS:
+            batch = self.drop_args(batch)
+        self.queue.put(batch)
+
+    def drop_args(self, batch):
+        """Remove ARGUMENT object values from batch"""
+        result = []
+        for model, keys, rows in batch:
+            if model.__modelname__ == "ObjectValue":
+                size, index = len(rows), keys.index("type")
+                rows = [row for row in rows if row[index] != "ARGUMENT"]
+                self.dropped += size - len(rows)
+            result.append((model, keys, rows))
+        return result
+
+    def spill(self, batch):
+        """Pickle batch into the spill directory"""
+        if self.spill_dir is None:
+            self.spill_dir = os.path.join(
+                persistence_config.provenance_path, SPILL_DIRNAME)
+            if not os.path.exists(self.spill_dir):
+                os.makedirs(self.spill_dir)
+        self.spill_count += 1
+        path = os.path.join(self.spill_dir, "{}-{}.pickle".format(
+            os.getpid(), self.spill_count))
+        with _open(path, "wb") as spill_file:
+            pickle.dump(batch, spill_file, pickle.HIGHEST_PROTOCOL)
+        self.spilled.append(path)
+
+    def unspill(self):
+        """Load oldest spilled batch"""
+        path = self.spilled.popleft()
+        with _open(path, "rb") as spill_file:
+            batch = pickle.load(spill_file)
+        os.remove(path)
+        return batch
+
+    def next_batch(self):
+        """Return next batch. Spilled batches are newer than queued ones"""
+        while True:
+            try:
+                return self.queue.get(timeout=0.05)
+            except Empty:
+                if self.spilled:
+                    return self.unspill()
+
+    def run(self):
+        """Writer thread loop"""
+        conn = relational.engine.connect()
+        try:
+            while True:
+                batch = self.next_batch()
+                if batch is STOP:
+                    while self.spilled:
+                        self.safe_write(conn, self.unspill())
+                    break
+                self.safe_write(conn, batch)
+        finally:
+            conn.close()
+
+    def safe_write(self, conn, batch):
+        """Write batch and report errors without stopping the thread"""
+        try:
+            self.write(conn, batch)
+        except Exception:                                                        # pylint: disable=broad-except
+            self.errors += 1
+            traceback.print_exc()
+
+    @staticmethod
+    def write(conn, batch):
+        """Insert batch in a single transaction"""
+        with conn.begin():
+            for model, keys, rows in batch:
+                model.fast_insert(conn, keys, rows)
+
+    def close(self):
+        """Wait for pending batches and stop writer thread"""
+        if self.thread is None:
+            return
+        self.queue.put(STOP)
+        self.thread.join()
+        self.thread = None
+        if self.dropped:
+            print_msg("dropped {} argument values due to a full writer queue"
+                      .format(self.dropped), True)
+        if self.errors:
+            print_msg("the background writer failed to store {} batches"
+                      .format(self.errors), True)
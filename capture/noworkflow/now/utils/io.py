@@ -6,8 +6,12 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
+import gzip
+import io
 import sys
 
+from contextlib import contextmanager
+
 from future.utils import viewitems
 
 from .cross_version import StringIO
@@ -20,6 +24,9 @@ STDIN = sys.stdin
 STDOUT = sys.stdout
 STDERR = sys.stderr
 
+# Number of characters that write_lines joins before writing
+WRITE_CHUNK = 1 << 20
+
 
 class redirect_output(object):                                                   # pylint: disable=invalid-name, too-few-public-methods
     """Redirect output to stream"""
@@ -53,3 +60,48 @@ def print_fn_msg(message, force=False, file=STDOUT):
     """Print lazy message with [now] prefix"""
     if verbose or force:
         print("{}{}".format(LABEL, message()), file=file)
+
+
+@contextmanager
+def open_output(path=None, compress=False):
+    """Open text output for writing utf-8. Default to stdout
+
+    Keyword arguments:
+    path -- output file (default=None: stdout)
+    compress -- compress output with gzip. Outputs with .gz extension are
+                always compressed (default=False)
+    """
+    compress = compress or bool(path and path.endswith(".gz"))
+    if not compress:
+        if not path:
+            yield sys.stdout
+            sys.stdout.flush()
+            return
+        with io.open(path, "w", encoding="utf-8") as output:
+            yield output
+        return
+    binary = io.open(path, "wb") if path else getattr(
+        sys.stdout, "buffer", sys.stdout)
+    try:
+        with io.TextIOWrapper(gzip.GzipFile(fileobj=binary, mode="wb"),
+                              encoding="utf-8") as output:
+            yield output
+    finally:
+        if path:
+            binary.close()
+        else:
+            binary.flush()
+
+
+def write_lines(output, lines, chunk_size=WRITE_CHUNK):
+    """Write lines to output. Each line ends with a line break
+    Join lines in chunks of about chunk_size characters before writing"""
+    chunk, size = [], 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            output.write("\n".join(chunk) + "\n")
+            chunk, size = [], 0
+    if chunk:
+        output.write("\n".join(chunk) + "\n")
@@ -36,8 +36,7 @@ class MetaProfiler(object):
     def __call__(self, typ):
         def dec(func):
             """Return decorator that stores the duration in typ"""
-            if typ not in self.order:
-                self.order.append(typ)
+            self.counter(typ)
 
             @wraps(func)
             def wrapper(*args, **kwargs):
@@ -50,6 +49,17 @@ class MetaProfiler(object):
             return wrapper
         return dec
 
+    def counter(self, typ):
+        """Register column typ. Return typ
+        Register counters at import, since the header is written once"""
+        if typ not in self.order:
+            self.order.append(typ)
+        return typ
+
+    def count(self, typ, value=1):
+        """Add value to counter typ"""
+        self.data[typ] += value
+
     def save(self):
         """Save durations"""
         if self.active:
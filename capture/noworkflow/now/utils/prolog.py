@@ -35,6 +35,11 @@ class PrologDescription(object):
         """Return prolog dynamic clause"""
         return ":- dynamic({0.name}/{1}).".format(self, len(self.attributes))
 
+    def multifile(self):
+        """Return prolog multifile clause
+        Facts of several trials files can be loaded together"""
+        return ":- multifile({0.name}/{1}).".format(self, len(self.attributes))
+
     def retract(self, trial_id):
         """Return prolog retract for trial"""
         return "retract({0.name}({1}))".format(
@@ -131,7 +136,7 @@ class PrologTimestamp(PrologAttribute):
             return "nil"
         time = self.value(obj)
         if not time:
-            return -1
+            return "-1"
         epoch = datetime(1970, 1, 1)
         return str((time - epoch).total_seconds())
 
@@ -8,11 +8,14 @@ from __future__ import (absolute_import, print_function,
 
 import os
 
-from flask import render_template, jsonify, request
+from flask import render_template, jsonify, request, abort
 
-from ..persistence.models import Trial
+from ..persistence.models import Trial, FileAccess, EnvironmentAttr
+from ..persistence.models.base import proxy_gen
 from ..persistence.models.history import History
 from ..persistence.models.diff import Diff
+from ..persistence.models.graphs.diff_graph import ALGORITHMS
+from ..persistence.models.graphs.structures import tree_window
 from ..persistence import relational
 
 
@@ -36,6 +39,25 @@ class WebServer(object):
 app = WebServer().app  # pylint: disable=invalid-name
 
 
+def paginate(model, trial_id):
+    """Return rows of model that belong to trial, ordered by id
+    Apply offset and limit arguments of the request.
+    Return proxy generator and total number of rows"""
+    query = (
+        relational.session.query(model.m)
+        .filter(model.m.trial_id == trial_id)
+        .order_by(model.m.id)
+    )
+    total = query.count()
+    offset = request.args.get("offset", type=int)
+    limit = request.args.get("limit", type=int)
+    if offset:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return proxy_gen(query), total
+
+
 @app.after_request
 def add_header(req):
     """
@@ -71,20 +93,36 @@ def index(tid=None, graph_mode=None):
 @app.route("/trials.json")
 @app.route("/trials") # remove
 def trials():
-    """Respond history graph as JSON"""
+    """Respond history graph as JSON
+    Arguments first and last (trial ids) and since and until (start
+    timestamps) restrict the response to a window of trials"""
     history = History(script=request.args.get("script"),
                       status=request.args.get("execution"),
                       summarize=bool(int(request.args.get("summarize"))))
-    return jsonify(**history.graph.graph())
+    return jsonify(**history.graph.graph(
+        first=request.args.get("first", type=int),
+        last=request.args.get("last", type=int),
+        since=request.args.get("since"),
+        until=request.args.get("until"),
+    ))
 
 
 @app.route("/trials/<tid>/<graph_mode>/<cache>.json")
 def trial_graph(tid, graph_mode, cache):
-    """Respond trial graph as JSON"""
+    """Respond trial graph as JSON
+    Arguments node (index) and depth restrict the response to a subtree.
+    Nodes at depth have children_count, but no children"""
     trial = Trial(tid)
     graph = trial.graph
     graph.use_cache &= bool(int(cache))
-    _, tgraph, _ = getattr(graph, graph_mode)()
+    _, tgraph, nodes = getattr(graph, graph_mode)()
+    node = request.args.get("node", type=int)
+    depth = request.args.get("depth", type=int)
+    if node is not None or depth is not None:
+        if node is not None and not 0 <= node < len(nodes):
+            abort(404)
+        root = tgraph["root"] if node is None else nodes[node]
+        tgraph = tree_window(tgraph, root, depth)
     return jsonify(**tgraph)
 
 
@@ -102,21 +140,25 @@ def dependencies(tid):
 @app.route("/trials/<tid>/environment.json")
 @app.route("/trials/<tid>/environment")  # remove
 def environment(tid):
-    """Respond trial environment variables as JSON"""
+    """Respond trial environment variables as JSON
+    Arguments offset and limit select a page of variables"""
     trial = Trial(tid)
-    result = {x.name: x.to_dict() for x in trial.environment_attrs}
-    return jsonify(all=list(result.values()))
+    attrs, total = paginate(EnvironmentAttr, trial.id)
+    result = {x.name: x.to_dict() for x in attrs}
+    return jsonify(all=list(result.values()), total=total)
 
 
 @app.route("/trials/<tid>/file_accesses.json")
 @app.route("/trials/<tid>/file_accesses")  # remove
 def file_accesses(tid):
-    """Respond trial file accesses as JSON"""
+    """Respond trial file accesses as JSON
+    Arguments offset and limit select a page of accesses"""
     trial = Trial(tid)
     trial_path = trial.environment.get("PWD", "")
+    accesses, total = paginate(FileAccess, trial.id)
     return jsonify(file_accesses=[x.to_dict(extra=("stack",))
-                                  for x in trial.file_accesses],
-                   trial_path=trial_path)
+                                  for x in accesses],
+                   trial_path=trial_path, total=total)
 
 
 @app.route("/diff/<trial1>/<trial2>/info.json")
@@ -177,6 +219,9 @@ def diff_graph(trial1, trial2, graph_mode, cache):
     diff_object = Diff(trial1, trial2)
     graph = diff_object.graph
     graph.use_cache &= bool(int(cache))
+    algorithm = request.args.get("algorithm", graph.algorithm)
+    if algorithm in ALGORITHMS:
+        graph.algorithm = algorithm
 
     _, diff_result, _ = getattr(graph, graph_mode)()
     return jsonify(**diff_result)
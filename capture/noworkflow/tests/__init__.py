@@ -12,7 +12,21 @@ persistence_config.connect(".")
 persistence_config.mock()
 
 from .prov_definition import TestSlicingDependencies
-from .prov_execution import TestCallSlicing
+from .prov_execution import TestCallSlicing, TestMonitoring
 from .prov_deployment import TestProvDeployment
 from .cross_version_test import TestCrossVersion
 from .formatter_test import TestFormatter
+from .io_test import TestOutput
+from .provo_test import TestRecordWriter
+from .lightweight_test import TestColumnarActivationStore
+from .writer_test import TestBackgroundWriter
+from .bulk_load_test import TestBulkLoad
+from .content_test import TestGitBatch, TestPackWriter, TestPlainStreams
+from .content_test import TestIncrementalCommit, TestHashIndex
+from .content_test import TestPlainCompression, TestThreadingEngine
+from .content_test import TestProcessEngines
+from .content_test import TestChunkEngine, TestHashCache
+from .content_test import TestContentCache
+from .prolog_test import TestTrialProlog
+from .graph_test import TestCompactGraph, TestMultiSummarization
+from .graph_test import TestFastDiff, TestHistoryGraph, TestTreeWindow
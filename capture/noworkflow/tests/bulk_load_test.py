@@ -0,0 +1,109 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test --bulk-load and 'now db reindex'"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from ..now.collection.metadata import Metascript
+from ..now.persistence import relational
+from ..now.persistence import models                                             # pylint: disable=unused-import
+from ..now.persistence.config import PersistenceConfig
+from ..now.persistence.relational_database import BULK_TABLES
+from .prov_execution.call_slicing_test import Args, NAME
+
+
+CAPTURE = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+SCRIPT = ("def f(x):\n"
+          "    return x + 1\n"
+          "r = [f(i) for i in range(3)]\n")
+
+
+class TestBulkLoad(unittest.TestCase):
+    """TestCase for dropping and rebuilding indexes of execution tables"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.old = (relational.db_path, relational.engine,
+                    relational._session_map)                                     # pylint: disable=protected-access
+        self.bulk = {index.name for index in relational.indexes(BULK_TABLES)}
+        self.other = {index.name for index in relational.indexes()} - self.bulk
+
+    def tearDown(self):
+        relational.engine.dispose()
+        relational.db_path, relational.engine, relational._session_map = (    # pylint: disable=protected-access
+            self.old)
+        relational.session_factory.configure(bind=relational.engine)
+        shutil.rmtree(self.path)
+
+    def indexes(self):                                                           # pylint: disable=no-self-use
+        """Return indexes of the database"""
+        with relational.engine.connect() as conn:
+            return relational.existing_indexes(conn)
+
+    def prepare(self):
+        """Create metascript with --bulk-load and connect to a database file
+        read_cmd_args connects to the mocked database"""
+        args = Args()
+        args.execution_provenance = "Profiler"
+        args.bulk_load = True
+        self.argv = sys.argv, sys.path[0]
+        sys.argv = ["now", "run", "--bulk-load", "__init__.py"]
+        metascript = Metascript().read_cmd_args(args)
+        metascript.fake_path(NAME, SCRIPT.encode("utf-8"))
+        metascript.trial_id = 1
+        metascript.namespace = {}
+        metascript.clear_sys()
+        metascript.clear_namespace()
+        config = PersistenceConfig()
+        config.path = self.path
+        os.makedirs(config.provenance_path)
+        relational.set_path(config)
+        relational.connect(config)
+        return metascript
+
+    def collect(self, metascript):
+        """Collect execution provenance"""
+        try:
+            metascript.execution.collect_provenance()
+        finally:
+            metascript.execution.provider.teardown()
+            sys.argv, sys.path[0] = self.argv
+
+    def test_run_drops_and_rebuilds_indexes(self):
+        metascript = self.prepare()
+        self.assertTrue(self.bulk | self.other <= self.indexes())
+        self.collect(metascript)
+        self.assertFalse(self.indexes() & self.bulk)
+        self.assertTrue(self.other <= self.indexes())
+        metascript.execution.store_provenance()
+        self.assertTrue(self.bulk | self.other <= self.indexes())
+        self.assertTrue(relational.query(
+            "SELECT count(*) FROM function_activation")[0][0])
+
+    def test_reindex_after_failure(self):
+        # The process fails before store_provenance rebuilds the indexes
+        self.collect(self.prepare())
+        self.assertFalse(self.indexes() & self.bulk)
+        relational.engine.dispose()
+        env = dict(os.environ)
+        paths = [CAPTURE]
+        if env.get("PYTHONPATH"):
+            paths.append(env["PYTHONPATH"])
+        env["PYTHONPATH"] = os.pathsep.join(paths)
+        with open(os.devnull, "w") as devnull:
+            result = subprocess.call(
+                [sys.executable, "-m", "noworkflow", "db", "reindex",
+                 "--dir", self.path], env=env, stdout=devnull, stderr=devnull)
+        self.assertEqual(0, result)
+        self.assertTrue(self.bulk | self.other <= self.indexes())
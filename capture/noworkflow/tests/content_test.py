@@ -0,0 +1,741 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.content engines"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+from ..now.persistence.config import PersistenceConfig
+from ..now.persistence.content import chunk_engine, git_system, plain_engine
+from ..now.persistence.content import safeopen
+from ..now.persistence.content.base import AmbiguousHashError, CHUNK_SIZE
+from ..now.persistence.content.compression import MAGIC
+from ..now.persistence.content.gitbase import tree_hash, BLOB_MODE, TREE_MODE
+from ..now.persistence.content.chunk_engine import ChunkEngine
+from ..now.persistence.content.packfile import PackWriter, create_packed
+from ..now.persistence.content.parallel import create_distributed
+from ..now.persistence.content.parallel import create_pool, create_threading
+from ..now.persistence.content.parallel import shared_directory
+from ..now.persistence.content.plain_engine import PlainEngine
+from ..now.persistence.content.plain_engine import DistributedPlainEngine
+from ..now.persistence.content.plain_engine import PoolPlainEngine
+from ..now.persistence.content.plain_engine import ThreadingPlainEngine
+from ..now.persistence.content.puregit_engine import PureGitEngine
+from ..now.persistence.content_cache import ContentCache
+from ..now.persistence.content_cache import HITS, HIT_BYTES, MISSES
+from ..now.persistence.hash_cache import HashCache, stat_key
+from ..now.utils.metaprofiler import meta_profiler
+
+
+@unittest.skipUnless(git_system.is_git_installed(), "requires git")
+class TestGitBatch(unittest.TestCase):
+    """Test long-lived git processes"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.git_path = os.path.join(self.path, "content.git")
+        git_system.init(self.git_path)
+
+    def tearDown(self):
+        git_system.close_batches()
+        shutil.rmtree(self.path)
+
+    def test_hash_object_reuses_process(self):
+        """Test that puts share the same git process"""
+        first = git_system.hash_object(b"abc", self.git_path)
+        process = git_system.batch(git_system.HashObjectWriter, self.git_path)
+        second = git_system.hash_object(b"def", self.git_path)
+        self.assertIs(
+            process, git_system.batch(git_system.HashObjectWriter, self.git_path))
+        self.assertEqual("f2ba8f84ab5c1bce84a7b441cb1959cfc7093b7f", first)
+        self.assertNotEqual(first, second)
+
+    def test_get(self):
+        """Test reading blobs written by the batch writer"""
+        content_hash = git_system.hash_object(b"x\ny\n\0z", self.git_path)
+        path = os.path.join(self.path, "file.txt")
+        with open(path, "wb") as fil:
+            fil.write(b"file")
+        path_hash = git_system.hash_path(path, self.git_path)
+        self.assertEqual(b"x\ny\n\0z", git_system.get(content_hash, self.git_path))
+        self.assertEqual(b"file", git_system.get(path_hash, self.git_path))
+        self.assertEqual(
+            content_hash, git_system.find_object(content_hash[:8], self.git_path))
+        self.assertIsNone(git_system.find_object("0" * 40, self.git_path))
+        self.assertIsNone(git_system.find_object("xyz", self.git_path))
+
+
+@unittest.skipUnless(git_system.is_git_installed(), "requires git")
+class TestPackWriter(unittest.TestCase):
+    """Test packfiles written for git engines"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.git_path = os.path.join(self.path, "content.git")
+        git_system.init(self.git_path)
+
+    def tearDown(self):
+        git_system.close_batches()
+        shutil.rmtree(self.path)
+
+    def test_pack(self):
+        """Test that git reads objects and deltas of the pack"""
+        data = b"".join("{},{}\n".format(i, i * i).encode("ascii")
+                        for i in range(5000))
+        modified = data[:1000] + b"new,line\n" + data[1000:]
+        writer = PackWriter(self.git_path)
+        first = writer.add(data, delta_key="data.csv")
+        second = writer.add(modified, delta_key="data.csv")
+        stream = writer.add_stream(io.BytesIO(b"stream"), 6)
+        self.assertIsNone(writer.add_stream(io.BytesIO(b"short"), 6))
+        name = writer.finish()
+        pack_path = os.path.join(self.git_path, "objects", "pack")
+        self.assertEqual(
+            sorted([name + ".idx", name + ".pack"]), sorted(os.listdir(pack_path)))
+        output = git_system.execute(
+            ["git", "verify-pack", "-v", os.path.join(pack_path, name + ".idx")])
+        self.assertIn(b"chain length = 1: 1 object", output)
+        self.assertEqual(data, git_system.get(first, self.git_path))
+        self.assertEqual(modified, git_system.get(second, self.git_path))
+        self.assertEqual(b"stream", git_system.get(stream, self.git_path))
+        self.assertTrue(git_system.has_object(stream, self.git_path))
+        self.assertIsNone(PackWriter(self.git_path).finish())
+
+    def test_stream_delta_base(self):
+        """Test that streamed objects are read back as delta bases"""
+        data = b"".join("{},{}\n".format(i, i * i).encode("ascii")
+                        for i in range(5000))
+        modified = data[:1000] + b"new,line\n" + data[1000:]
+        writer = PackWriter(self.git_path)
+        first = writer.add_stream(io.BytesIO(data), len(data),
+                                  delta_key="data.csv")
+        self.assertIsNone(writer.bases["data.csv"][1])
+        second = writer.add(modified, delta_key="data.csv")
+        name = writer.finish()
+        output = git_system.execute(["git", "verify-pack", "-v", os.path.join(
+            self.git_path, "objects", "pack", name + ".idx")])
+        self.assertIn(b"chain length = 1: 1 object", output)
+        self.assertEqual(data, git_system.get(first, self.git_path))
+        self.assertEqual(modified, git_system.get(second, self.git_path))
+
+    def test_packed_put_path(self):
+        """Test that put_path only reads files with delta bases into memory"""
+        config = PersistenceConfig()
+        config.path = self.path
+        engine = create_packed(PureGitEngine)(config)
+        engine.set_path(config)
+        engine.connect()
+        filename = os.path.join(self.path, "data.csv")
+        puts = []
+        put = engine.put
+
+        def recording_put(content, filename="generic"):
+            """Record buffered puts"""
+            puts.append(filename)
+            return put(content, filename)
+        engine.put = recording_put
+        with open(filename, "wb") as fil:
+            fil.write(b"a,b\n" * 1000)
+        first = engine.put_path(filename)
+        self.assertEqual([], puts)
+        with open(filename, "ab") as fil:
+            fil.write(b"c,d\n")
+        second = engine.put_path(filename)
+        self.assertEqual([filename], puts)
+        engine.close()
+        self.assertEqual(b"a,b\n" * 1000, engine.get(first))
+        self.assertEqual(b"a,b\n" * 1000 + b"c,d\n", engine.get(second))
+
+
+@unittest.skipUnless(git_system.is_git_installed(), "requires git")
+class TestIncrementalCommit(unittest.TestCase):
+    """Test commits that reuse the trees of the previous commit"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.config = PersistenceConfig()
+        self.config.path = self.path
+
+    def tearDown(self):
+        git_system.close_batches()
+        shutil.rmtree(self.path)
+
+    def commit(self, files):
+        """Commit files in a new engine. Return tree of commit and engine"""
+        engine = PureGitEngine(self.config)
+        engine.set_path(self.config)
+        engine.connect()
+        for name, content in files:
+            engine.put(content, os.path.join(self.path, name))
+        engine.commit_content("trial")
+        tree = git_system.execute(
+            ["git", "rev-parse", "HEAD^{tree}"], cwd=engine.content_path)
+        return tree.decode("ascii").strip(), engine
+
+    def test_trees(self):
+        """Test that trees only have the files of their trial"""
+        self.commit([("a/x", b"1"), ("b/y", b"2"), ("a-b", b"3")])
+        tree, engine = self.commit([("a/x", b"1"), ("c/z", b"3")])
+        output = git_system.execute(
+            ["git", "ls-tree", "-r", "--name-only", "HEAD"],
+            cwd=engine.content_path)
+        self.assertEqual(b"a/x\nc/z\n", output)
+        blob = git_system.hash_object(b"1", engine.content_path)
+        subtree = tree_hash({"x": (BLOB_MODE, blob)})
+        self.assertEqual(tree, tree_hash({
+            "a": (TREE_MODE, subtree),
+            "c": (TREE_MODE, tree_hash({"z": (
+                BLOB_MODE, git_system.hash_object(b"3", engine.content_path))}))
+        }))
+
+    def test_commit_after_other_engine(self):
+        """Test that the index is discarded after commits of tree engines"""
+        self.commit([("a/x", b"1"), ("b/y", b"2")])
+        # Commit of an engine that writes trees, such as dulwich
+        engine = PureGitEngine(self.config)
+        engine.set_path(self.config)
+        index_file = os.path.join(self.path, "other-index")
+        git_system.update_index_info(
+            [("100644", git_system.hash_object(b"3", engine.content_path),
+              "c/z")], engine.content_path, index_file)
+        tree = git_system.write_tree(engine.content_path, index_file)
+        engine.create_commit_object("other", tree)
+        engine.save_tree_cache({"": tree})
+        self.commit([("d/w", b"4")])
+        output = git_system.execute(
+            ["git", "ls-tree", "-r", "--name-only", "HEAD"],
+            cwd=engine.content_path)
+        self.assertEqual(b"d/w\n", output)
+
+
+class TestPlainStreams(unittest.TestCase):
+    """Test chunked storage of the plain engine"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        config = PersistenceConfig()
+        config.path = self.path
+        self.engine = PlainEngine(config)
+        self.engine.connect()
+        self.filename = os.path.join(self.path, "file.bin")
+        self.data = b"".join(bytes(bytearray([i % 256])) * 1000
+                             for i in range(3000))
+        with open(self.filename, "wb") as fil:
+            fil.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def object_dirs(self):
+        """List content directory without the hash index files"""
+        return [name for name in os.listdir(self.engine.content_path)
+                if not name.startswith(".index")]
+
+    def test_put_path(self):
+        """Test that put_path stores the same object as put"""
+        content_hash = self.engine.put_path(self.filename)
+        self.assertEqual(self.engine.put(self.data, "file.bin"), content_hash)
+        self.assertEqual(self.data, self.engine.get(content_hash))
+        self.assertEqual([content_hash[:2]], self.object_dirs())
+
+    def test_put_stream(self):
+        """Test that put_stream does not leave temporary files"""
+        with open(self.filename, "rb") as fil:
+            content_hash = self.engine.put_stream(fil)
+        self.assertEqual(self.data, self.engine.get(content_hash))
+        self.assertEqual([content_hash[:2]], self.object_dirs())
+
+    def test_copy_file_in_user_space(self):
+        """Test copy fallback when the kernel copy is not available"""
+        target = os.path.join(self.path, "copy.bin")
+        original = plain_engine.kernel_copy
+        def fail(*args):
+            raise OSError("not supported")
+        plain_engine.kernel_copy = fail
+        try:
+            with open(self.filename, "rb") as source:
+                with open(target, "wb", buffering=0) as target_file:
+                    plain_engine.copy_file(source, target_file, len(self.data))
+        finally:
+            plain_engine.kernel_copy = original
+        with open(target, "rb") as fil:
+            self.assertEqual(self.data, fil.read())
+
+
+class TestPlainCompression(unittest.TestCase):
+    """Test compression of the plain engine"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        config = PersistenceConfig()
+        config.path = self.path
+        self.engine = PlainEngine(config)
+        self.engine.connect()
+        self.data = b"a,b,c\n" * 10000
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def stored(self, content_hash):
+        """Return stored object"""
+        with open(os.path.join(self.engine.content_path, content_hash[:2],
+                               content_hash[2:]), "rb") as fil:
+            return fil.read()
+
+    def test_read_uncompressed_objects(self):
+        """Test that objects stored before the compression are readable"""
+        old_hash = self.engine.put(self.data, "old")
+        self.engine.set_compression("zlib")
+        new_hash = self.engine.put(self.data + b"new", "new")
+        self.assertEqual(self.data, self.stored(old_hash))
+        self.assertLess(len(self.stored(new_hash)), len(self.data) // 10)
+        self.assertEqual(self.data, self.engine.get(old_hash))
+        self.assertEqual(self.data + b"new", self.engine.get(new_hash))
+
+    def test_small_objects(self):
+        """Test that small objects are not compressed"""
+        self.engine.set_compression("zlib")
+        content_hash = self.engine.put(b"small", "small")
+        self.assertEqual(b"small", self.stored(content_hash))
+        magic_hash = self.engine.put(MAGIC + b"zlib\n", "magic")
+        self.assertEqual(MAGIC + b"zlib\n", self.engine.get(magic_hash))
+
+    def test_compressed_streams(self):
+        """Test that put_path and put_stream compress in chunks"""
+        filename = os.path.join(self.path, "file.csv")
+        with open(filename, "wb") as fil:
+            fil.write(self.data)
+        self.engine.set_compression("unknown")
+        self.assertEqual("zlib", self.engine.compression)
+        content_hash = self.engine.put_path(filename)
+        self.assertLess(len(self.stored(content_hash)), len(self.data) // 10)
+        self.assertEqual(self.data, self.engine.get(content_hash))
+        self.assertEqual(content_hash, self.engine.put_stream(
+            io.BytesIO(self.data)))
+
+    def test_incompressible_streams(self):
+        """Test that put_path and put_stream store incompressible content raw"""
+        rand = random.Random(0)
+        data = bytes(bytearray(rand.randint(0, 255) for _ in range(20000)))
+        filename = os.path.join(self.path, "file.bin")
+        with open(filename, "wb") as fil:
+            fil.write(data)
+        self.engine.set_compression("zlib")
+        content_hash = self.engine.put_path(filename)
+        self.assertEqual(hashlib.sha1(data).hexdigest(), content_hash)
+        self.assertEqual(data, self.stored(content_hash))
+        stream_hash = self.engine.put_stream(io.BytesIO(data[1:]))
+        self.assertEqual(data[1:], self.stored(stream_hash))
+        self.assertEqual(data[1:], self.engine.get(stream_hash))
+
+    def test_saved_codec(self):
+        """Test that engines without codec reset the saved codec"""
+        def connect(*names):
+            """Create engine with compression names"""
+            config = PersistenceConfig()
+            config.path = self.path
+            engine = PlainEngine(config)
+            for name in names:
+                engine.set_compression(name)
+            engine.connect()
+            return engine.compression
+        self.assertEqual("zlib", connect("zlib"))
+        self.assertEqual("zlib", connect())
+        self.assertIsNone(connect(None))
+        self.assertIsNone(connect())
+
+
+class TestHashIndex(unittest.TestCase):
+    """Test prefix lookups of the plain engine"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        config = PersistenceConfig()
+        config.path = self.path
+        self.engine = PlainEngine(config)
+        self.engine.connect()
+        self.hashes = [
+            self.engine.put(str(i).encode("ascii"), "generic")
+            for i in range(1000)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def ambiguous_prefix(self):
+        """Return prefix of two hashes"""
+        hashes = sorted(self.hashes)
+        for first, second in zip(hashes, hashes[1:]):
+            if first[:3] == second[:3]:
+                return first[:3], [first, second]
+
+    def check_lookups(self):
+        """Check unique, ambiguous and missing prefixes"""
+        for content_hash in self.hashes[::50]:
+            self.assertEqual(
+                content_hash, self.engine.find_subhash(content_hash[:7]))
+        prefix, candidates = self.ambiguous_prefix()
+        with self.assertRaises(AmbiguousHashError) as context:
+            self.engine.find_subhash(prefix)
+        self.assertEqual(candidates, context.exception.candidates[:2])
+        self.assertIsNone(self.engine.find_subhash("0" * 40))
+        self.assertIsNone(self.engine.find_subhash("xyz"))
+
+    def test_journal(self):
+        """Test lookups before and after merging the journal"""
+        self.check_lookups()
+        self.engine.hash_index.merge(force=True)
+        self.check_lookups()
+        self.assertEqual(
+            1000, os.path.getsize(self.engine.hash_index.index_filename) // 20)
+
+    def test_rebuild(self):
+        """Test that stores without index are indexed on lookup"""
+        os.remove(self.engine.hash_index.index_filename)
+        os.remove(self.engine.hash_index.journal_filename)
+        self.check_lookups()
+
+
+STD_OPEN = safeopen.std_open
+
+
+class SizedReader(io.BufferedReader):
+    """Reader that fails if the whole file is read at once"""
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            raise AssertionError("read the whole file")
+        return super(SizedReader, self).read(size)
+
+
+def sized_open(path, mode="r", *args, **kwargs):
+    """Open binary files for reading with SizedReader"""
+    if mode == "rb":
+        return SizedReader(io.FileIO(path, "rb"))
+    return STD_OPEN(path, mode, *args, **kwargs)
+
+
+class TestThreadingEngine(unittest.TestCase):
+    """Test thread pool engine"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.config = PersistenceConfig()
+        self.config.path = self.path
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_put(self):
+        """Test that puts with bounded pending bytes store all contents"""
+        engine = create_threading(PlainEngine, max_workers=2,
+                                  max_pending_bytes=100)(self.config)
+        engine.connect()
+        contents = [str(i).encode("ascii") * 60 for i in range(20)] * 2
+        hashes = [engine.put(content, "generic") for content in contents]
+        engine.close()
+        self.assertEqual(0, engine.pending_bytes)
+        self.assertEqual(
+            contents, [engine.get(content_hash) for content_hash in hashes])
+
+    def test_put_path(self):
+        """Test that put_path streams files in parallel engines"""
+        filename = os.path.join(self.path, "file.csv")
+        with open(filename, "wb") as fil:
+            for _ in range(3):
+                fil.write(b"a,b,c\n" * (CHUNK_SIZE // 6 + 1))
+        with open(filename, "rb") as fil:
+            expected = fil.read()
+        for cls in (DistributedPlainEngine, PoolPlainEngine,
+                    ThreadingPlainEngine):
+            engine = cls(self.config)
+            engine.connect()
+            std_open, safeopen.std_open = safeopen.std_open, sized_open
+            try:
+                content_hash = engine.put_path(filename)
+            finally:
+                safeopen.std_open = std_open
+            engine.close()
+            self.assertEqual(hashlib.sha1(expected).hexdigest(), content_hash)
+            self.assertEqual(expected, engine.get(content_hash))
+
+    def test_close_after_puts(self):
+        """Test that the wrapped engine is closed after the pending puts"""
+        closed = []
+
+        class Closing(PlainEngine):
+            """Engine that records pending bytes when it is closed"""
+            def close(self):
+                closed.append(self.pending_bytes)
+        engine = create_threading(Closing, max_workers=2)(self.config)
+        engine.connect()
+        for i in range(20):
+            engine.put(str(i).encode("ascii") * 10000, "generic")
+        engine.close()
+        self.assertEqual([0], closed)
+
+    def test_errors(self):
+        """Test that close raises errors of workers"""
+        class Failing(PlainEngine):
+            """Engine that fails to store contents"""
+            @staticmethod
+            def do_put(content_path, content, compression=None):
+                raise IOError("disk full")
+        engine = create_threading(Failing)(self.config)
+        engine.connect()
+        engine.put(b"abc", "generic")
+        with self.assertRaises(IOError):
+            engine.close()
+
+
+class MappingEngine(PlainEngine):
+    """Plain engine with the filename -> hash mapping of git engines"""
+
+    def __init__(self, config):
+        super(MappingEngine, self).__init__(config)
+        self.object_hashes = {}
+
+    @staticmethod
+    def do_put(content_path, object_hashes, content, filename):                  # pylint: disable=arguments-differ
+        result = object_hashes[filename] = PlainEngine.do_put(
+            content_path, content)
+        return result
+
+    def put_attr(self, content, filename):
+        return (self.content_path, self.object_hashes, content, filename)
+
+
+class FailingEngine(PlainEngine):
+    """Engine that fails to store contents"""
+
+    @staticmethod
+    def do_put(content_path, content, compression=None):
+        raise IOError("disk full")
+
+
+class TestProcessEngines(unittest.TestCase):
+    """Test distributed and pool engines"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.config = PersistenceConfig()
+        self.config.path = self.path
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def shared_files(self):                                                      # pylint: disable=no-self-use
+        """Return shared memory files of this process"""
+        prefix = "noworkflow-{}-".format(os.getpid())
+        return [name for name in os.listdir(shared_directory())
+                if name.startswith(prefix)]
+
+    def test_put(self):
+        """Test that mappings are merged when the engine is closed"""
+        contents = [str(i).encode("ascii") * 60000 for i in range(10)]
+        expected = {
+            "file{}".format(i): hashlib.sha1(content).hexdigest()
+            for i, content in enumerate(contents)
+        }
+        for create in (create_distributed, create_pool):
+            engine = create(MappingEngine)(self.config)
+            engine.connect()
+            hashes = [engine.put(content, "file{}".format(i))
+                      for i, content in enumerate(contents)]
+            self.assertEqual({}, engine.object_hashes)
+            engine.close()
+            self.assertEqual(expected, engine.object_hashes)
+            self.assertEqual(
+                contents, [engine.get(content_hash) for content_hash in hashes])
+            self.assertEqual([], self.shared_files())
+
+    def test_errors(self):
+        """Test that close raises errors of workers"""
+        for create in (create_distributed, create_pool):
+            engine = create(FailingEngine)(self.config)
+            engine.connect()
+            engine.put(b"abc", "generic")
+            with self.assertRaises(IOError):
+                engine.close()
+            self.assertEqual([], self.shared_files())
+
+
+class TestChunkEngine(unittest.TestCase):
+    """Test content-defined chunking engine"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        config = PersistenceConfig()
+        config.path = self.path
+        self.engine = ChunkEngine(config)
+        self.engine.connect()
+        rand = random.Random(0)
+        self.data = bytes(bytearray(
+            rand.randint(0, 255) for _ in range(200000)))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def count_chunks(self):
+        """Count stored chunks"""
+        return len(list(self.engine.all_hashes(self.engine.chunks_path)))
+
+    def test_put_get(self):
+        """Test that objects are reassembled with plain engine hashes"""
+        content_hash = self.engine.put(self.data)
+        self.assertEqual(hashlib.sha1(self.data).hexdigest(), content_hash)
+        self.assertEqual(self.data, self.engine.get(content_hash))
+        self.assertEqual(b"small", self.engine.get(self.engine.put(b"small")))
+        self.assertEqual(
+            content_hash, self.engine.find_subhash(content_hash[:6]))
+
+    def test_put_stream(self):
+        """Test that put_stream produces the same chunks as put"""
+        self.engine.put(self.data)
+        chunks = self.count_chunks()
+        content_hash = self.engine.put_stream(io.BytesIO(self.data))
+        self.assertEqual(chunks, self.count_chunks())
+        self.assertEqual(self.data, self.engine.get(content_hash))
+
+    def test_put_stream_existing_object(self):
+        """Test that put_stream does not chunk existing objects"""
+        content_hash = self.engine.put(self.data)
+
+        def fail(chunk):
+            raise AssertionError("chunked existing object")
+        self.engine.put_chunk = fail
+        self.assertEqual(
+            content_hash, self.engine.put_stream(io.BytesIO(self.data)))
+
+    @unittest.skipUnless(chunk_engine.numpy, "numpy is not available")
+    def test_gear_candidates(self):
+        """Test that vectorized cut points match the byte by byte search"""
+        data = memoryview(self.data[:90000] + b"\0" * 70000 + self.data)
+        candidates = chunk_engine.gear_candidates(data)
+        start = 0
+        while start < len(data):
+            size = chunk_engine.cut_point(data, start, len(data))
+            self.assertEqual(size, chunk_engine.cut_point(
+                data, start, len(data), candidates))
+            start += size
+
+    def test_deduplicate_modified_content(self):
+        """Test that an insertion only adds a few chunks"""
+        self.engine.put(self.data)
+        chunks = self.count_chunks()
+        modified = self.data[:50000] + b"new" + self.data[50000:]
+        self.assertEqual(modified, self.engine.get(self.engine.put(modified)))
+        self.assertLessEqual(self.count_chunks(), chunks + 2)
+
+    def test_gc(self):
+        """Test that gc removes chunks of removed objects"""
+        content_hash = self.engine.put(self.data)
+        os.remove(os.path.join(
+            self.engine.objects_path, content_hash[:2], content_hash[2:]))
+        kept = self.engine.put(self.data[:100000])
+        self.engine.gc()
+        self.assertEqual(self.data[:100000], self.engine.get(kept))
+        self.assertLess(self.count_chunks(), 20)
+
+
+class TestHashCache(unittest.TestCase):
+    """Test stat-keyed content hash cache"""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.path, ".noworkflow"))
+        self.filename = os.path.join(self.path, "file.txt")
+        with open(self.filename, "wb") as fil:
+            fil.write(b"abc")
+        # Avoid racy entries
+        os.utime(self.filename, (0, 0))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def new_cache(self, engine="PlainEngine"):
+        """Create cache for temporary directory"""
+        config = PersistenceConfig()
+        cache = HashCache(config)
+        config.path = self.path
+        cache.set_engine(engine)
+        return cache
+
+    def test_persist_across_trials(self):
+        """Test that saved hashes are reused by new caches"""
+        cache = self.new_cache()
+        key = stat_key(self.filename)
+        cache.set(key, "hash")
+        cache.save()
+        self.assertEqual("hash", self.new_cache().get(key))
+        self.assertIsNone(self.new_cache("DulwichEngine").get(key))
+
+    def test_stat_change(self):
+        """Test that modified files do not reuse hashes"""
+        cache = self.new_cache()
+        cache.set(stat_key(self.filename), "hash")
+        with open(self.filename, "wb") as fil:
+            fil.write(b"abcd")
+        os.utime(self.filename, (0, 0))
+        self.assertIsNone(cache.get(stat_key(self.filename)))
+        self.assertIsNone(cache.get(stat_key(self.filename + ".missing")))
+
+    def test_racy_entry(self):
+        """Test that recently modified files are hashed again"""
+        cache = self.new_cache()
+        os.utime(self.filename, None)
+        key = stat_key(self.filename)
+        cache.set(key, "hash")
+        self.assertIsNone(cache.get(key))
+
+
+class TestContentCache(unittest.TestCase):
+    """Test LRU read cache of contents"""
+
+    def setUp(self):
+        self.loads = []
+
+    def load(self, content_hash):
+        """Load content"""
+        self.loads.append(content_hash)
+        return content_hash.encode("ascii") * 10
+
+    def test_lru(self):
+        """Test that least recently used contents are evicted"""
+        cache = ContentCache(max_bytes=100)
+        counters = meta_profiler.data[HITS], meta_profiler.data[MISSES]
+        cache.get("a", self.load)
+        cache.get("b", self.load)
+        self.assertEqual(b"a" * 10, cache.get("a", self.load))
+        for name in "cdefghijk":
+            cache.get(name, self.load)
+        cache.get("a", self.load)
+        cache.get("b", self.load)
+        self.assertEqual(["a", "b", "c", "d", "e", "f", "g", "h", "i", "j",
+                          "k", "b"], self.loads)
+        self.assertEqual((2, 12), (meta_profiler.data[HITS] - counters[0],
+                                   meta_profiler.data[MISSES] - counters[1]))
+        self.assertLessEqual(cache.size, 100)
+
+    def test_large_contents(self):
+        """Test that large contents are not cached"""
+        cache = ContentCache(max_bytes=30)
+        cache.get("a", self.load)
+        cache.get("a", self.load)
+        self.assertEqual(["a", "a"], self.loads)
+        self.assertEqual(0, cache.size)
+
+    def test_counters_are_registered(self):
+        """Test that counters are columns before the first hit or miss"""
+        self.assertTrue(
+            {HITS, HIT_BYTES, MISSES} <= set(meta_profiler.order))
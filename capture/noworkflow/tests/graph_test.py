@@ -0,0 +1,236 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.models.graphs module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import json
+import unittest
+
+from datetime import datetime, timedelta
+
+from ..now.persistence import relational
+from ..now.persistence.models import History, HistoryNode, Trial
+from ..now.persistence.models.graphs.compact import dump_graph, load_graph
+from ..now.persistence.models.graphs.compact import MAGIC
+from ..now.persistence.models.graphs.diff_graph import create_diff
+from ..now.persistence.models.graphs.diff_graph import create_mapping
+from ..now.persistence.models.graphs.structures import tree_window
+from ..now.persistence.models.graphs.trial_graph import LineNameSummarization
+from ..now.persistence.models.graphs.trial_graph import NoMatchSummarization
+from ..now.persistence.models.graphs.trial_graph import StructureSummarization
+from ..now.persistence.models.graphs.trial_graph import TreeSummarization
+from ..now.persistence.models.graphs.trial_graph import MultiSummarization
+from ..now.utils.cross_version import pickle
+from ..now.utils.data import DotDict
+
+
+def activations(trial_id, calls):
+    """Create preorder activations from (name, line, caller) tuples"""
+    return [
+        DotDict(id=aid, trial_id=trial_id, name=name, line=line,
+                caller_id=caller, duration=0.5 * aid)
+        for aid, (name, line, caller) in enumerate(calls, 1)
+    ]
+
+
+CALLS = [
+    ("script.py", 1, 0), ("f", 2, 1), ("g", 5, 2), ("f", 2, 1),
+    ("g", 5, 4), ("h", 3, 1),
+]
+
+
+def summarize(cls, trial_id=1, calls=CALLS):
+    """Return graph result as TrialGraph.result does"""
+    summarization = cls(activations(trial_id, calls))
+    return True, summarization.graph({trial_id: 0}), summarization.nodes
+
+
+class TestCompactGraph(unittest.TestCase):
+    """TestCase for compact graph cache format"""
+
+    def test_round_trip(self):
+        """Loaded graphs produce the same JSON of pickled graphs"""
+        for cls in (LineNameSummarization, NoMatchSummarization):
+            result = summarize(cls)
+            data = dump_graph(result)
+            self.assertTrue(data.startswith(MAGIC))
+            finished, graph, nodes = load_graph(data)
+            self.assertTrue(finished)
+            self.assertEqual(len(result[2]), len(nodes))
+            self.assertEqual(
+                json.dumps(pickle.loads(pickle.dumps(result[1])),
+                           sort_keys=True),
+                json.dumps(graph, sort_keys=True))
+
+    def test_lazy_nodes(self):
+        """Nodes are created when they are reached"""
+        _, graph, nodes = load_graph(dump_graph(summarize(
+            LineNameSummarization)))
+        created = lambda: sum(1 for node in nodes.cache if node is not None)
+        self.assertEqual(1, created())
+        self.assertEqual(["f", "h"], [
+            child.name for child in graph["root"].children])
+        self.assertEqual(3, created())
+        self.assertEqual([2, 4], graph["root"].children[0].activations[1])
+
+    def test_diff_of_loaded_graphs(self):
+        """Diffs of loaded graphs are equal to diffs of pickled graphs"""
+        other = CALLS[:3] + [("h", 3, 1)]
+        graphs = (summarize(LineNameSummarization),
+                  summarize(LineNameSummarization, 2, other))
+        expected = create_diff(*(
+            pickle.loads(pickle.dumps(graph)) for graph in graphs))
+        result = create_diff(*(
+            load_graph(dump_graph(graph)) for graph in graphs))
+        self.assertEqual(json.dumps(expected[1], sort_keys=True),
+                         json.dumps(result[1], sort_keys=True))
+
+    def test_pickle_fallback(self):
+        """Old entries and unknown attributes use pickle"""
+        result = summarize(LineNameSummarization)
+        self.assertEqual(
+            json.dumps(result[1], sort_keys=True),
+            json.dumps(load_graph(pickle.dumps(result))[1], sort_keys=True))
+        result[2][1].extra = "value"
+        data = dump_graph(result)
+        self.assertFalse(data.startswith(MAGIC))
+        self.assertEqual("value", load_graph(data)[2][1].extra)
+
+
+class TestMultiSummarization(unittest.TestCase):
+    """TestCase for single pass summarization"""
+
+    def test_single_pass(self):
+        """All modes are equal to separate summarizations"""
+        classes = {
+            "tree": TreeSummarization,
+            "no_match": NoMatchSummarization,
+            "exact_match": StructureSummarization,
+            "namespace_match": LineNameSummarization,
+        }
+        multi = MultiSummarization(iter(activations(1, CALLS)))
+        for mode, cls in classes.items():
+            expected = cls(activations(1, CALLS)).graph({1: 0})
+            self.assertEqual(json.dumps(expected, sort_keys=True),
+                             json.dumps(multi[mode].graph({1: 0}),
+                                        sort_keys=True))
+
+    def test_exact_match_only(self):
+        """exact_match does not require no_match in the result"""
+        multi = MultiSummarization(activations(1, CALLS), ["exact_match"])
+        self.assertEqual(["exact_match"], list(multi.summarizations))
+
+
+class TestFastDiff(unittest.TestCase):
+    """TestCase for fast diff graph algorithm"""
+
+    def test_small_trees(self):
+        """Small trees produce the same diff of the exact algorithm"""
+        other = CALLS[:3] + [("h", 3, 1)]
+        graphs = (summarize(TreeSummarization),
+                  summarize(TreeSummarization, 2, other))
+        expected = create_diff(*(
+            pickle.loads(pickle.dumps(graph)) for graph in graphs))
+        result = create_diff(*(
+            pickle.loads(pickle.dumps(graph)) for graph in graphs),
+                             algorithm="fast")
+        self.assertEqual(json.dumps(expected[1], sort_keys=True),
+                         json.dumps(result[1], sort_keys=True))
+
+    def test_large_trees(self):
+        """Every node is mapped and identical subtrees are merged"""
+        calls = [("script.py", 1, 0)]
+        for index in range(200):
+            caller = len(calls) + 1
+            calls.append(("f", 2, 1))
+            calls.extend(("g{}".format(index % 7), 5, caller)
+                         for _ in range(2))
+        other = list(calls)
+        other[100] = ("changed", 5, other[100][2])
+        root1 = TreeSummarization(activations(1, calls)).root
+        root2 = TreeSummarization(activations(2, other)).root
+        _, id_to_node1, id_to_node2 = create_mapping(root1, root2, "fast")
+        self.assertEqual(len(calls), len(id_to_node1))
+        self.assertEqual(len(other), len(id_to_node2))
+        merged = set(map(id, id_to_node1.values())) & set(
+            map(id, id_to_node2.values()))
+        self.assertEqual(len(calls) - 1, len(merged))
+
+
+class TestTreeWindow(unittest.TestCase):
+    """TestCase for subtree windows of graph JSON"""
+
+    def test_depth(self):
+        """Nodes at depth have no children and keep children_count"""
+        result = summarize(TreeSummarization)
+        for _, graph, nodes in (result, load_graph(dump_graph(result))):
+            window = tree_window(graph, nodes[1], 1)
+            self.assertEqual(1, window["root"].index)
+            self.assertEqual([2], [
+                child.index for child in window["root"].children])
+            self.assertEqual([], window["root"].children[0].children)
+            self.assertEqual(1, window["root"].children_count)
+            self.assertTrue(all(
+                edge["source"] in (1, 2) and edge["target"] in (1, 2)
+                for edge in window["edges"]))
+            self.assertEqual(3, len(graph["root"].children))
+
+
+class TestHistoryGraph(unittest.TestCase):
+    """TestCase for persisted history layout"""
+
+    first_id = 900001
+
+    def setUp(self):
+        self.start = datetime(2100, 1, 1)
+        self.ids = []
+
+    def tearDown(self):
+        session = relational.session
+        session.execute(Trial.t.delete().where(Trial.t.c.id.in_(self.ids)))
+        session.execute(HistoryNode.t.delete())
+        session.commit()
+
+    def add_trials(self, *trials):
+        """Insert (script, parent, finished) trials"""
+        session = relational.session
+        for script, parent, finished in trials:
+            tid = self.first_id + len(self.ids)
+            start = self.start + timedelta(seconds=len(self.ids))
+            session.execute(Trial.t.insert(), dict(
+                id=tid, start=start, script=script, run=1,
+                parent_id=None if parent is None else self.first_id + parent,
+                finish=start + timedelta(seconds=0.5) if finished else None))
+            self.ids.append(tid)
+        session.commit()
+
+    def layout(self, use_cache=True):
+        """Return (trial id, target id, level) of finished test trials"""
+        history = History(status="finished")
+        history.graph.use_cache = use_cache
+        data = history.graph.history_data()
+        nodes = data["nodes"]
+        return sorted(
+            (nodes[edge["source"]].id, nodes[edge["target"]].id,
+             nodes[edge["source"]].level)
+            for edge in data["edges"] if nodes[edge["source"]].id in self.ids
+        )
+
+    def test_appended_trials(self):
+        """Appended trials extend the stored layout"""
+        self.add_trials(("a.py", None, True), ("a.py", 0, True),
+                        ("b.py", None, True), ("a.py", 1, False))
+        first = self.layout()
+        self.assertEqual([(900001, 900001), (900002, 900001),
+                          (900003, 900003)], [row[:2] for row in first])
+        stored = HistoryNode.fast_load("finished|*")
+        self.add_trials(("a.py", 3, True), ("b.py", 2, True))
+        result = self.layout()
+        self.assertEqual(
+            [row[0] for row in stored],
+            [row[0] for row in HistoryNode.fast_load("finished|*")][:-2])
+        self.assertIn((900005, 900002), [row[:2] for row in result])
+        self.assertEqual(result, self.layout(use_cache=False))
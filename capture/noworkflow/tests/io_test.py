@@ -0,0 +1,43 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.utils.io module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..now.utils.io import open_output, write_lines
+
+
+class TestOutput(unittest.TestCase):
+    """TestCase for streaming output"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.lines = ["fact({}, 'é').".format(i) for i in range(100)]
+        self.expected = "\n".join(self.lines) + "\n"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_chunks(self):
+        """Chunks produce the same text of joined lines"""
+        output = io.StringIO()
+        write_lines(output, iter(self.lines), chunk_size=50)
+        self.assertEqual(self.expected, output.getvalue())
+
+    def test_gzip(self):
+        """Files with .gz extension are compressed"""
+        path = os.path.join(self.tmp, "facts.pl.gz")
+        with open_output(path) as output:
+            write_lines(output, self.lines)
+        with gzip.open(path, "rb") as compressed:
+            self.assertEqual(self.expected,
+                             compressed.read().decode("utf-8"))
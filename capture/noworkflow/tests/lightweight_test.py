@@ -0,0 +1,97 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.lightweight module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+from datetime import datetime
+
+from ..now.persistence.lightweight import ObjectStore, ActivationLW
+from ..now.persistence.lightweight import ColumnarActivationStore
+
+
+def populate(store):
+    """Add activations as the Profiler would do"""
+    main = store.add("script.py", "script.py", "script.py", 1, 0, None, True)
+    for i in range(3):
+        aid = store.add("script.py", "script.py", "f", 2 + i, 4, main, True)
+        activation = store[aid]
+        activation.args.append("x")
+        activation.start = datetime(2016, 1, 1, 0, 0, i)
+        if i != 1:
+            activation.finish = datetime(2016, 1, 1, 0, 1, i)
+            activation.return_value = str(i)
+    return main
+
+
+def rows(store, trial_id, partial=False):
+    """Return stored dicts"""
+    return [
+        {key: obj[key] for key in obj.keys()}
+        for obj in store.generator(trial_id, partial)
+    ]
+
+
+class TestColumnarActivationStore(unittest.TestCase):
+    """TestCase for ColumnarActivationStore"""
+
+    def test_generator_matches_object_store(self):
+        objects = ObjectStore(ActivationLW)
+        columns = ColumnarActivationStore()
+        populate(objects)
+        populate(columns)
+        expected = rows(objects, 7)
+        result = rows(columns, 7)
+        for row in expected + result:
+            del row["start"]
+        self.assertEqual(expected[1:], result[1:])
+        self.assertEqual(None, result[0]["caller_id"])
+        self.assertEqual(7, result[0]["trial_id"])
+
+    def test_partial_generator_removes_finished_activations(self):
+        objects = ObjectStore(ActivationLW)
+        columns = ColumnarActivationStore()
+        populate(objects)
+        populate(columns)
+        self.assertEqual(
+            [obj["id"] for obj in rows(objects, 1, partial=True)],
+            [obj["id"] for obj in rows(columns, 1, partial=True)])
+        self.assertEqual(
+            [obj.id for obj in objects.values()],
+            [obj.id for obj in columns.values()])
+        new_id = columns.add("script.py", "script.py", "g", 9, 0, 1, True)
+        self.assertEqual([1, 3, new_id], list(columns.ids))
+        self.assertEqual("g", columns[new_id].name)
+
+    def test_referenced_view_survives_compaction(self):
+        columns = ColumnarActivationStore(slicing=True)
+        populate(columns)
+        activation = columns[2]
+        activation.context["a"] = 1
+        rows(columns, 1, partial=True)
+        columns.add("script.py", "script.py", "g", 9, 0, 1, True)
+        self.assertNotIn(2, list(columns.ids))
+        self.assertEqual("f", activation.name)
+        self.assertEqual({"a": 1}, activation.context)
+        self.assertEqual(["x"], activation.args)
+
+    def test_reset_id_replaces_activation(self):
+        columns = ColumnarActivationStore()
+        columns.add("now(n/a)", "script.py", "module.exec", 1, 0, None, False)
+        columns.id = 0
+        populate(columns)
+        self.assertEqual("script.py", columns[1].name)
+        self.assertEqual(4, len(list(columns.values())))
+
+    def test_containers_are_lazy(self):
+        columns = ColumnarActivationStore()
+        populate(columns)
+        activation = columns[2]
+        self.assertEqual([], activation.args)
+        self.assertEqual([], activation.file_accesses)
+        self.assertEqual({}, columns.extras)
+        activation.file_accesses.append("access")
+        self.assertEqual(["access"], columns[2].file_accesses)
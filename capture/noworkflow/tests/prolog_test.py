@@ -0,0 +1,126 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test loading facts of trials into swipl"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from datetime import datetime, timedelta
+from glob import glob
+
+from ..now.persistence import persistence_config, relational
+from ..now.persistence.models import Trial
+from ..now.persistence.models.trial_prolog import TrialProlog
+from ..now.utils.prolog import PrologTimestamp
+
+try:
+    from pyswip import Prolog                                                    # pylint: disable=unused-import
+    HAS_SWIPL = True
+except Exception:                                                                # pylint: disable=broad-except
+    HAS_SWIPL = False
+
+
+LOAD_FILES = re.compile(r"^load_files\('(.*)', \[qcompile\((\w+)\)\]\)$")
+
+
+class FakeProlog(object):
+    """Record queries and facts instead of running swipl"""
+
+    def __init__(self):
+        self.queries = []
+        self.facts = []
+
+    def query(self, query):
+        """Record query. Return no results"""
+        self.queries.append(query)
+        return iter([])
+
+    def assertz(self, fact):
+        """Record fact"""
+        self.facts.append(fact)
+
+    def loaded(self):
+        """Return (path, qcompile option) of loaded files"""
+        return [LOAD_FILES.match(query).groups() for query in self.queries
+                if query.startswith("load_files(")]
+
+
+class TestTrialProlog(unittest.TestCase):
+    """TestCase for facts files consulted by swipl"""
+
+    trial_id = 900101
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.old = (TrialProlog.prolog_cli, PrologTimestamp.use_nil,
+                    persistence_config.provenance_path, os.getcwd())
+        self.cli = TrialProlog.prolog_cli = FakeProlog()
+        # Relative provenance path, as the one of 'now run' in the project
+        os.chdir(self.path)
+        persistence_config.provenance_path = ".noworkflow"
+
+    def tearDown(self):
+        (TrialProlog.prolog_cli, PrologTimestamp.use_nil,
+         persistence_config.provenance_path, cwd) = self.old
+        os.chdir(cwd)
+        session = relational.session
+        session.execute(Trial.t.delete().where(Trial.t.c.id == self.trial_id))
+        session.commit()
+        shutil.rmtree(self.path)
+
+    def add_trial(self, finished=True):
+        """Insert trial. Return it"""
+        start = datetime(2100, 1, 1)
+        session = relational.session
+        session.execute(Trial.t.insert(), dict(
+            id=self.trial_id, start=start, script="script.py", run=1,
+            parent_id=None,
+            finish=start + timedelta(seconds=0.5) if finished else None))
+        session.commit()
+        return Trial(self.trial_id)
+
+    def test_load_finished_trial_from_absolute_path(self):
+        trial = self.add_trial()
+        trial.prolog.load_cli_facts()
+        (facts, facts_option), (rules, rules_option) = self.cli.loaded()
+        directory = os.path.join(self.path, ".noworkflow", "prolog")
+        self.assertEqual(directory, os.path.dirname(facts))
+        self.assertEqual(directory, os.path.dirname(rules))
+        self.assertEqual(("auto", "auto"), (facts_option, rules_option))
+        with open(facts) as fil:
+            self.assertIn("trial({}, ".format(self.trial_id), fil.read())
+        self.assertEqual(["load_rules(1)"], self.cli.facts)
+
+    def test_unfinished_trial_uses_temporary_file(self):
+        trial = self.add_trial(finished=False)
+        trial.prolog.load_cli_facts()
+        (facts, facts_option), _ = self.cli.loaded()
+        self.assertTrue(os.path.isabs(facts))
+        self.assertEqual("never", facts_option)
+        self.assertFalse(os.path.exists(facts))
+        self.assertEqual([], glob(os.path.join(
+            self.path, ".noworkflow", "prolog", "trial_*")))
+
+    def test_use_nil_changes_facts_file(self):
+        trial = self.add_trial()
+        path = trial.prolog.facts_file()
+        PrologTimestamp.use_nil = not PrologTimestamp.use_nil
+        new_path = trial.prolog.facts_file()
+        self.assertNotEqual(path, new_path)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(new_path))
+
+    @unittest.skipUnless(HAS_SWIPL, "pyswip and swipl are not available")
+    def test_query_swipl(self):
+        TrialProlog.prolog_cli = None
+        trial = self.add_trial()
+        trial.prolog.load_cli_facts()
+        query = trial.prolog_description.fact(trial)[:-1]
+        self.assertEqual(1, len(list(trial.prolog.query(query))))
@@ -7,7 +7,9 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from .call_slicing_test import TestCallSlicing
+from .monitoring_test import TestMonitoring
 
 __all__ = [
     b'TestCallSlicing',
+    b'TestMonitoring',
 ]
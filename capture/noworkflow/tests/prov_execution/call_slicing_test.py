@@ -37,6 +37,10 @@ class Args(object):
         self.disasm = False
         self.save_frequency = 0
         self.call_storage_frequency = 10000
+        self.columnar_activations = False
+        self.background_store = None
+        self.background_queue_size = 8
+        self.bulk_load = False
         self.content_engine = "plain"
         self.message = "<empty>"
 
@@ -0,0 +1,68 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+import sys
+
+from ...now.collection.metadata import Metascript
+from .call_slicing_test import Args, NAME
+
+
+SCRIPT = ("import os\n"
+          "def g(x):\n"
+          "    return len(x)\n"
+          "def f(path):\n"
+          "    try:\n"
+          "        os.stat(path)\n"
+          "    except OSError:\n"
+          "        pass\n"
+          "    return g([path])\n"
+          "for i in range(3):\n"
+          "    f('/noworkflow/missing/{}'.format(i))\n"
+          "r = g('abc')\n")
+
+
+@unittest.skipIf(sys.version_info < (3, 12), "sys.monitoring requires 3.12")
+class TestMonitoring(unittest.TestCase):
+
+    def collect(self, provider, non_user_depth=1):
+        """Return (name, line, caller name) of activations"""
+        args = Args()
+        args.execution_provenance = provider
+        args.non_user_depth = non_user_depth
+        old_argv, old_path = sys.argv, sys.path[0]
+        sys.argv = ["now", "run", "-e", provider, "__init__.py"]
+        metascript = Metascript().read_cmd_args(args)
+        metascript.fake_path(NAME, SCRIPT.encode("utf-8"))
+        metascript.namespace = {}
+        metascript.clear_sys()
+        metascript.clear_namespace()
+        try:
+            metascript.execution.collect_provenance()
+        finally:
+            metascript.execution.provider.teardown()
+            sys.argv, sys.path[0] = old_argv, old_path
+        store = metascript.activations_store
+        names = {act.id: act.name for act in store.values()}
+        return [
+            (act.name, act.line, names.get(act.caller_id))
+            for act in store.values()
+        ]
+
+    def test_c_exception(self):
+        """C calls that raise do not desynchronize the activations"""
+        expected = self.collect("Profiler")
+        self.assertIn(("module.stat", 6, "f"), expected)
+        self.assertEqual(expected, self.collect("Monitoring"))
+
+    def test_non_user_depth(self):
+        """Activations after C exceptions are collected with -D 3"""
+        expected = self.collect("Profiler", non_user_depth=3)
+        self.assertIn(("g", 12, NAME), expected)
+        self.assertEqual(
+            expected, self.collect("Monitoring", non_user_depth=3))
@@ -0,0 +1,76 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.provo module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import io
+import json
+import unittest
+
+from datetime import datetime
+
+from ..now.persistence.provo.common.record_writer import COLLECTION
+from ..now.persistence.provo.common.record_writer import ProvNWriter
+from ..now.persistence.provo.common.record_writer import ProvJsonLinesWriter
+
+
+TIME = datetime(2016, 1, 1, 10, 30)
+RECORDS = [
+    ("entity", "trial1Prov", (), [("prov:type", COLLECTION)]),
+    ("bundle", "trial1ExecutionProv"),
+    ("activity", "fileAccess1", (None, None), [
+        ("prov:location", 'a "b"'), ("prov:time", TIME),
+        ("contentHashBefore", None), ("id", 1)]),
+    ("used", "use1", ("functionActivation1", "argumentActivation1", TIME),
+     [("prov:role", "argument")]),
+    ("hadMember", None, ("trial1Prov", "trial1ExecutionProv"), ()),
+    ("endBundle",),
+]
+
+
+class TestRecordWriter(unittest.TestCase):
+    """TestCase for streaming PROV writers"""
+
+    def write(self, cls):
+        """Return lines written by cls"""
+        output = io.StringIO()
+        cls(output, "https://example.org#").write(iter(RECORDS))
+        return output.getvalue().split("\n")[:-1]
+
+    def test_provn(self):
+        """Records have the layout of prov serializer"""
+        self.assertEqual([
+            "document",
+            "  default <https://example.org#>",
+            "  ",
+            "  entity(trial1Prov, [prov:type='prov:Collection'])",
+            "  bundle trial1ExecutionProv",
+            "    default <https://example.org#>",
+            "    ",
+            '    activity(fileAccess1, -, -, [prov:location="a \\"b\\"", '
+            'prov:time="2016-01-01T10:30:00" %% xsd:dateTime, id=1])',
+            "    used(use1; functionActivation1, argumentActivation1, "
+            '2016-01-01T10:30:00, [prov:role="argument"])',
+            "    hadMember(trial1Prov, trial1ExecutionProv)",
+            "  endBundle",
+            "endDocument",
+        ], self.write(ProvNWriter))
+
+    def test_json_lines(self):
+        """Each line is a PROV-JSON document with a single record"""
+        lines = [json.loads(line) for line in self.write(ProvJsonLinesWriter)]
+        self.assertEqual(
+            {"prefix": {"default": "https://example.org#"}}, lines[0])
+        self.assertEqual({"entity": {"trial1Prov": {"prov:type": {
+            "$": "prov:Collection", "type": "prov:QUALIFIED_NAME"}}}},
+                         lines[1])
+        self.assertEqual({"bundle": {"trial1ExecutionProv": {"used": {
+            "use1": {"prov:activity": "functionActivation1",
+                     "prov:entity": "argumentActivation1",
+                     "prov:time": "2016-01-01T10:30:00",
+                     "prov:role": "argument"}}}}}, lines[3])
+        self.assertEqual(["_:id1"], list(
+            lines[4]["bundle"]["trial1ExecutionProv"]["hadMember"]))
@@ -0,0 +1,149 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test now.persistence.writer module"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from ..now.persistence import relational
+from ..now.persistence.writer import BackgroundWriter
+from ..now.persistence.writer import BLOCK, DROP_ARGS, SPILL
+
+
+class FakeConnection(object):
+    """Connection that ignores transactions"""
+
+    def begin(self):
+        """Return transaction context"""
+        return self
+
+    def close(self):
+        """Close connection"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeEngine(object):                                                        # pylint: disable=too-few-public-methods
+    """Engine of fake connections"""
+
+    def connect(self):                                                           # pylint: disable=no-self-use
+        """Create connection"""
+        return FakeConnection()
+
+
+class FakeObjectValue(object):
+    """Model that records inserted rows"""
+    __modelname__ = "ObjectValue"
+    inserted = []
+    # Set to hold the writer thread inside fast_insert
+    gate = None
+
+    @classmethod
+    def fast_insert(cls, conn, keys, rows):                                      # pylint: disable=unused-argument
+        """Record rows"""
+        if cls.gate is not None:
+            cls.gate.wait()
+        cls.inserted.extend(rows)
+
+
+KEYS = ["id", "type"]
+
+
+def batch(*ids):
+    """Create batch with an ARGUMENT and a GLOBAL value for each id"""
+    rows = []
+    for id_ in ids:
+        rows.append((id_, "ARGUMENT"))
+        rows.append((id_, "GLOBAL"))
+    return [(FakeObjectValue, KEYS, rows)]
+
+
+def put_in_thread(writer, value):
+    """Put value in a new thread. Return the thread"""
+    thread = threading.Thread(target=writer.put, args=(value,))
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    """TestCase for BackgroundWriter policies"""
+
+    def setUp(self):
+        self.engine = relational.engine
+        relational.engine = FakeEngine()
+        FakeObjectValue.inserted = []
+        FakeObjectValue.gate = None
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        relational.engine = self.engine
+        if FakeObjectValue.gate is not None:
+            FakeObjectValue.gate.set()
+        shutil.rmtree(self.path)
+
+    def test_close_flushes_pending_batches(self):
+        writer = BackgroundWriter(BLOCK, 8)
+        for id_ in range(5):
+            writer.put(batch(id_))
+        writer.start()
+        writer.close()
+        self.assertIsNone(writer.thread)
+        self.assertEqual(batch(0, 1, 2, 3, 4)[0][2], FakeObjectValue.inserted)
+        self.assertEqual(0, writer.dropped)
+        self.assertEqual(0, writer.errors)
+
+    def test_block_waits_for_writer(self):
+        FakeObjectValue.gate = threading.Event()
+        writer = BackgroundWriter(BLOCK, 1)
+        writer.start()
+        writer.put(batch(0))
+        writer.put(batch(1))
+        blocked = put_in_thread(writer, batch(2))
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+        FakeObjectValue.gate.set()
+        blocked.join()
+        writer.close()
+        self.assertEqual(batch(0, 1, 2)[0][2], FakeObjectValue.inserted)
+        self.assertEqual(0, writer.dropped)
+
+    def test_drop_args_removes_arguments_of_blocked_batch(self):
+        writer = BackgroundWriter(DROP_ARGS, 1)
+        writer.put(batch(0))
+        blocked = put_in_thread(writer, batch(1))
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+        writer.start()
+        blocked.join()
+        writer.close()
+        self.assertEqual(
+            [(0, "ARGUMENT"), (0, "GLOBAL"), (1, "GLOBAL")],
+            FakeObjectValue.inserted)
+        self.assertEqual(1, writer.dropped)
+
+    def test_spill_keeps_order(self):
+        writer = BackgroundWriter(SPILL, 1)
+        writer.spill_dir = self.path
+        writer.put(batch(0))
+        writer.put(batch(1))
+        writer.put(batch(2))
+        self.assertEqual(2, len(writer.spilled))
+        self.assertEqual(2, len(os.listdir(self.path)))
+        writer.start()
+        writer.close()
+        self.assertEqual(batch(0, 1, 2)[0][2], FakeObjectValue.inserted)
+        self.assertEqual([], os.listdir(self.path))
+        self.assertEqual(0, writer.dropped)
@@ -57,7 +57,7 @@ setup(
         "vis": ["pyposast", "flask"],
         "notebook": ["pyposast", "ipython", "jupyter", "sphinx"],
         "all": ["pyposast", "ipython", "jupyter", "flask", "pyswip-alt",
-                "jsonpickle", "sphinx"],
+                "jsonpickle", "sphinx", "numpy"],
     },
     classifiers=[
         'Development Status :: 5 - Production/Stable',